@@ -0,0 +1,53 @@
+import math
+from typing import Optional, Sequence, Tuple
+
+# Number of recent samples used for the slope fit.
+SLOPE_WINDOW = 5
+
+Sample = Tuple[float, float]
+
+
+def temperature_slope(samples: Sequence[Sample]) -> Optional[float]:
+    """Least-squares slope in °C per second of ``(timestamp, temperature)`` samples."""
+    if len(samples) < 2:
+        return None
+    mean_t = sum(t for t, _ in samples) / len(samples)
+    mean_y = sum(y for _, y in samples) / len(samples)
+    spread = sum((t - mean_t) ** 2 for t, _ in samples)
+    if spread <= 0:
+        return None
+    return sum((t - mean_t) * (y - mean_y) for t, y in samples) / spread
+
+
+def next_interval(
+    samples: Sequence[Sample],
+    thresholds: Sequence[float],
+    previous: float,
+    min_interval: float,
+    max_interval: float,
+    max_step: float,
+) -> float:
+    """Choose the seconds until the next poll from recent control temperatures.
+
+    The interval is short enough that the temperature should move at most
+    ``max_step`` degrees, and that the next threshold above the latest sample
+    is seen at least twice before it is reached. Within ``max_step`` of that
+    threshold the minimum interval is used. A stable host lengthens its
+    interval by at most a factor of two per poll.
+    """
+    recent = list(samples)[-SLOPE_WINDOW:]
+    if not recent:
+        return min(max(previous, min_interval), max_interval)
+    latest = recent[-1][1]
+    slope = temperature_slope(recent) or 0.0
+    above = [threshold for threshold in thresholds if threshold > latest]
+    headroom = min(above) - latest if above else math.inf
+
+    candidates = [previous * 2, max_interval]
+    if headroom <= max_step:
+        candidates.append(min_interval)
+    if slope:
+        candidates.append(max_step / abs(slope))
+    if slope > 0:
+        candidates.append(headroom / slope / 2)
+    return min(max(min(candidates), min_interval), max_interval)
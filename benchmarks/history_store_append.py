@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Measure the per-sample cost of appending to the memory-mapped history store.
+
+    python benchmarks/history_store_append.py --samples 100000
+
+Appends host samples to a temporary history file with the default flush
+interval, then reads them back. The in-memory ``History`` append (raw ring
+plus the default rollup tiers) is measured for comparison.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from history import History  # noqa: E402
+from history_store import HOST_STORE_COLUMNS, HistoryFile  # noqa: E402
+
+
+def sample(index):
+    return {
+        "timestamp": 1_700_000_000.0 + index * 10,
+        "temp_avg": 45.0 + index % 7,
+        "temp_max": 52.0 + index % 11,
+        "control_temperature": 52.0 + index % 11,
+        "fan_speed": 30.0,
+    }
+
+
+def report(name, elapsed, count):
+    print(f"{name:<28} n={count:<8} total={elapsed:8.3f} s  per sample={elapsed / count * 1e6:8.2f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=100000)
+    parser.add_argument("--capacity", type=int, default=50000)
+    args = parser.parse_args()
+    samples = [sample(index) for index in range(args.samples)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        history_file = HistoryFile(os.path.join(directory, "bench.hist"), HOST_STORE_COLUMNS, capacity=args.capacity)
+        started = time.perf_counter()
+        for values in samples:
+            history_file.append(values)
+        report("HistoryFile.append", time.perf_counter() - started, args.samples)
+
+        started = time.perf_counter()
+        records = history_file.records()
+        report("HistoryFile.records", time.perf_counter() - started, len(records))
+        print(f"{'file size':<28} {history_file.stats()['file_bytes']} bytes for {args.capacity} records")
+        history_file.close()
+
+    history = History()
+    started = time.perf_counter()
+    for values in samples:
+        history.append(**values)
+    report("History.append (in memory)", time.perf_counter() - started, args.samples)
+
+
+if __name__ == "__main__":
+    main()
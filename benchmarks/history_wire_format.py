@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Compare the JSON and binary columnar encodings of ``/api/history`` responses.
+
+    python benchmarks/history_wire_format.py --points 10000
+
+Builds a series of random temperatures at 10-second spacing, then times
+encoding and decoding in both formats and reports payload sizes. Browser
+parsing is not measured; the binary form is read there as typed-array views
+without a parse step.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from history_codec import decode_binary, encode_binary, encode_json  # noqa: E402
+
+
+def series(points):
+    generator = random.Random(0)
+    temperatures = [45 + 10 * generator.random() for _ in range(points)]
+    return {
+        "host": "r740",
+        "vm": None,
+        "source": "control_temperature",
+        "from": 1_700_000_000.0,
+        "to": 1_700_000_000.0 + points * 10,
+        "method": "minmax",
+        "resolution": 0.0,
+        "points": points,
+        "timestamp": [1_700_000_000.0 + index * 10 for index in range(points)],
+        "min": [value - generator.random() for value in temperatures],
+        "avg": temperatures,
+        "max": [value + generator.random() for value in temperatures],
+    }
+
+
+def measure(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        samples.append(time.perf_counter() - started)
+    return result, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    response = series(args.points)
+
+    json_payload, json_encode = measure(lambda: encode_json(response), args.repeat)
+    _, json_decode = measure(lambda: json.loads(json_payload), args.repeat)
+    binary_payload, binary_encode = measure(lambda: encode_binary(response), args.repeat)
+    _, binary_decode = measure(lambda: decode_binary(binary_payload), args.repeat)
+
+    print(f"{args.points} points, median of {args.repeat} runs")
+    print(f"{'format':<8} {'bytes':>10} {'encode ms':>10} {'decode ms':>10}")
+    print(f"{'json':<8} {len(json_payload):>10} {json_encode * 1e3:>10.3f} {json_decode * 1e3:>10.3f}")
+    print(f"{'binary':<8} {len(binary_payload):>10} {binary_encode * 1e3:>10.3f} {binary_decode * 1e3:>10.3f}")
+    print(f"binary is {len(binary_payload) / len(json_payload):.0%} of the JSON size and encodes "
+          f"{json_encode / binary_encode:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Compare per-write latency of the IPMI transports against a local fake BMC.
+
+    python benchmarks/ipmi_write_latency.py --writes 200
+
+The in-process lanplus client is always measured. One-shot ``ipmitool -I
+lanplus`` and ``ipmitool shell`` are measured too when ``ipmitool`` is on
+PATH (or given with ``--ipmitool``). All transports talk to the same
+``tests/fake_bmc.py`` stand-in, so the numbers show client-side cost, not
+iDRAC response time.
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tests")]
+
+from fake_bmc import FakeBmc  # noqa: E402
+from ipmi_lan import LanplusPool  # noqa: E402
+from ipmi_shell import IpmiShell  # noqa: E402
+from utils import CommandTimeouts  # noqa: E402
+
+USERNAME, PASSWORD = "root", "calvin"
+SPEED = ["raw", "0x30", "0x30", "0x02", "0xff", "0x1e"]
+
+
+def measure(write, count):
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        output, error = write()
+        samples.append(time.perf_counter() - started)
+        if error:
+            raise RuntimeError(error)
+    return samples
+
+
+def report(name, samples):
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{name:<24} n={len(ordered):<5} mean={statistics.fmean(ordered) * 1000:8.3f} ms"
+        f"  p50={statistics.median(ordered) * 1000:8.3f} ms  p95={p95 * 1000:8.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--ipmitool", default=shutil.which("ipmitool"))
+    args = parser.parse_args()
+
+    bmc = FakeBmc({USERNAME: PASSWORD}).start()
+    timeouts = CommandTimeouts(total=10)
+    host = {"ipmi_credentials": {"host": "127.0.0.1", "username": USERNAME, "password": PASSWORD}}
+    try:
+        pool = LanplusPool(port=bmc.port, keepalive_interval=0)
+        pool.execute(host, SPEED, timeouts)
+        report("lanplus (in-process)", measure(lambda: pool.execute(host, SPEED, timeouts), args.writes))
+        pool.close_all()
+
+        if not args.ipmitool:
+            print("ipmitool not found; skipping the ipmitool transports")
+            return
+        base = [args.ipmitool, "-I", "lanplus", "-H", "127.0.0.1", "-p", str(bmc.port), "-U", USERNAME, "-E"]
+        env = dict(os.environ, IPMI_PASSWORD=PASSWORD)
+
+        def one_shot():
+            result = subprocess.run(base + SPEED, env=env, capture_output=True, text=True, timeout=10)
+            return result.stdout, result.stderr.strip() if result.returncode else ""
+
+        report("ipmitool (per write)", measure(one_shot, max(1, args.writes // 10)))
+
+        shell = IpmiShell(base + ["shell"], {"IPMI_PASSWORD": PASSWORD})
+        shell.execute(SPEED, timeouts)
+        report("ipmitool shell", measure(lambda: shell.execute(SPEED, timeouts), args.writes))
+        shell.close()
+    finally:
+        bmc.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import threading
+import time
+from typing import Hashable, Iterable, Mapping, Optional
+
+BREAKER_STATES = ('closed', 'open', 'half_open')
+
+
+class CircuitBreaker:
+    """Stop dialing a sensor source after repeated failures.
+
+    After ``failures`` consecutive failures the breaker opens for
+    ``base_backoff`` seconds. Once the backoff has passed a single half-open
+    probe is allowed; if it fails the breaker opens again with the backoff
+    doubled, up to ``max_backoff``. Any success closes the breaker.
+    """
+
+    def __init__(self, failures=3, base_backoff=30, max_backoff=600, clock=time.monotonic):
+        self.failures = failures
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.backoff = None
+        self.retry_at = None
+        self.opened = 0
+        self.rejected = 0
+        self.last_error = None
+
+    def allow(self) -> bool:
+        """Return whether the source may be read now; a ``True`` from an open breaker is the probe."""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and self._clock() >= self.retry_at:
+                self.state = 'half_open'
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, ok: bool, error: Optional[str] = None):
+        with self._lock:
+            if ok:
+                self.state = 'closed'
+                self.consecutive_failures = 0
+                self.backoff = None
+                self.retry_at = None
+                self.last_error = None
+                return
+            self.consecutive_failures += 1
+            self.last_error = error
+            if self.state == 'half_open':
+                self._open(min(self.backoff * 2, self.max_backoff))
+            elif self.state == 'closed' and self.consecutive_failures >= self.failures:
+                self._open(self.base_backoff)
+
+    def _open(self, backoff):
+        self.state = 'open'
+        self.backoff = backoff
+        self.retry_at = self._clock() + backoff
+        self.opened += 1
+
+    def retry_in(self) -> Optional[float]:
+        with self._lock:
+            if self.state != 'open':
+                return None
+            return max(0.0, self.retry_at - self._clock())
+
+    def snapshot(self) -> dict:
+        retry_in = self.retry_in()
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'opened': self.opened,
+                'rejected': self.rejected,
+                'backoff_seconds': self.backoff,
+                'retry_in_seconds': None if retry_in is None else round(retry_in, 1),
+            }
+
+
+class BreakerTable:
+    """``CircuitBreaker`` per sensor source, created on first use."""
+
+    def __init__(self, settings: Optional[Mapping] = None, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._breakers = {}
+        self.settings = dict(settings or {})
+
+    def get(self, key: Hashable) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(clock=self._clock, **self.settings)
+            return breaker
+
+    def retain(self, keys: Iterable[Hashable]):
+        keep = set(keys)
+        with self._lock:
+            for key in set(self._breakers) - keep:
+                del self._breakers[key]
+
+    def clear(self):
+        with self._lock:
+            self._breakers.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {key: breaker.snapshot() for key, breaker in breakers.items()}
@@ -1,8 +1,19 @@
+import importlib.util
 import os
 import sys
 import math
 import yaml
-from utils import log, auto_split_thresholds
+from history import DEFAULT_ROLLUPS
+from history_store import DEFAULT_FLUSH_INTERVAL, DEFAULT_STORE_CAPACITY
+from host_plan import compile_plans
+from limits import LIMIT_KINDS
+from utils import COMMAND_CLASSES, POLL_SOURCES, log, auto_split_thresholds
+
+DEFAULT_COMMAND_TIMEOUTS = {
+    'cpu_sensor': {'connect': 5, 'command': 10, 'total': 15},
+    'gpu_sensor': {'connect': 5, 'command': 15, 'total': 20},
+    'ipmi_write': {'connect': 5, 'command': 20, 'total': 30},
+}
 
 class ConfigError(Exception):
     pass
@@ -34,16 +45,37 @@ class Config:
         self.general = {
             'debug': False,
             'interval': 60,
+            'poll_workers': 1,
+            'sensor_workers': 8,
+            'sensor_deadline': 30,
+            'sensor_cache_max_age': 0,
+            'history_capacity': 120,
+            'history_rollups': DEFAULT_ROLLUPS,
+            'history_store': None,
+            'sensor_bundle': False,
+            'stream_interval': 5,
+            'stream_max_age': 30,
+            'push_receiver': None,
+            'adaptive_polling': None,
+            'circuit_breaker': None,
+            'poll_stagger': 'none',
+            'remote_limits': {},
+            'ipmi_reassert_interval': 300,
+            'ipmi_transport': 'exec',
+            'async_fan_writes': False,
+            'command_timeouts': {name: dict(limits) for name, limits in DEFAULT_COMMAND_TIMEOUTS.items()},
             'temperature_control_mode': 'max',
             'web_enabled': True,
             'web_host': '127.0.0.1',
             'web_port': 8080,
             'web_refresh_interval': 3,
+            'cpu_temperature_source': 'command',
             'cpu_temperature_command': 'sensors | grep -E "Core [0-9]+:" | awk \'{print $3}\' | sed \'s/+//;s/°C//\' | paste -sd \';\' -',
             'gpu_temperature_command_nvidia': 'nvidia-smi --query-gpu=temperature.gpu --format=csv,noheader,nounits | paste -sd \';\' -',
             'gpu_temperature_command_amd': 'rocm-smi --showtemp | grep -E "Temp" | awk \'{print $2}\' | sed \'s/[^0-9.]//g\' | paste -sd \';\' -'
         }
         self.hosts = []
+        self.plans = {}
 
         self.load_config_from_file(config_path)
 
@@ -69,16 +101,38 @@ class Config:
 
         self.load_general_config(_config)
         self.load_hosts_config(_config)
+        self.plans = compile_plans(self.hosts, self.general)
 
     def load_general_config(self, _config):
         general_config = _config.get('general', {})
         self.general['debug'] = general_config.get('debug', False)
         self.general['interval'] = general_config.get('interval', 60)
+        self.general['poll_workers'] = general_config.get('poll_workers', 1)
+        self.general['sensor_workers'] = general_config.get('sensor_workers', 8)
+        self.general['sensor_deadline'] = general_config.get('sensor_deadline', 30)
+        self.general['sensor_cache_max_age'] = general_config.get('sensor_cache_max_age', 0)
+        self.general['history_capacity'] = general_config.get('history_capacity', 120)
+        self.general['history_store'] = self.load_history_store(general_config.get('history_store'))
+        if 'history_rollups' in general_config:
+            self.general['history_rollups'] = self.load_history_rollups(general_config['history_rollups'])
+        self.general['sensor_bundle'] = general_config.get('sensor_bundle', False)
+        self.general['stream_interval'] = general_config.get('stream_interval', 5)
+        self.general['stream_max_age'] = general_config.get('stream_max_age', 30)
+        self.general['push_receiver'] = self.load_push_receiver(general_config.get('push_receiver'))
+        self.general['adaptive_polling'] = self.load_adaptive_polling(general_config.get('adaptive_polling'))
+        self.general['circuit_breaker'] = self.load_circuit_breaker(general_config.get('circuit_breaker'))
+        self.general['poll_stagger'] = general_config.get('poll_stagger', 'none')
+        self.general['remote_limits'] = self.load_remote_limits(general_config.get('remote_limits', {}))
+        self.general['ipmi_reassert_interval'] = general_config.get('ipmi_reassert_interval', 300)
+        self.general['ipmi_transport'] = general_config.get('ipmi_transport', 'exec')
+        self.general['async_fan_writes'] = general_config.get('async_fan_writes', False)
+        self.general['command_timeouts'] = self.load_command_timeouts(general_config.get('command_timeouts', {}))
         self.general['temperature_control_mode'] = general_config.get('temperature_control_mode', 'max')
         self.general['web_enabled'] = general_config.get('web_enabled', True)
         self.general['web_host'] = general_config.get('web_host', '127.0.0.1')
         self.general['web_port'] = general_config.get('web_port', 8080)
         self.general['web_refresh_interval'] = general_config.get('web_refresh_interval', 3)
+        self.general['cpu_temperature_source'] = general_config.get('cpu_temperature_source', 'command')
         self.general['cpu_temperature_command'] = general_config.get('cpu_temperature_command', 'sensors | grep -E "Core [0-9]+:" | awk \'{print $3}\' | sed \'s/+//;s/°C//\' | paste -sd \';\' -')
         self.general['gpu_temperature_command_nvidia'] = general_config.get('gpu_temperature_command_nvidia', 'nvidia-smi --query-gpu=temperature.gpu --format=csv,noheader,nounits | paste -sd \';\' -')
         self.general['gpu_temperature_command_amd'] = general_config.get('gpu_temperature_command_amd', 'rocm-smi --showtemp | grep -E "Temp" | awk \'{print $2}\' | sed \'s/[^0-9.]//g\' | paste -sd \';\' -')
@@ -88,6 +142,40 @@ class Config:
             raise ConfigError('general.interval must be greater than zero.')
         if isinstance(self.general['interval'], bool) or not math.isfinite(self.general['interval']):
             raise ConfigError('general.interval must be a finite number.')
+        if (
+            not isinstance(self.general['poll_workers'], int)
+            or isinstance(self.general['poll_workers'], bool)
+            or not 1 <= self.general['poll_workers'] <= 256
+        ):
+            raise ConfigError('general.poll_workers must be an integer from 1 to 256.')
+        if (
+            not isinstance(self.general['sensor_workers'], int)
+            or isinstance(self.general['sensor_workers'], bool)
+            or not 1 <= self.general['sensor_workers'] <= 256
+        ):
+            raise ConfigError('general.sensor_workers must be an integer from 1 to 256.')
+        if not isinstance(self.general['sensor_bundle'], bool):
+            raise ConfigError('general.sensor_bundle must be true or false.')
+        for key in ['stream_interval', 'stream_max_age']:
+            if not self.is_finite_number(self.general[key]) or self.general[key] <= 0:
+                raise ConfigError(f'general.{key} must be a number greater than zero.')
+        if not self.is_finite_number(self.general['sensor_deadline']) or self.general['sensor_deadline'] <= 0:
+            raise ConfigError('general.sensor_deadline must be a number greater than zero.')
+        if not self.is_finite_number(self.general['sensor_cache_max_age']) or self.general['sensor_cache_max_age'] < 0:
+            raise ConfigError('general.sensor_cache_max_age must be a number greater than or equal to zero.')
+        history_capacity = self.general['history_capacity']
+        if not isinstance(history_capacity, int) or isinstance(history_capacity, bool) or not 2 <= history_capacity <= 1000000:
+            raise ConfigError('general.history_capacity must be an integer between 2 and 1000000.')
+        if not self.is_finite_number(self.general['ipmi_reassert_interval']) or self.general['ipmi_reassert_interval'] < 0:
+            raise ConfigError('general.ipmi_reassert_interval must be zero or a positive number of seconds.')
+        if self.general['ipmi_transport'] not in ['exec', 'shell', 'lanplus']:
+            raise ConfigError('general.ipmi_transport must be "exec", "shell", or "lanplus".')
+        if self.general['ipmi_transport'] == 'lanplus' and importlib.util.find_spec('cryptography') is None:
+            raise ConfigError('general.ipmi_transport "lanplus" requires the cryptography package.')
+        if self.general['poll_stagger'] not in ['none', 'even', 'hashed']:
+            raise ConfigError('general.poll_stagger must be "none", "even", or "hashed".')
+        if not isinstance(self.general['async_fan_writes'], bool):
+            raise ConfigError('general.async_fan_writes must be true or false.')
         if self.general['temperature_control_mode'] not in ['max', 'avg']:
             raise ConfigError('general.temperature_control_mode must be "max" or "avg".')
         if not isinstance(self.general['web_enabled'], bool):
@@ -102,6 +190,8 @@ class Config:
             or not 1 <= self.general['web_refresh_interval'] <= 3600
         ):
             raise ConfigError('general.web_refresh_interval must be an integer from 1 to 3600.')
+        if self.general['cpu_temperature_source'] not in ['command', 'hwmon']:
+            raise ConfigError('general.cpu_temperature_source must be "command" or "hwmon".')
         for command_name in [
             'cpu_temperature_command',
             'gpu_temperature_command_nvidia',
@@ -111,6 +201,141 @@ class Config:
             if not isinstance(command, str) or not command.strip():
                 raise ConfigError(f'general.{command_name} must be a non-empty string.')
 
+    def load_command_timeouts(self, configured):
+        if not isinstance(configured, dict):
+            raise ConfigError('general.command_timeouts must be a mapping of command classes.')
+        unknown = set(configured) - set(COMMAND_CLASSES)
+        if unknown:
+            raise ConfigError(
+                'general.command_timeouts only supports: ' + ', '.join(COMMAND_CLASSES) + '.'
+            )
+        timeouts = {}
+        for command_class in COMMAND_CLASSES:
+            overrides = configured.get(command_class) or {}
+            if not isinstance(overrides, dict) or set(overrides) - {'connect', 'command', 'total'}:
+                raise ConfigError(
+                    f'general.command_timeouts.{command_class} may only set connect, command, and total.'
+                )
+            limits = dict(DEFAULT_COMMAND_TIMEOUTS[command_class], **overrides)
+            for phase, value in limits.items():
+                if not self.is_finite_number(value) or value <= 0:
+                    raise ConfigError(
+                        f'general.command_timeouts.{command_class}.{phase} must be a number greater than zero.'
+                    )
+            timeouts[command_class] = limits
+        return timeouts
+
+    def load_push_receiver(self, configured):
+        if configured is None:
+            return None
+        if not isinstance(configured, dict) or set(configured) - {'host', 'port', 'max_age'}:
+            raise ConfigError('general.push_receiver may only set host, port, and max_age.')
+        receiver = {'host': '0.0.0.0', 'max_age': 30, **configured}
+        if not isinstance(receiver['host'], str) or not receiver['host'].strip():
+            raise ConfigError('general.push_receiver.host must be a non-empty string.')
+        port = receiver.get('port')
+        if not isinstance(port, int) or isinstance(port, bool) or not 1 <= port <= 65535:
+            raise ConfigError('general.push_receiver.port must be an integer from 1 to 65535.')
+        if not self.is_finite_number(receiver['max_age']) or receiver['max_age'] <= 0:
+            raise ConfigError('general.push_receiver.max_age must be a number greater than zero.')
+        return receiver
+
+    def load_adaptive_polling(self, configured):
+        if configured is None:
+            return None
+        if not isinstance(configured, dict) or set(configured) - {'min_interval', 'max_interval', 'max_step'}:
+            raise ConfigError('general.adaptive_polling may only set min_interval, max_interval, and max_step.')
+        adaptive = {'min_interval': 5, 'max_interval': 120, 'max_step': 2, **configured}
+        for key in ['min_interval', 'max_interval', 'max_step']:
+            if not self.is_finite_number(adaptive[key]) or adaptive[key] <= 0:
+                raise ConfigError(f'general.adaptive_polling.{key} must be a number greater than zero.')
+        if adaptive['max_interval'] < adaptive['min_interval']:
+            raise ConfigError('general.adaptive_polling.max_interval must not be less than min_interval.')
+        return adaptive
+
+    def load_history_rollups(self, configured):
+        if not isinstance(configured, list):
+            raise ConfigError('general.history_rollups must be a list of {resolution, retention} tiers.')
+        rollups = []
+        for tier in configured:
+            if not isinstance(tier, dict) or set(tier) != {'resolution', 'retention'}:
+                raise ConfigError('general.history_rollups tiers must set resolution and retention.')
+            resolution, retention = tier['resolution'], tier['retention']
+            for key, value in (('resolution', resolution), ('retention', retention)):
+                if not self.is_finite_number(value) or value <= 0:
+                    raise ConfigError(f'general.history_rollups {key} must be a number greater than zero.')
+            if retention < resolution or retention / resolution > 1000000:
+                raise ConfigError('general.history_rollups retention must be 1 to 1000000 times the resolution.')
+            rollups.append((resolution, retention))
+        if len({resolution for resolution, _ in rollups}) != len(rollups):
+            raise ConfigError('general.history_rollups resolutions must be unique.')
+        return tuple(sorted(rollups))
+
+    def load_history_store(self, configured):
+        if configured is None:
+            return None
+        if not isinstance(configured, dict) or set(configured) - {'path', 'capacity', 'flush_interval'}:
+            raise ConfigError('general.history_store may only set path, capacity, and flush_interval.')
+        store = {'capacity': DEFAULT_STORE_CAPACITY, 'flush_interval': DEFAULT_FLUSH_INTERVAL, **configured}
+        if not isinstance(store.get('path'), str) or not store['path'].strip():
+            raise ConfigError('general.history_store.path must be a non-empty string.')
+        capacity = store['capacity']
+        if not isinstance(capacity, int) or isinstance(capacity, bool) or not 2 <= capacity <= 10000000:
+            raise ConfigError('general.history_store.capacity must be an integer between 2 and 10000000.')
+        if not self.is_finite_number(store['flush_interval']) or store['flush_interval'] <= 0:
+            raise ConfigError('general.history_store.flush_interval must be a number greater than zero.')
+        return store
+
+    def load_circuit_breaker(self, configured):
+        if configured is None:
+            return None
+        if not isinstance(configured, dict) or set(configured) - {'failures', 'base_backoff', 'max_backoff'}:
+            raise ConfigError('general.circuit_breaker may only set failures, base_backoff, and max_backoff.')
+        breaker = {'failures': 3, 'base_backoff': 30, 'max_backoff': 600, **configured}
+        if not isinstance(breaker['failures'], int) or isinstance(breaker['failures'], bool) or breaker['failures'] < 1:
+            raise ConfigError('general.circuit_breaker.failures must be a positive integer.')
+        for key in ['base_backoff', 'max_backoff']:
+            if not self.is_finite_number(breaker[key]) or breaker[key] <= 0:
+                raise ConfigError(f'general.circuit_breaker.{key} must be a number greater than zero.')
+        if breaker['max_backoff'] < breaker['base_backoff']:
+            raise ConfigError('general.circuit_breaker.max_backoff must not be less than base_backoff.')
+        return breaker
+
+    def load_remote_limits(self, configured):
+        if not isinstance(configured, dict) or set(configured) - set(LIMIT_KINDS):
+            raise ConfigError('general.remote_limits only supports: ' + ', '.join(LIMIT_KINDS) + '.')
+        limits = {}
+        for kind, settings in configured.items():
+            if not isinstance(settings, dict) or set(settings) - {'global', 'per_host', 'rate', 'burst'}:
+                raise ConfigError(f'general.remote_limits.{kind} may only set global, per_host, rate, and burst.')
+            for key in ['global', 'per_host', 'burst']:
+                value = settings.get(key)
+                if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 1):
+                    raise ConfigError(f'general.remote_limits.{kind}.{key} must be a positive integer.')
+            if 'rate' in settings and (not self.is_finite_number(settings['rate']) or settings['rate'] <= 0):
+                raise ConfigError(f'general.remote_limits.{kind}.rate must be a number greater than zero.')
+            if 'burst' in settings and 'rate' not in settings:
+                raise ConfigError(f'general.remote_limits.{kind}.burst requires rate.')
+            limits[kind] = dict(settings)
+        return limits
+
+    def load_push_settings(self, device, owner, default_source, sources):
+        push = device.get('push')
+        if push is None:
+            return
+        if self.general['push_receiver'] is None:
+            raise ConfigError(f'{owner} push requires general.push_receiver.')
+        if not isinstance(push, dict) or set(push) - {'key', 'source'}:
+            raise ConfigError(f'{owner} push may only set key and source.')
+        if not isinstance(push.get('key'), str) or not push['key'].strip():
+            raise ConfigError(f'{owner} push.key must be a non-empty string.')
+        push.setdefault('source', default_source)
+        if not isinstance(push['source'], str) or not push['source'].strip():
+            raise ConfigError(f'{owner} push.source must be a non-empty string.')
+        if push['source'] in sources:
+            raise ConfigError(f'{owner} push.source "{push["source"]}" is already used.')
+        sources.add(push['source'])
+
     def load_hosts_config(self, _config):
         if 'hosts' not in _config:
             raise ConfigError('Missing "hosts" section in configuration file.')
@@ -119,6 +344,7 @@ class Config:
         if not isinstance(self.hosts, list) or not self.hosts:
             raise ConfigError('"hosts" must be a non-empty list.')
 
+        push_sources = set()
         for host in self.hosts:
             if 'name' not in host or not isinstance(host['name'], str):
                 raise ConfigError("Each host must have a non-empty 'name' field.")
@@ -179,23 +405,29 @@ class Config:
                     if not self.general['gpu_temperature_command_amd']:
                         raise ConfigError(f'Host "{host["name"]}" general config is missing gpu_temperature_command_amd command')
 
+            self.validate_streaming(host, f'Host "{host["name"]}"', ['cpu', 'nvidia', 'amd'])
+            self.load_host_intervals(host)
+            self.load_push_settings(host, f'Host "{host["name"]}"', host['name'], push_sources)
+
             if 'vms' in host:
-                self.load_vms_config(host)
+                self.load_vms_config(host, push_sources)
 
-    def load_vms_config(self, host):
+    def load_vms_config(self, host, push_sources):
         for vm in host['vms']:
             if 'name' not in vm or not isinstance(vm['name'], str) or not vm['name']:
                 raise ConfigError(f'VM in host "{host.get("name", "unknown")}" must have a non-empty "name" field.')
-            if 'ssh_credentials' not in vm:
-                raise ConfigError(f'VM "{vm.get("name", "unknown")}" must include "ssh_credentials".')
-            creds = vm['ssh_credentials']
-            self.validate_ssh_credentials(creds, f'VM "{vm.get("name", "unknown")}"')
+            self.load_push_settings(vm, f'VM "{vm["name"]}"', f'{host["name"]}/{vm["name"]}', push_sources)
+            if 'ssh_credentials' not in vm and not vm.get('push'):
+                raise ConfigError(f'VM "{vm.get("name", "unknown")}" must include "ssh_credentials" or "push".')
+            if 'ssh_credentials' in vm:
+                self.validate_ssh_credentials(vm['ssh_credentials'], f'VM "{vm.get("name", "unknown")}"')
             if 'gpu_type' not in vm:
                 raise ConfigError(f'VM "{vm.get("name", "unknown")}" must specify gpu_type')
             if isinstance(vm['gpu_type'], str):
                 vm['gpu_type'] = [vm['gpu_type']]
             if not isinstance(vm['gpu_type'], list) or not all(x in ['nvidia', 'amd'] for x in vm['gpu_type']):
                 raise ConfigError(f'VM "{vm.get("name", "unknown")}" gpu_type must be an array containing only "nvidia" or "amd", e.g. ["nvidia", "amd"]')
+            self.validate_streaming(vm, f'VM "{vm["name"]}"', ['nvidia', 'amd'])
 
     @staticmethod
     def is_finite_number(value):
@@ -205,6 +437,35 @@ class Config:
             and math.isfinite(value)
         )
 
+    def load_host_intervals(self, host):
+        owner = f'Host "{host["name"]}"'
+        host['interval'] = host.get('interval', self.general['interval'])
+        if not self.is_finite_number(host['interval']) or host['interval'] <= 0:
+            raise ConfigError(f'{owner} interval must be a number greater than zero.')
+        source_intervals = host.get('source_intervals') or {}
+        if not isinstance(source_intervals, dict) or set(source_intervals) - set(POLL_SOURCES):
+            raise ConfigError(
+                f'{owner} source_intervals must be a mapping of ' + ', '.join(POLL_SOURCES) + ' to seconds.'
+            )
+        for source, interval in source_intervals.items():
+            if not self.is_finite_number(interval) or interval <= 0:
+                raise ConfigError(f'{owner} source_intervals.{source} must be a number greater than zero.')
+        host['source_intervals'] = dict(source_intervals)
+
+    @staticmethod
+    def validate_streaming(device, owner, sources):
+        streaming = device.get('streaming', False)
+        if isinstance(streaming, bool):
+            return
+        if not isinstance(streaming, dict) or set(streaming) - set(sources):
+            raise ConfigError(
+                f'{owner} streaming must be true, false, or a mapping of '
+                + ', '.join(sources) + ' to stream commands.'
+            )
+        for source, command in streaming.items():
+            if not isinstance(command, str) or not command.strip():
+                raise ConfigError(f'{owner} streaming.{source} must be a non-empty command.')
+
     @staticmethod
     def validate_ssh_credentials(creds, owner):
         for key in ['host', 'username']:
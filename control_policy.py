@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Optional, Sequence
+from typing import Optional, Sequence, Tuple
 
 
 FAIL_SAFE_TEMPERATURE = 999.0
@@ -10,6 +10,8 @@ class SensorSnapshot:
     cpu_temps: Optional[Sequence[float]]
     gpu_temps: Optional[Sequence[float]]
     gpu_sources_healthy: bool = True
+    # Sources answered from their last good reading instead of a fresh one.
+    cached_sources: Tuple[str, ...] = ()
 
 
 @dataclass(frozen=True)
@@ -22,6 +24,7 @@ class ControlDecision:
     gpu_max: Optional[float]
     combined_avg: Optional[float]
     combined_max: Optional[float]
+    cached_sources: Tuple[str, ...] = ()
 
 
 def _average(values: Sequence[float]) -> float:
@@ -32,7 +35,8 @@ def determine_control_temperature(snapshot: SensorSnapshot, mode: str) -> Contro
     """Return the temperature used by fan control without performing any I/O.
 
     CPU sensor loss is unsafe. GPU data is optional only when no GPU source is
-    configured; a failed configured GPU source is also unsafe.
+    configured; a failed configured GPU source is also unsafe. Cached readings
+    count as healthy; the caller only supplies them while they are fresh.
     """
     if not snapshot.cpu_temps or not snapshot.gpu_sources_healthy:
         return ControlDecision(
@@ -69,4 +73,5 @@ def determine_control_temperature(snapshot: SensorSnapshot, mode: str) -> Contro
         gpu_max=gpu_max,
         combined_avg=combined_avg,
         combined_max=combined_max,
+        cached_sources=tuple(snapshot.cached_sources),
     )
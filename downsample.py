@@ -0,0 +1,80 @@
+from typing import Dict, List, Optional
+
+Series = Dict[str, List[Optional[float]]]
+SERIES_KEYS = ('timestamp', 'min', 'avg', 'max')
+DOWNSAMPLE_METHODS = ('minmax', 'lttb')
+
+
+def _present(series: Series) -> Series:
+    """Drop points whose average is missing."""
+    keep = [index for index, value in enumerate(series['avg']) if value is not None]
+    return {key: [series[key][index] for index in keep] for key in SERIES_KEYS}
+
+
+def _take(series: Series, indexes) -> Series:
+    return {key: [series[key][index] for index in indexes] for key in SERIES_KEYS}
+
+
+def minmax(series: Series, points: int) -> Series:
+    """Merge consecutive points into ``points`` buckets of near-equal count.
+
+    A bucket keeps its first timestamp, the lowest minimum, the mean of the
+    averages, and the highest maximum, so peaks survive any reduction.
+    """
+    series = _present(series)
+    count = len(series['timestamp'])
+    if count <= points:
+        return series
+    result = {key: [] for key in SERIES_KEYS}
+    for bucket in range(points):
+        first = bucket * count // points
+        last = (bucket + 1) * count // points
+        averages = series['avg'][first:last]
+        result['timestamp'].append(series['timestamp'][first])
+        result['min'].append(min(series['min'][first:last]))
+        result['avg'].append(sum(averages) / len(averages))
+        result['max'].append(max(series['max'][first:last]))
+    return result
+
+
+def lttb(series: Series, points: int) -> Series:
+    """Keep the ``points`` points that best preserve the shape of the average (Largest-Triangle-Three-Buckets).
+
+    The first and last points are always kept. Kept points carry their own
+    minimum and maximum.
+    """
+    series = _present(series)
+    count = len(series['timestamp'])
+    if count <= points:
+        return series
+    if points < 3:
+        return _take(series, [0, count - 1][:points])
+    xs, ys = series['timestamp'], series['avg']
+    width = (count - 2) / (points - 2)
+    selected = [0]
+    previous = 0
+    for bucket in range(points - 2):
+        first = int(bucket * width) + 1
+        last = int((bucket + 1) * width) + 1
+        # The next bucket's mean is the third corner; the last bucket uses the last point.
+        next_first, next_last = last, min(int((bucket + 2) * width) + 1, count)
+        if next_first >= next_last:
+            next_first, next_last = count - 1, count
+        mean_x = sum(xs[next_first:next_last]) / (next_last - next_first)
+        mean_y = sum(ys[next_first:next_last]) / (next_last - next_first)
+        x0, y0 = xs[previous], ys[previous]
+        best, best_area = first, -1.0
+        for index in range(first, last):
+            area = abs((x0 - mean_x) * (ys[index] - y0) - (x0 - xs[index]) * (mean_y - y0))
+            if area > best_area:
+                best, best_area = index, area
+        selected.append(best)
+        previous = best
+    selected.append(count - 1)
+    return _take(series, selected)
+
+
+def downsample(series: Series, points: int, method: str = 'minmax') -> Series:
+    if method == 'lttb':
+        return lttb(series, points)
+    return minmax(series, points)
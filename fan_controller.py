@@ -1,48 +1,96 @@
+import time
+from typing import Optional
+
+from control_policy import FAIL_SAFE_TEMPERATURE
+from fan_writer import FanWriter
+from host_plan import plan_for
+# The builders live in ipmi_commands; they are re-exported for existing importers.
+from ipmi_commands import (
+    build_ipmi_control_command,  # noqa: F401
+    build_ipmi_speed_command,  # noqa: F401
+    ipmi_control_args,
+    ipmi_speed_args,
+)
+from ipmi_lan import default_lan_pool
+from ipmi_shell import default_shells
+from limits import LimitTimeout, default_limiter
 from state import state
-from utils import CommandSpec, format_command, log, run_command
-
-
-def _build_ipmi_command(host: dict, raw_args) -> CommandSpec:
-    ipmi = host.get('ipmi_credentials')
-    argv = ['ipmitool']
-    stdin_data = None
-    if ipmi:
-        argv.extend([
-            '-I', 'lanplus',
-            '-H', str(ipmi['host']).strip(),
-            '-U', str(ipmi['username']),
-            '-f', '/dev/stdin',
-        ])
-        stdin_data = f"{ipmi['password']}\n"
-    argv.extend(raw_args)
-    return CommandSpec(argv=argv, stdin_data=stdin_data)
-
-
-def build_ipmi_control_command(host: dict, mode: str) -> CommandSpec:
-    mode_value = {'manual': '0x00', 'automatic': '0x01'}.get(mode)
-    if mode_value is None:
-        raise ValueError(f"Unknown fan control mode: {mode}")
-    return _build_ipmi_command(host, ['raw', '0x30', '0x30', '0x01', mode_value])
-
-
-def build_ipmi_speed_command(host: dict, level: float) -> CommandSpec:
-    return _build_ipmi_command(
-        host,
-        ['raw', '0x30', '0x30', '0x02', '0xff', f'0x{int(level):02x}'],
-    )
+from utils import (
+    CommandTimeout,
+    command_latency,
+    command_timeouts,
+    format_command,
+    log,
+    run_command,
+)
+
 
 class FanController:
-    def __init__(self, config):
+    def __init__(self, config, clock=time.monotonic, ipmi_shells=None, ipmi_lan=None):
         self.config = config
+        self._clock = clock
+        self.ipmi_shells = ipmi_shells or default_shells
+        self.ipmi_lan = ipmi_lan or default_lan_pool
+        # Per host name: the mode last requested and whether the iDRAC
+        # acknowledged it, and the last level it acknowledged.
+        self._applied = {}
+        self.writer = FanWriter(self.set_fan_speed)
+
+    def _send_ipmi(self, host, cmd, raw_args):
+        """Run an IPMI write through the configured transport.
+
+        The ``shell`` and ``lanplus`` transports only apply to commands
+        executed on the controller, and ``lanplus`` also needs
+        ``ipmi_credentials``; other hosts keep one-shot ``ipmitool`` commands.
+        """
+        timeouts = command_timeouts(self.config.general, 'ipmi_write')
+        transport = self.config.general.get('ipmi_transport', 'exec')
+        if host.get('ssh_credentials') or (transport == 'lanplus' and not host.get('ipmi_credentials')):
+            transport = 'exec'
+        if transport != 'exec':
+            pool = self.ipmi_lan if transport == 'lanplus' else self.ipmi_shells
+            started = time.monotonic()
+            try:
+                target = plan_for(self.config, host).ipmi_target
+                with default_limiter.slot('ipmi_session', target, timeouts.total if timeouts else None):
+                    output, error = pool.execute(host, raw_args, timeouts)
+            except LimitTimeout as exc:
+                output, error = None, CommandTimeout(str(exc))
+            command_latency.record(
+                'ipmi_write', time.monotonic() - started, timed_out=isinstance(error, CommandTimeout)
+            )
+            return output, error
+        return run_command(
+            host,
+            cmd,
+            logger=log,
+            log_tag=host.get('name', 'host'),
+            debug=self.config.general.get('debug', False),
+            timeouts=timeouts,
+            command_class='ipmi_write',
+        )
+
+    def _count_write(self, host_name, outcome):
+        if host_name in state:
+            writes = state[host_name].setdefault('ipmi_writes', {'issued': 0, 'suppressed': 0, 'mode_writes': 0})
+            writes[outcome] = writes.get(outcome, 0) + 1
+
+    def _speed_write_needed(self, host_name, level):
+        applied = self._applied.get(host_name)
+        if not applied or applied['level'] != int(level):
+            return True
+        interval = self.config.general.get('ipmi_reassert_interval', 300)
+        return interval <= 0 or self._clock() - applied['asserted_at'] >= interval
 
     def check_hysteresis(self, temp: float, threshold_temp: float, hysteresis: float) -> bool:
         return threshold_temp - hysteresis <= temp <= threshold_temp + hysteresis
 
     def compute_fan_speed_level(self, temp: float, host: dict) -> float:
         debug = self.config.general.get('debug', False)
-        temperatures = host['temperatures']
-        hysteresis = host['hysteresis']
-        speeds = host['speeds']
+        plan = plan_for(self.config, host)
+        temperatures = plan.temperatures
+        hysteresis = plan.hysteresis
+        speeds = plan.speeds
         for i in range(len(temperatures)):
             if self.check_hysteresis(temp, temperatures[i], hysteresis):
                 if debug:
@@ -61,32 +109,54 @@ class FanController:
     def set_fan_speed(self, level: float, host: dict):
         debug = self.config.general.get('debug', False)
         host_name = host.get('name', 'host')
-        cmd = build_ipmi_speed_command(host, level)
+        cmd = plan_for(self.config, host).speed_command(level)
 
         if debug:
             log("DEBUG", host_name, f"Planned set fan speed via ipmitool command: {format_command(cmd)}")
             if host_name in state:
                 state[host_name]['fan_speed'] = int(level)
-            return
+            return True
+
+        if not self._speed_write_needed(host_name, level):
+            self._count_write(host_name, 'suppressed')
+            return True
+
+        applied = self._applied.get(host_name)
+        if applied and applied['mode'] == 'manual' and (not applied['confirmed'] or applied['level'] == int(level)):
+            # Periodic re-assert, or a retry of a failed one: an iDRAC reset
+            # silently returns fans to automatic mode.
+            if not self.set_fan_control('manual', host):
+                return False
 
         try:
-            output, error = run_command(host, cmd, logger=log, log_tag=host_name, debug=debug)
+            self._count_write(host_name, 'issued')
+            output, error = self._send_ipmi(host, cmd, ipmi_speed_args(level))
             if debug:
                 log("DEBUG", host_name, f"Command output: {output}")
             if error:
                 log("ERROR", host_name, f"Command error: {error}")
-            else:
-                if host_name in state:
-                    state[host_name]['fan_speed'] = int(level)
+                self._forget_level(host_name)
+                return False
+            if host_name in state:
+                state[host_name]['fan_speed'] = int(level)
+            applied = self._applied.setdefault(host_name, {'mode': None, 'confirmed': False})
+            applied['level'] = int(level)
+            applied['asserted_at'] = self._clock()
+            return True
         except Exception as e:
             log("ERROR", host_name, f"Error setting fan speed: {e}")
+            self._forget_level(host_name)
+            return False
+
+    def _forget_level(self, host_name):
+        if host_name in self._applied:
+            self._applied[host_name]['level'] = None
 
     def set_fan_control(self, mode: str, host: dict):
         host_name = host.get('name')
         debug = self.config.general.get('debug', False)
-        try:
-            cmd = build_ipmi_control_command(host, mode)
-        except ValueError:
+        cmd = plan_for(self.config, host).control_commands.get(mode)
+        if cmd is None:
             log("WARN", host_name, f"Unknown fan control mode: {mode}")
             state[host_name]['fan_control_mode'] = mode
             return False
@@ -99,8 +169,12 @@ class FanController:
             state[host_name]['fan_control_mode'] = mode
             return True
 
+        # Until the new mode is confirmed, the next speed must be written
+        # again. The requested mode is kept so a failed manual write is retried.
+        self._applied[host_name] = {'mode': mode, 'confirmed': False, 'level': None, 'asserted_at': None}
         try:
-            output, error = run_command(host, cmd, logger=log, log_tag=host_name, debug=debug)
+            self._count_write(host_name, 'mode_writes')
+            output, error = self._send_ipmi(host, cmd, ipmi_control_args(mode))
             if output:
                 log("DEBUG", host_name, f"Command output: {output}")
             if error:
@@ -108,17 +182,32 @@ class FanController:
                 return False
             else:
                 state[host_name]['fan_control_mode'] = mode
+                self._applied[host_name]['confirmed'] = True
                 return True
         except Exception as e:
             log("ERROR", host_name, f"Error setting fan control: {e}")
             return False
 
-    def apply_fan_speed(self, temp: float, host: dict):
+    def apply_fan_speed(self, temp: float, host: dict) -> Optional[int]:
+        """Apply the level for ``temp`` and return it.
+
+        Synchronous writes return the host's applied level; asynchronous ones
+        return the posted level, which the writer has not applied yet.
+        """
         if 'name' not in host:
             log("WARN", "FAN", "Invalid host config, missing name.")
-            return
+            return None
 
         level = self.compute_fan_speed_level(temp, host)
+        if self.config.general.get('async_fan_writes', False):
+            # The writer coalesces pending levels; a fail-safe level jumps the queue.
+            self.writer.post(host, level, fail_safe=temp >= FAIL_SAFE_TEMPERATURE)
+            log("INFO", host['name'], "Temp: {:.2f}°C, Mode: {}, Requested speed: {}%".format(
+                temp,
+                state[host['name']]['fan_control_mode'],
+                int(level)
+            ))
+            return int(level)
         self.set_fan_speed(level, host)
 
         log("INFO", host['name'], "Temp: {:.2f}°C, Mode: {}, Speed: {}%".format(
@@ -126,3 +215,4 @@ class FanController:
             state[host['name']]['fan_control_mode'],
             state[host['name']]['fan_speed']
         ))
+        return state[host['name']]['fan_speed']
@@ -0,0 +1,165 @@
+import threading
+import time
+from typing import Callable, Optional
+
+from state import state, state_version
+from utils import log
+
+
+class HostWriter:
+    """Background writer for one host fed by a latest-value-wins mailbox.
+
+    The mailbox holds at most one normal level and one fail-safe level. Posting
+    a normal level replaces any pending one. Posting a fail-safe level also
+    discards the pending normal level, and the fail-safe level is always
+    written before the next normal one.
+    """
+
+    def __init__(self, name: str, write: Callable[[float, dict], bool], clock=time.monotonic):
+        self.name = name
+        self._write = write
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._pending = None
+        self._fail_safe = None
+        self._busy = False
+        self._stopped = False
+        self.counters = {'posted': 0, 'written': 0, 'failed': 0, 'dropped': 0, 'fail_safe': 0}
+        self.latency = {'last': None, 'max': None, 'total': 0.0}
+        self._thread = threading.Thread(target=self._run, name=f"fan-writer-{name}", daemon=True)
+        self._thread.start()
+
+    def post(self, host: dict, level: float, fail_safe: bool = False):
+        with self._condition:
+            self.counters['posted'] += 1
+            if self._pending is not None:
+                self.counters['dropped'] += 1
+                self._pending = None
+            if fail_safe:
+                if self._fail_safe is not None:
+                    self.counters['dropped'] += 1
+                self._fail_safe = (host, level)
+                self.counters['fail_safe'] += 1
+            else:
+                self._pending = (host, level)
+            self._condition.notify()
+        self._publish()
+
+    def _take(self):
+        with self._condition:
+            while self._fail_safe is None and self._pending is None and not self._stopped:
+                self._condition.wait()
+            if self._stopped:
+                return None
+            if self._fail_safe is not None:
+                item, self._fail_safe = self._fail_safe, None
+            else:
+                item, self._pending = self._pending, None
+            self._busy = True
+            return item
+
+    def _run(self):
+        while True:
+            item = self._take()
+            if item is None:
+                return
+            host, level = item
+            started = self._clock()
+            try:
+                ok = self._write(level, host)
+            except Exception as exc:
+                log("ERROR", self.name, f"Error in fan writer: {exc}")
+                ok = False
+            elapsed = self._clock() - started
+            with self._condition:
+                self._busy = False
+                self.counters['written' if ok else 'failed'] += 1
+                self.latency['last'] = elapsed
+                self.latency['max'] = max(elapsed, self.latency['max'] or 0.0)
+                self.latency['total'] += elapsed
+                self._condition.notify_all()
+            # Kept apart from last_error, which the next sensor read clears.
+            if self.name in state:
+                state[self.name]['fan_write_error'] = (
+                    None if ok else f"Failed to set fan speed to {int(level)}%"
+                )
+            self._publish()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._stopped or not (self._busy or self._pending or self._fail_safe),
+                timeout,
+            )
+
+    def snapshot(self) -> dict:
+        with self._condition:
+            attempts = self.counters['written'] + self.counters['failed']
+            return dict(
+                self.counters,
+                queue_depth=(self._pending is not None) + (self._fail_safe is not None),
+                busy=self._busy,
+                last_latency_seconds=_rounded(self.latency['last']),
+                max_latency_seconds=_rounded(self.latency['max']),
+                avg_latency_seconds=_rounded(self.latency['total'] / attempts if attempts else None),
+            )
+
+    def _publish(self):
+        if self.name in state:
+            state[self.name]['fan_writer'] = self.snapshot()
+            state_version.publish()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Drop pending levels and wait up to ``timeout`` for an in-flight write."""
+        with self._condition:
+            self._stopped = True
+            self._pending = None
+            self._fail_safe = None
+            self._condition.notify_all()
+        self._thread.join(timeout)
+
+
+def _rounded(value):
+    return None if value is None else round(value, 4)
+
+
+class FanWriter:
+    """One ``HostWriter`` per host name, started on the first post."""
+
+    def __init__(self, write: Callable[[float, dict], bool], clock=time.monotonic):
+        self._write = write
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._writers = {}
+
+    def post(self, host: dict, level: float, fail_safe: bool = False):
+        name = host.get('name', 'host')
+        with self._lock:
+            writer = self._writers.get(name)
+            if writer is None:
+                writer = self._writers[name] = HostWriter(name, self._write, clock=self._clock)
+        writer.post(host, level, fail_safe=fail_safe)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else self._clock() + timeout
+        with self._lock:
+            writers = list(self._writers.values())
+        for writer in writers:
+            remaining = None if deadline is None else max(0.0, deadline - self._clock())
+            if not writer.wait_idle(remaining):
+                return False
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            writers = dict(self._writers)
+        return {name: writer.snapshot() for name, writer in writers.items()}
+
+    def close(self, timeout: Optional[float] = None):
+        """Stop every writer; pending levels are discarded, not written."""
+        with self._lock:
+            writers = list(self._writers.values())
+            self._writers.clear()
+        deadline = None if timeout is None else self._clock() + timeout
+        for writer in writers:
+            writer.stop(None if deadline is None else max(0.0, deadline - self._clock()))
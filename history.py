@@ -0,0 +1,290 @@
+import math
+import threading
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_HISTORY_CAPACITY = 120
+# (resolution, retention) in seconds: 1-minute buckets for 2 days, 15-minute buckets for 30 days.
+DEFAULT_ROLLUPS = ((60, 2 * 86400), (900, 30 * 86400))
+
+HOST_COLUMNS = ('monotonic', 'timestamp', 'temp_avg', 'temp_max', 'control_temperature', 'fan_speed')
+VM_COLUMNS = ('monotonic', 'timestamp', 'temp_avg', 'temp_max')
+
+
+class SampleRing:
+    """Fixed-capacity sample history stored as ``array('d')`` columns.
+
+    Appending overwrites the oldest sample once the ring is full, so memory
+    is allocated once. Missing values are stored as NaN and read back as
+    ``None``.
+    """
+
+    __slots__ = ('columns', 'capacity', '_data', '_next', '_count')
+
+    def __init__(self, capacity: int = DEFAULT_HISTORY_CAPACITY, columns: Sequence[str] = HOST_COLUMNS):
+        self.columns = tuple(columns)
+        self.capacity = capacity
+        self._data = {name: array('d', bytes(8 * capacity)) for name in self.columns}
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, **values: Optional[float]):
+        """Store one sample; columns that are not given or ``None`` are NaN."""
+        index = self._next
+        for name, column in self._data.items():
+            value = values.get(name)
+            column[index] = math.nan if value is None else value
+        self._next = (index + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def _start(self, last: Optional[int]) -> Tuple[int, int]:
+        count = self._count if last is None else max(0, min(last, self._count))
+        return (self._next - count) % self.capacity, count
+
+    def view(self, name: str, last: Optional[int] = None) -> Tuple[memoryview, ...]:
+        """Return up to two zero-copy segments holding the newest ``last`` values, oldest first."""
+        start, count = self._start(last)
+        buffer = memoryview(self._data[name])
+        end = start + count
+        if end <= self.capacity:
+            return (buffer[start:end],)
+        return (buffer[start:], buffer[:end - self.capacity])
+
+    def values(self, name: str, last: Optional[int] = None) -> List[Optional[float]]:
+        return [
+            None if math.isnan(value) else value
+            for segment in self.view(name, last)
+            for value in segment
+        ]
+
+    def latest(self) -> Optional[Dict[str, Optional[float]]]:
+        if not self._count:
+            return None
+        index = (self._next - 1) % self.capacity
+        return {
+            name: None if math.isnan(column[index]) else column[index]
+            for name, column in self._data.items()
+        }
+
+    def copy(self, columns: Sequence[str]) -> 'SampleRing':
+        """Return a ring holding a copy of ``columns`` only."""
+        ring = SampleRing.__new__(SampleRing)
+        ring.columns = tuple(columns)
+        ring.capacity = self.capacity
+        ring._data = {name: self._data[name][:] for name in ring.columns}
+        ring._next = self._next
+        ring._count = self._count
+        return ring
+
+    def memory_bytes(self) -> int:
+        return sum(column.itemsize * len(column) for column in self._data.values())
+
+    def stats(self) -> dict:
+        return {'samples': self._count, 'capacity': self.capacity, 'memory_bytes': self.memory_bytes()}
+
+
+class RollupRing:
+    """Fixed-capacity min/avg/max buckets of ``resolution`` seconds, aligned to wall-clock time.
+
+    Samples are folded into the newest bucket as they arrive; a sample in a
+    later bucket overwrites the oldest one once the ring is full. Buckets
+    without samples are not stored, so ``retention / resolution`` buckets
+    always cover at least ``retention`` seconds.
+    """
+
+    __slots__ = ('resolution', 'capacity', 'columns', '_start', '_min', '_max', '_sum', '_count', '_next', '_len')
+
+    def __init__(self, resolution: float, retention: float, columns: Sequence[str]):
+        self.resolution = resolution
+        self.capacity = max(1, math.ceil(retention / resolution))
+        self.columns = tuple(columns)
+        size = self.capacity
+        self._start = array('d', bytes(8 * size))
+        self._min = {name: array('d', bytes(8 * size)) for name in self.columns}
+        self._max = {name: array('d', bytes(8 * size)) for name in self.columns}
+        self._sum = {name: array('d', bytes(8 * size)) for name in self.columns}
+        self._count = {name: array('L', [0]) * size for name in self.columns}
+        self._next = 0
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def add(self, timestamp: float, values: Dict[str, Optional[float]]):
+        bucket = timestamp - timestamp % self.resolution
+        last = (self._next - 1) % self.capacity
+        if self._len and bucket < self._start[last]:
+            # The wall clock stepped back; keep folding into the newest bucket.
+            bucket = self._start[last]
+        if not self._len or bucket != self._start[last]:
+            last = self._next
+            self._start[last] = bucket
+            for name in self.columns:
+                self._min[name][last] = math.inf
+                self._max[name][last] = -math.inf
+                self._sum[name][last] = 0.0
+                self._count[name][last] = 0
+            self._next = (last + 1) % self.capacity
+            self._len = min(self._len + 1, self.capacity)
+        for name in self.columns:
+            value = values.get(name)
+            if value is None or math.isnan(value):
+                continue
+            self._min[name][last] = min(self._min[name][last], value)
+            self._max[name][last] = max(self._max[name][last], value)
+            self._sum[name][last] += value
+            self._count[name][last] += 1
+
+    def _indexes(self):
+        start = (self._next - self._len) % self.capacity
+        return [(start + offset) % self.capacity for offset in range(self._len)]
+
+    def oldest(self) -> Optional[float]:
+        return self._start[(self._next - self._len) % self.capacity] if self._len else None
+
+    def buckets(self, column: str, start: float = -math.inf, end: float = math.inf) -> dict:
+        """Return bucket start times and the min, avg, and max of ``column``, oldest first."""
+        result = {'timestamp': [], 'min': [], 'avg': [], 'max': []}
+        for index in self._indexes():
+            bucket = self._start[index]
+            if bucket + self.resolution <= start or bucket > end:
+                continue
+            count = self._count[column][index]
+            result['timestamp'].append(bucket)
+            result['min'].append(self._min[column][index] if count else None)
+            result['avg'].append(self._sum[column][index] / count if count else None)
+            result['max'].append(self._max[column][index] if count else None)
+        return result
+
+    def copy(self, columns: Sequence[str]) -> 'RollupRing':
+        """Return a ring holding a copy of the buckets of ``columns`` only."""
+        ring = RollupRing.__new__(RollupRing)
+        ring.resolution = self.resolution
+        ring.capacity = self.capacity
+        ring.columns = tuple(columns)
+        ring._start = self._start[:]
+        for table in ('_min', '_max', '_sum', '_count'):
+            setattr(ring, table, {name: getattr(self, table)[name][:] for name in ring.columns})
+        ring._next = self._next
+        ring._len = self._len
+        return ring
+
+    def memory_bytes(self) -> int:
+        arrays = [self._start]
+        for table in (self._min, self._max, self._sum, self._count):
+            arrays.extend(table.values())
+        return sum(column.itemsize * len(column) for column in arrays)
+
+
+class History:
+    """Raw ``SampleRing`` plus ``RollupRing`` tiers, all updated by ``append``.
+
+    An attached ``sink`` (a ``history_store.HistoryFile``) receives every
+    sample with a wall-clock timestamp as well. Queries from other threads
+    copy the columns they need under a lock held only for the copy, so
+    appends are never held up by downsampling or encoding.
+    """
+
+    __slots__ = ('raw', 'tiers', 'sink', '_lock')
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_HISTORY_CAPACITY,
+        columns: Sequence[str] = HOST_COLUMNS,
+        rollups: Sequence[Tuple[float, float]] = DEFAULT_ROLLUPS,
+    ):
+        self.raw = SampleRing(capacity, columns)
+        values = [name for name in columns if name not in ('monotonic', 'timestamp')]
+        self.tiers = tuple(
+            RollupRing(resolution, retention, values)
+            for resolution, retention in sorted(rollups)
+        )
+        self.sink = None
+        self._lock = threading.Lock()
+
+    def append(self, **values: Optional[float]):
+        with self._lock:
+            self._add(values)
+        if self.sink is not None and values.get('timestamp') is not None:
+            self.sink.append(values)
+
+    def _add(self, values):
+        self.raw.append(**values)
+        timestamp = values.get('timestamp')
+        if timestamp is not None:
+            for tier in self.tiers:
+                tier.add(timestamp, values)
+
+    def retention(self) -> float:
+        """Seconds of history the rollup tiers can hold."""
+        return max((tier.resolution * tier.capacity for tier in self.tiers), default=0.0)
+
+    def attach(self, sink, since: float = -math.inf):
+        """Replay ``sink``'s records from ``since`` on into the tiers, then write new samples to it.
+
+        Stored records have no monotonic time, so they are kept out of the
+        raw ring, which only holds samples taken by this process.
+        """
+        records = sink.records(start=since)
+        with self._lock:
+            for values in records:
+                for tier in self.tiers:
+                    tier.add(values['timestamp'], values)
+        self.sink = sink
+
+    def _raw_oldest(self):
+        for value in self.raw.values('timestamp'):
+            if value is not None:
+                return value
+        return None
+
+    def select(self, start: float, resolution: float = 0.0):
+        """Return the coarsest tier, or ``raw``, holding data from ``start`` at ``resolution`` or finer.
+
+        If no tier reaches back to ``start`` at that resolution, range wins:
+        the finest tier that reaches back is used, else the one with the
+        oldest data.
+        """
+        candidates = [(0.0, self._raw_oldest(), self.raw)]
+        candidates.extend((tier.resolution, tier.oldest(), tier) for tier in self.tiers)
+        candidates = [candidate for candidate in candidates if candidate[1] is not None]
+        covering = [candidate for candidate in candidates if candidate[1] <= start]
+        fine_enough = [candidate for candidate in covering if candidate[0] <= resolution]
+        if fine_enough:
+            return max(fine_enough, key=lambda candidate: candidate[0])[2]
+        if covering:
+            return min(covering, key=lambda candidate: candidate[0])[2]
+        if candidates:
+            return min(candidates, key=lambda candidate: candidate[1])[2]
+        return self.raw
+
+    def query(self, column: str, start: float, end: float, resolution: float = 0.0) -> dict:
+        """Return ``column`` between wall-clock ``start`` and ``end`` from the tier ``select`` picks."""
+        with self._lock:
+            source = self.select(start, resolution)
+            if isinstance(source, RollupRing):
+                source = source.copy((column,))
+            else:
+                source = source.copy(('timestamp', column))
+        if isinstance(source, RollupRing):
+            return dict(source.buckets(column, start, end), resolution=source.resolution)
+        result = {'timestamp': [], 'min': [], 'avg': [], 'max': [], 'resolution': 0.0}
+        for timestamp, value in zip(source.values('timestamp'), source.values(column)):
+            if timestamp is None or not start <= timestamp <= end:
+                continue
+            result['timestamp'].append(timestamp)
+            for key in ('min', 'avg', 'max'):
+                result[key].append(value)
+        return result
+
+    def stats(self) -> dict:
+        stats = self.raw.stats()
+        stats['rollups'] = [
+            {'resolution': tier.resolution, 'buckets': len(tier), 'capacity': tier.capacity}
+            for tier in self.tiers
+        ]
+        stats['memory_bytes'] += sum(tier.memory_bytes() for tier in self.tiers)
+        return stats
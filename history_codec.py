@@ -0,0 +1,88 @@
+import json
+import struct
+import sys
+from array import array
+from typing import Mapping
+
+BINARY_CONTENT_TYPE = "application/octet-stream"
+JSON_CONTENT_TYPE = "application/json; charset=utf-8"
+MAGIC = b"FCHB"
+VERSION = 1
+# magic, version, column count, point count, metadata length
+HEADER = struct.Struct("<4sBBxxII")
+# Timestamps need double precision; temperatures and fan speeds fit in single.
+COLUMNS = (("timestamp", "d"), ("min", "f"), ("avg", "f"), ("max", "f"))
+_TYPE_NAMES = {"d": "float64", "f": "float32"}
+_TYPES = {name: code for code, name in _TYPE_NAMES.items()}
+
+
+def _padded(data: bytes, fill: bytes = b"\0") -> bytes:
+    return data + fill * (-len(data) % 8)
+
+
+def encode_json(response: Mapping) -> bytes:
+    rounded = dict(response)
+    rounded["timestamp"] = [round(value, 3) for value in response["timestamp"]]
+    for key in ("min", "avg", "max"):
+        rounded[key] = [round(value, 2) for value in response[key]]
+    return json.dumps(rounded).encode("utf-8")
+
+
+def encode_binary(response: Mapping) -> bytes:
+    """Encode a history response as a header, JSON metadata, and little-endian column blocks.
+
+    The 16-byte header holds ``FCHB``, the format version, the column count,
+    the point count, and the metadata length. The metadata is a UTF-8 JSON
+    object with every non-array field plus ``columns``, a list of
+    ``[name, "float64" | "float32"]``. It is followed by one block per
+    column in that order. The metadata is padded with spaces and each block
+    with zeros to a multiple of 8 bytes, so every block can be viewed as a
+    typed array in place.
+    """
+    metadata = {key: value for key, value in response.items() if key not in dict(COLUMNS)}
+    metadata["columns"] = [[name, _TYPE_NAMES[code]] for name, code in COLUMNS]
+    metadata = _padded(json.dumps(metadata).encode("utf-8"), b" ")
+    points = len(response["timestamp"])
+    blocks = [HEADER.pack(MAGIC, VERSION, len(COLUMNS), points, len(metadata)), metadata]
+    for name, code in COLUMNS:
+        column = array(code, response[name])
+        if sys.byteorder != "little":
+            column.byteswap()
+        blocks.append(_padded(column.tobytes()))
+    return b"".join(blocks)
+
+
+def decode_binary(payload: bytes) -> dict:
+    magic, version, columns, points, metadata_length = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a version 1 binary history payload.")
+    offset = HEADER.size
+    response = json.loads(payload[offset:offset + metadata_length].decode("utf-8"))
+    offset += metadata_length
+    for name, type_name in response.pop("columns")[:columns]:
+        column = array(_TYPES[type_name])
+        size = points * column.itemsize
+        column.frombytes(payload[offset:offset + size])
+        if sys.byteorder != "little":
+            column.byteswap()
+        response[name] = column.tolist()
+        offset += size + -size % 8
+    return response
+
+
+def wants_binary(accept: str) -> bool:
+    """Return whether ``accept`` ranks ``application/octet-stream`` at least as high as JSON."""
+    ranks = {}
+    for entry in (accept or "").split(","):
+        media_type, _, parameters = entry.partition(";")
+        quality = 1.0
+        for parameter in parameters.split(";"):
+            key, _, value = parameter.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ranks[media_type.strip().lower()] = quality
+    binary = ranks.get(BINARY_CONTENT_TYPE, 0.0)
+    return binary > 0 and binary >= ranks.get("application/json", 0.0)
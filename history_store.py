@@ -0,0 +1,298 @@
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+from utils import log
+
+MAGIC = b'FCHIST01'
+VERSION = 1
+# magic, version, column count, record size, capacity, records ever written
+HEADER = struct.Struct('<8sHHHxxIQ')
+HEADER_CRC = struct.Struct('<I')
+HEADER_SIZE = 64
+DEFAULT_STORE_CAPACITY = 50000
+DEFAULT_FLUSH_INTERVAL = 60
+
+HOST_STORE_COLUMNS = ('timestamp', 'temp_avg', 'temp_max', 'control_temperature', 'fan_speed')
+VM_STORE_COLUMNS = ('timestamp', 'temp_avg', 'temp_max')
+
+
+def record_struct(columns: int) -> struct.Struct:
+    """Sequence number, ``columns`` doubles, and a CRC-32 of the preceding bytes, padded to 8 bytes."""
+    size = 8 + 8 * columns + 4
+    return struct.Struct(f'<Q{columns}dI{-size % 8}x')
+
+
+def _fsync_directory(path):
+    """Persist a rename in ``path``; a crash could otherwise revert to the old file."""
+    descriptor = os.open(path, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def _row(values: Mapping[str, Optional[float]], columns: Sequence[str]):
+    return [math.nan if values.get(name) is None else float(values[name]) for name in columns]
+
+
+class HistoryFile:
+    """Circular file of fixed-size records for one source, accessed through ``mmap``.
+
+    A record is written before the header's write count, so a crash can at
+    worst lose the newest record; torn records fail their checksum and are
+    skipped. Pages are flushed at most every ``flush_interval`` seconds, not
+    per sample. A file whose capacity differs from the configured one is
+    compacted into a new file that keeps the newest records.
+    """
+
+    def __init__(self, path: str, columns: Sequence[str], capacity: int = DEFAULT_STORE_CAPACITY,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, clock=time.monotonic):
+        self.path = path
+        self.columns = tuple(columns)
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.record = record_struct(len(self.columns))
+        self._body = struct.Struct(f'<Q{len(self.columns)}d')
+        self._padding = bytes(self.record.size - self._body.size - 4)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_flush = clock()
+        self.written = 0
+        self.skipped = 0
+        self._file = None
+        self._map = None
+        self._open()
+
+    def _size(self, capacity):
+        return HEADER_SIZE + capacity * self.record.size
+
+    def _open(self):
+        existing = None
+        if os.path.exists(self.path):
+            existing = self._inspect()
+        if existing is None:
+            self._create(self.path, self.capacity, [])
+        elif existing != self.capacity:
+            self._compact(existing)
+        self._map_file()
+        written = self._read_header()
+        if written is None:
+            written = self._recover()
+            log("WARN", "HISTORY", f"Recovered {self.path} header from its records.")
+            self._write_header(written)
+        self.written = written
+
+    def _inspect(self) -> Optional[int]:
+        """Return the capacity of a compatible existing file, or ``None`` to start a new one."""
+        with open(self.path, 'rb') as handle:
+            header = handle.read(HEADER.size)
+            handle.seek(0, os.SEEK_END)
+            size = handle.tell()
+        if len(header) < HEADER.size:
+            log("WARN", "HISTORY", f"Replacing truncated history file {self.path}.")
+            return None
+        magic, version, columns, record_size, capacity, _written = HEADER.unpack(header)
+        if (magic, version, columns, record_size) != (MAGIC, VERSION, len(self.columns), self.record.size) \
+                or size != self._size(capacity):
+            log("WARN", "HISTORY", f"Replacing incompatible history file {self.path}.")
+            return None
+        return capacity
+
+    def _create(self, path, capacity, rows):
+        temporary = f"{path}.tmp"
+        with open(temporary, 'wb') as handle:
+            size = self._size(capacity)
+            handle.truncate(size)
+            if hasattr(os, 'posix_fallocate'):
+                # Reserve the blocks now; a full disk would otherwise fault on a later page write.
+                os.posix_fallocate(handle.fileno(), 0, size)
+            for sequence, row in enumerate(rows):
+                handle.seek(HEADER_SIZE + (sequence % capacity) * self.record.size)
+                handle.write(self._pack(sequence, row))
+            handle.seek(0)
+            handle.write(self._header(capacity, len(rows)))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, path)
+        _fsync_directory(os.path.dirname(os.path.abspath(path)))
+
+    def _compact(self, capacity):
+        self.capacity, wanted = capacity, self.capacity
+        self._map_file()
+        written = self._read_header()
+        if written is None:
+            written = self._recover()
+        self.written = written
+        rows = [_row(values, self.columns) for values in self.records()[-wanted:]]
+        self._close_map()
+        self.capacity = wanted
+        self._create(self.path, wanted, rows)
+        log("INFO", "HISTORY", f"Compacted {self.path} from {capacity} to {wanted} records.")
+
+    def _map_file(self):
+        self._file = open(self.path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), self._size(self.capacity))
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def _header(self, capacity, written):
+        header = HEADER.pack(MAGIC, VERSION, len(self.columns), self.record.size, capacity, written)
+        return header + HEADER_CRC.pack(zlib.crc32(header))
+
+    def _read_header(self) -> Optional[int]:
+        header = self._map[:HEADER.size]
+        (crc,) = HEADER_CRC.unpack_from(self._map, HEADER.size)
+        if zlib.crc32(header) != crc:
+            return None
+        return HEADER.unpack(header)[5]
+
+    def _write_header(self, written):
+        self._map[:HEADER.size + HEADER_CRC.size] = self._header(self.capacity, written)
+
+    def _pack(self, sequence, row):
+        body = self._body.pack(sequence, *row)
+        return body + HEADER_CRC.pack(zlib.crc32(body)) + self._padding
+
+    def _valid(self, offset) -> Optional[Tuple]:
+        fields = self.record.unpack_from(self._map, offset)
+        with memoryview(self._map) as pages:
+            if zlib.crc32(pages[offset:offset + self._body.size]) != fields[-1]:
+                return None
+        return fields
+
+    def _recover(self) -> int:
+        """Find the write count from the highest valid sequence number."""
+        newest = -1
+        for slot in range(self.capacity):
+            fields = self._valid(HEADER_SIZE + slot * self.record.size)
+            if fields is not None and fields[0] % self.capacity == slot:
+                newest = max(newest, fields[0])
+        return newest + 1
+
+    def append(self, values: Mapping[str, Optional[float]]):
+        row = _row(values, self.columns)
+        with self._lock:
+            if self._map is None:
+                return
+            offset = HEADER_SIZE + (self.written % self.capacity) * self.record.size
+            self._map[offset:offset + self.record.size] = self._pack(self.written, row)
+            self.written += 1
+            self._write_header(self.written)
+            if self._clock() - self._last_flush >= self.flush_interval:
+                self._map.flush()
+                self._last_flush = self._clock()
+
+    def records(self, start: float = -math.inf, end: float = math.inf) -> List[Dict[str, Optional[float]]]:
+        """Return valid records between wall-clock ``start`` and ``end``, oldest first.
+
+        Records are decoded straight from the mapped pages; slots whose
+        checksum or sequence number does not match are skipped, and
+        ``skipped`` is set to their count in this scan.
+        """
+        records = []
+        with self._lock:
+            if self._map is None:
+                return records
+            written = self.written
+            first = max(0, written - self.capacity)
+            skipped = 0
+            for sequence in range(first, written):
+                fields = self._valid(HEADER_SIZE + (sequence % self.capacity) * self.record.size)
+                if fields is None or fields[0] != sequence:
+                    skipped += 1
+                    continue
+                values = fields[1:-1]
+                if not start <= values[0] <= end:
+                    continue
+                records.append(
+                    {name: None if math.isnan(value) else value for name, value in zip(self.columns, values)}
+                )
+            self.skipped = skipped
+        return records
+
+    def flush(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.flush()
+                self._last_flush = self._clock()
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.flush()
+            self._close_map()
+
+    def stats(self) -> dict:
+        return {
+            'records': min(self.written, self.capacity),
+            'capacity': self.capacity,
+            'file_bytes': self._size(self.capacity),
+            'skipped': self.skipped,
+        }
+
+
+class HistoryStore:
+    """One ``HistoryFile`` per source name in a directory, opened on first use."""
+
+    def __init__(self, settings: Optional[Mapping] = None):
+        self._lock = threading.Lock()
+        self._files = {}
+        self.settings = None
+        self.configure(settings)
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings is not None
+
+    def configure(self, settings: Optional[Mapping]):
+        """Apply new settings; open files are closed when they change.
+
+        If the directory cannot be created the store stays disabled and the
+        ``OSError`` is raised.
+        """
+        settings = dict(settings) if settings else None
+        if settings == self.settings:
+            return
+        self.close()
+        self.settings = None
+        if settings:
+            os.makedirs(settings['path'], exist_ok=True)
+        self.settings = settings
+
+    def source(self, name: str, columns: Sequence[str]) -> HistoryFile:
+        with self._lock:
+            history_file = self._files.get(name)
+            if history_file is None:
+                history_file = self._files[name] = HistoryFile(
+                    os.path.join(self.settings['path'], quote(name, safe='') + '.hist'),
+                    columns,
+                    capacity=self.settings.get('capacity', DEFAULT_STORE_CAPACITY),
+                    flush_interval=self.settings.get('flush_interval', DEFAULT_FLUSH_INTERVAL),
+                )
+            return history_file
+
+    def close(self):
+        with self._lock:
+            files = list(self._files.values())
+            self._files.clear()
+        for history_file in files:
+            history_file.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            files = dict(self._files)
+        return {name: history_file.stats() for name, history_file in files.items()}
+
+
+default_history_store = HistoryStore()
@@ -0,0 +1,124 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+from ipmi_commands import build_ipmi_control_command, build_ipmi_speed_command
+from utils import CommandSpec, ipmi_target, log
+
+FAN_CONTROL_MODES = ('manual', 'automatic')
+
+
+@dataclass(frozen=True, slots=True)
+class DevicePlan:
+    """Sensor lookup data for a host or one of its VMs."""
+
+    name: str
+    device: Mapping
+    gpu_commands: Tuple[Tuple[str, str], ...]
+    gpu_error: Optional[str]
+    # Neither pushed nor streamed, so every read contacts the device.
+    polled: bool
+
+
+@dataclass(frozen=True, slots=True)
+class HostPlan:
+    """Per-host data derived once from a validated host configuration.
+
+    ``host`` is the configuration dict the plan was compiled from; a plan is
+    only used for that same dict, so a reload always gets new plans.
+    """
+
+    name: str
+    host: Mapping
+    display_ip: str
+    ipmi_target: str
+    temperatures: Tuple[float, ...]
+    speeds: Tuple[float, ...]
+    hysteresis: float
+    control_commands: Mapping[str, CommandSpec]
+    speed_commands: Mapping[int, CommandSpec]
+    gpu: DevicePlan
+    vms: Mapping[str, DevicePlan]
+
+    def device(self, vm_name: Optional[str] = None) -> Optional[DevicePlan]:
+        return self.gpu if vm_name is None else self.vms.get(vm_name)
+
+    def speed_command(self, level: float) -> CommandSpec:
+        command = self.speed_commands.get(int(level))
+        return command if command is not None else build_ipmi_speed_command(self.host, level)
+
+
+def gpu_commands(device: Mapping, general: Mapping):
+    """Return the ``(vendor, command)`` pairs for ``device``'s ``gpu_type`` and an error, if any."""
+    name = device.get('name', '')
+    gpu_type = device.get('gpu_type')
+    if not gpu_type or (isinstance(gpu_type, list) and len(gpu_type) == 0):
+        return (), None
+    if isinstance(gpu_type, list):
+        gpu_types = [str(gt).lower() for gt in gpu_type]
+    elif isinstance(gpu_type, str):
+        gpu_types = [gpu_type.lower()]
+    else:
+        gpu_types = []
+
+    cmds = []
+    if any('nvidia' in gt for gt in gpu_types):
+        cmds.append(('nvidia', general['gpu_temperature_command_nvidia']))
+    if any('amd' in gt for gt in gpu_types):
+        cmds.append(('amd', general['gpu_temperature_command_amd']))
+
+    if not cmds:
+        error = f"Device {name} has invalid GPU type: {gpu_type}"
+        log("WARN", name, error)
+        return (), error
+    return tuple(cmds), None
+
+
+def compile_device(device: Mapping, general: Mapping) -> DevicePlan:
+    commands, error = gpu_commands(device, general)
+    return DevicePlan(
+        name=device.get('name', ''),
+        device=device,
+        gpu_commands=commands,
+        gpu_error=error,
+        polled=not device.get('push') and not device.get('streaming'),
+    )
+
+
+def compile_host(host: Mapping, general: Mapping) -> HostPlan:
+    speeds = tuple(host.get('speeds') or ())
+    return HostPlan(
+        name=host['name'],
+        host=host,
+        display_ip=(
+            host.get('ipmi_credentials', {}).get('host')
+            or host.get('ssh_credentials', {}).get('host')
+            or 'localhost'
+        ),
+        ipmi_target=ipmi_target(host),
+        temperatures=tuple(host.get('temperatures') or ()),
+        speeds=speeds,
+        hysteresis=host.get('hysteresis', 0),
+        control_commands=MappingProxyType(
+            {mode: build_ipmi_control_command(host, mode) for mode in FAN_CONTROL_MODES}
+        ),
+        speed_commands=MappingProxyType(
+            {int(level): build_ipmi_speed_command(host, level) for level in speeds}
+        ),
+        gpu=compile_device(host, general),
+        vms=MappingProxyType(
+            {vm['name']: compile_device(vm, general) for vm in host.get('vms') or []}
+        ),
+    )
+
+
+def compile_plans(hosts, general: Mapping) -> Mapping[str, HostPlan]:
+    return MappingProxyType({host['name']: compile_host(host, general) for host in hosts})
+
+
+def plan_for(config, host: Mapping) -> HostPlan:
+    """Return the plan compiled at load for ``host``, compiling one if ``host`` has none."""
+    plan = (getattr(config, 'plans', None) or {}).get(host.get('name'))
+    if plan is not None and plan.host is host:
+        return plan
+    return compile_host(host, config.general)
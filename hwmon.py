@@ -0,0 +1,118 @@
+import os
+import re
+import threading
+from typing import List, Optional
+
+HWMON_ROOT = "/sys/class/hwmon"
+CPU_CHIPS = ("coretemp", "k10temp", "zenpower")
+_TEMP_INPUT = re.compile(r"^temp(\d+)_input$")
+
+
+def _read_text(path):
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            return handle.read().strip()
+    except OSError:
+        return None
+
+
+def _select_sensors(chip, sensors):
+    """Keep the per-core or per-die inputs that the default ``sensors`` command reports."""
+    labelled = [sensor for sensor in sensors if sensor[1]]
+    if chip == "coretemp":
+        cores = [sensor for sensor in labelled if sensor[1].startswith("Core ")]
+        return cores or sensors
+    dies = [sensor for sensor in labelled if sensor[1].startswith("Tccd")]
+    if dies:
+        return dies
+    for label in ("Tdie", "Tctl"):
+        matching = [sensor for sensor in labelled if sensor[1] == label]
+        if matching:
+            return matching
+    return sensors
+
+
+class HwmonCpuReader:
+    """Read local CPU temperatures straight from hwmon sysfs files.
+
+    The matching ``temp*_input`` files are discovered once and kept open, so
+    each read is a single ``pread`` per sensor instead of a shell pipeline.
+    """
+
+    def __init__(self, root: str = HWMON_ROOT):
+        self.root = root
+        self._lock = threading.Lock()
+        self._sensors = None
+
+    @property
+    def paths(self) -> List[str]:
+        with self._lock:
+            return [path for path, _fd in self._sensors or []]
+
+    def discover(self):
+        sensors = []
+        try:
+            chips = sorted(os.listdir(self.root), key=_natural_key)
+        except OSError:
+            chips = []
+        for entry in chips:
+            chip_dir = os.path.join(self.root, entry)
+            chip = _read_text(os.path.join(chip_dir, "name"))
+            if chip not in CPU_CHIPS:
+                continue
+            try:
+                names = os.listdir(chip_dir)
+            except OSError:
+                continue
+            inputs = []
+            for name in names:
+                match = _TEMP_INPUT.match(name)
+                if match:
+                    index = int(match.group(1))
+                    label = _read_text(os.path.join(chip_dir, f"temp{index}_label"))
+                    inputs.append((index, label, os.path.join(chip_dir, name)))
+            inputs.sort()
+            sensors.extend(path for _index, _label, path in _select_sensors(chip, inputs))
+
+        opened = []
+        try:
+            for path in sensors:
+                opened.append((path, os.open(path, os.O_RDONLY)))
+        except OSError:
+            for _path, fd in opened:
+                os.close(fd)
+            raise
+        with self._lock:
+            previous, self._sensors = self._sensors, opened
+        for _path, fd in previous or []:
+            os.close(fd)
+
+    def read(self) -> Optional[List[float]]:
+        with self._lock:
+            sensors = self._sensors
+        if sensors is None:
+            self.discover()
+        else:
+            try:
+                return self._read(sensors)
+            except OSError:
+                # hwmon devices are renumbered when a driver is reloaded.
+                self.discover()
+        with self._lock:
+            sensors = self._sensors
+        return self._read(sensors)
+
+    @staticmethod
+    def _read(sensors):
+        temps = [int(os.pread(fd, 32, 0)) / 1000.0 for _path, fd in sensors]
+        return temps or None
+
+    def close(self):
+        with self._lock:
+            sensors, self._sensors = self._sensors, None
+        for _path, fd in sensors or []:
+            os.close(fd)
+
+
+def _natural_key(name):
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
@@ -0,0 +1,36 @@
+from utils import CommandSpec
+
+
+def build_ipmi_command(host: dict, raw_args) -> CommandSpec:
+    ipmi = host.get('ipmi_credentials')
+    argv = ['ipmitool']
+    stdin_data = None
+    if ipmi:
+        argv.extend([
+            '-I', 'lanplus',
+            '-H', str(ipmi['host']).strip(),
+            '-U', str(ipmi['username']),
+            '-f', '/dev/stdin',
+        ])
+        stdin_data = f"{ipmi['password']}\n"
+    argv.extend(raw_args)
+    return CommandSpec(argv=argv, stdin_data=stdin_data)
+
+
+def ipmi_control_args(mode: str) -> list:
+    mode_value = {'manual': '0x00', 'automatic': '0x01'}.get(mode)
+    if mode_value is None:
+        raise ValueError(f"Unknown fan control mode: {mode}")
+    return ['raw', '0x30', '0x30', '0x01', mode_value]
+
+
+def ipmi_speed_args(level: float) -> list:
+    return ['raw', '0x30', '0x30', '0x02', '0xff', f'0x{int(level):02x}']
+
+
+def build_ipmi_control_command(host: dict, mode: str) -> CommandSpec:
+    return build_ipmi_command(host, ipmi_control_args(mode))
+
+
+def build_ipmi_speed_command(host: dict, level: float) -> CommandSpec:
+    return build_ipmi_command(host, ipmi_speed_args(level))
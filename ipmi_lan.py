@@ -0,0 +1,496 @@
+"""In-process IPMI v2.0 RMCP+ ("lanplus") client for Dell raw fan commands.
+
+Only cipher suite 3 is implemented: RAKP-HMAC-SHA1 authentication,
+HMAC-SHA1-96 integrity, and AES-CBC-128 confidentiality. ``cryptography`` is
+imported on first use, so the module loads without it.
+"""
+
+import hashlib
+import hmac
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Optional, Sequence, Tuple
+
+from utils import CommandTimeout, CommandTimeouts
+
+IPMI_PORT = 623
+RMCP_HEADER = b"\x06\x00\xff\x07"
+AUTH_RMCP_PLUS = 0x06
+
+PAYLOAD_IPMI = 0x00
+PAYLOAD_OPEN_SESSION_REQUEST = 0x10
+PAYLOAD_OPEN_SESSION_RESPONSE = 0x11
+PAYLOAD_RAKP1 = 0x12
+PAYLOAD_RAKP2 = 0x13
+PAYLOAD_RAKP3 = 0x14
+PAYLOAD_RAKP4 = 0x15
+PAYLOAD_ENCRYPTED = 0x80
+PAYLOAD_AUTHENTICATED = 0x40
+
+PRIVILEGE_ADMINISTRATOR = 0x04
+# RAKP1 role: administrator with name-only user lookup, as ipmitool sends it.
+RAKP_ROLE = 0x10 | PRIVILEGE_ADMINISTRATOR
+
+BMC_ADDRESS = 0x20
+CONSOLE_ADDRESS = 0x81
+NETFN_APP = 0x06
+CMD_GET_DEVICE_ID = 0x01
+CMD_SET_SESSION_PRIVILEGE = 0x3B
+CMD_CLOSE_SESSION = 0x3C
+
+_AUTH_CODE_SIZE = 12
+_AES_BLOCK = 16
+
+# Authentication, integrity, and confidentiality algorithm records of suite 3.
+CIPHER_SUITE_3 = bytes([
+    0x00, 0, 0, 8, 0x01, 0, 0, 0,
+    0x01, 0, 0, 8, 0x01, 0, 0, 0,
+    0x02, 0, 0, 8, 0x01, 0, 0, 0,
+])
+
+
+class IpmiLanError(Exception):
+    pass
+
+
+class IpmiLanTimeout(IpmiLanError):
+    pass
+
+
+class IpmiLanAuthError(IpmiLanError):
+    pass
+
+
+class MalformedPacket(IpmiLanError):
+    """A reply that is not a valid answer; it is ignored rather than fatal."""
+
+
+def _hmac_sha1(key: bytes, data: bytes) -> bytes:
+    return hmac.new(key, data, hashlib.sha1).digest()
+
+
+def checksum(data: bytes) -> int:
+    return -sum(data) & 0xFF
+
+
+def _aes(key: bytes, iv: bytes):
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+    return Cipher(algorithms.AES(key), modes.CBC(iv))
+
+
+def encrypt_payload(k2: bytes, payload: bytes, iv: Optional[bytes] = None) -> bytes:
+    pad_length = (_AES_BLOCK - (len(payload) + 1) % _AES_BLOCK) % _AES_BLOCK
+    plain = payload + bytes(range(1, pad_length + 1)) + bytes([pad_length])
+    iv = iv or os.urandom(_AES_BLOCK)
+    encryptor = _aes(k2[:_AES_BLOCK], iv).encryptor()
+    return iv + encryptor.update(plain) + encryptor.finalize()
+
+
+def decrypt_payload(k2: bytes, data: bytes) -> bytes:
+    if len(data) < 2 * _AES_BLOCK or len(data) % _AES_BLOCK:
+        raise MalformedPacket("encrypted payload has an invalid length")
+    decryptor = _aes(k2[:_AES_BLOCK], data[:_AES_BLOCK]).decryptor()
+    plain = decryptor.update(data[_AES_BLOCK:]) + decryptor.finalize()
+    pad_length = plain[-1]
+    if pad_length >= len(plain):
+        raise MalformedPacket("encrypted payload has an invalid pad")
+    return plain[:-1 - pad_length]
+
+
+def build_packet(payload_type: int, session_id: int, sequence: int, payload: bytes,
+                 k1: Optional[bytes] = None, k2: Optional[bytes] = None) -> bytes:
+    """Frame ``payload`` as an RMCP+ session packet, encrypting and signing it with session keys."""
+    if k2 is not None:
+        payload = encrypt_payload(k2, payload)
+        payload_type |= PAYLOAD_ENCRYPTED
+    if k1 is not None:
+        payload_type |= PAYLOAD_AUTHENTICATED
+    body = bytes([AUTH_RMCP_PLUS, payload_type]) + struct.pack(
+        "<IIH", session_id, sequence, len(payload)
+    ) + payload
+    if k1 is not None:
+        pad = (4 - (len(body) + 2) % 4) % 4
+        body += b"\xff" * pad + bytes([pad, 0x07])
+        body += _hmac_sha1(k1, body)[:_AUTH_CODE_SIZE]
+    return RMCP_HEADER + body
+
+
+def parse_packet(packet: bytes, k1: Optional[bytes] = None,
+                 k2: Optional[bytes] = None) -> Tuple[int, int, int, bytes]:
+    """Return ``(payload_type, session_id, sequence, payload)`` of an RMCP+ packet."""
+    if len(packet) < 16 or packet[:4] != RMCP_HEADER or packet[4] != AUTH_RMCP_PLUS:
+        raise MalformedPacket("not an RMCP+ packet")
+    body = packet[4:]
+    payload_type = body[1]
+    session_id, sequence, length = struct.unpack("<IIH", body[2:12])
+    payload = body[12:12 + length]
+    if len(payload) != length:
+        raise MalformedPacket("truncated RMCP+ packet")
+    if payload_type & PAYLOAD_AUTHENTICATED:
+        if k1 is None:
+            raise MalformedPacket("unexpected authenticated packet")
+        signed, auth_code = body[:-_AUTH_CODE_SIZE], body[-_AUTH_CODE_SIZE:]
+        if not hmac.compare_digest(auth_code, _hmac_sha1(k1, signed)[:_AUTH_CODE_SIZE]):
+            raise MalformedPacket("RMCP+ integrity check failed")
+    elif k1 is not None and session_id:
+        raise MalformedPacket("unauthenticated packet inside a session")
+    if payload_type & PAYLOAD_ENCRYPTED:
+        if k2 is None:
+            raise MalformedPacket("unexpected encrypted packet")
+        payload = decrypt_payload(k2, payload)
+    return payload_type & 0x3F, session_id, sequence, payload
+
+
+def build_ipmi_request(netfn: int, command: int, data: bytes, rq_seq: int) -> bytes:
+    header = bytes([BMC_ADDRESS, netfn << 2])
+    body = bytes([CONSOLE_ADDRESS, (rq_seq & 0x3F) << 2, command]) + bytes(data)
+    return header + bytes([checksum(header)]) + body + bytes([checksum(body)])
+
+
+def parse_ipmi_response(message: bytes) -> Tuple[int, int, int, int, bytes]:
+    """Return ``(netfn, rq_seq, command, completion_code, data)`` of a response message."""
+    if len(message) < 8:
+        raise MalformedPacket("IPMI response is too short")
+    if checksum(message[:2]) != message[2] or checksum(message[3:-1]) != message[-1]:
+        raise MalformedPacket("IPMI response checksum mismatch")
+    return message[1] >> 2, message[4] >> 2, message[5], message[6], message[7:-1]
+
+
+def rakp2_auth_code(kuid, console_sid, bmc_sid, console_random, bmc_random, guid, role, username):
+    return _hmac_sha1(
+        kuid,
+        console_sid + bmc_sid + console_random + bmc_random + guid
+        + bytes([role, len(username)]) + username,
+    )
+
+
+def rakp3_auth_code(kuid, bmc_random, console_sid, role, username):
+    return _hmac_sha1(kuid, bmc_random + console_sid + bytes([role, len(username)]) + username)
+
+
+def session_keys(kg, console_random, bmc_random, role, username):
+    """Return ``(sik, k1, k2)`` derived as in IPMI v2.0 section 13.31/13.32."""
+    sik = _hmac_sha1(kg, console_random + bmc_random + bytes([role, len(username)]) + username)
+    return sik, _hmac_sha1(sik, b"\x01" * 20), _hmac_sha1(sik, b"\x02" * 20)
+
+
+def rakp4_integrity_value(sik, console_random, console_sid, guid):
+    """Return HMAC-SHA1-96 over ``Rm | SIDm | GUIDc`` keyed with the SIK (IPMI v2.0 section 13.28)."""
+    return _hmac_sha1(sik, console_random + console_sid + guid)[:_AUTH_CODE_SIZE]
+
+
+def parse_raw_args(raw_args: Sequence[str]) -> Tuple[int, int, bytes]:
+    """Convert ``['raw', netfn, cmd, *data]`` ipmitool arguments into bytes."""
+    if len(raw_args) < 3 or raw_args[0] != "raw":
+        raise ValueError(f"Unsupported IPMI command: {' '.join(raw_args)}")
+    values = [int(value, 0) for value in raw_args[1:]]
+    return values[0], values[1], bytes(values[2:])
+
+
+class LanplusSession:
+    """One authenticated RMCP+ session to a BMC, re-established on failure."""
+
+    def __init__(self, host: str, username: str, password: str, port: int = IPMI_PORT,
+                 retry_interval: float = 1.0, attempts: int = 3, clock=time.monotonic):
+        self.address = (host, port)
+        self.attempts = attempts
+        self.username = username.encode("utf-8")
+        self.kuid = password.encode("utf-8")[:20]
+        self.retry_interval = retry_interval
+        self.lock = threading.Lock()
+        self.authentications = 0
+        self._clock = clock
+        self._socket = None
+        self._bmc_sid = None
+        self._k1 = self._k2 = None
+        self._sequence = 0
+        self._rq_seq = 0
+        self.last_used = None
+
+    @property
+    def active(self) -> bool:
+        return self._bmc_sid is not None
+
+    def _exchange(self, packet: bytes, deadline: float, accept):
+        """Send ``packet`` until ``accept(reply)`` returns a value.
+
+        The packet is retransmitted every ``retry_interval`` seconds, at most
+        ``attempts`` times and never past ``deadline``.
+        """
+        for _attempt in range(self.attempts):
+            remaining = deadline - self._clock()
+            if remaining <= 0:
+                break
+            self._socket.send(packet)
+            wait_until = self._clock() + min(self.retry_interval, remaining)
+            while True:
+                remaining = wait_until - self._clock()
+                if remaining <= 0:
+                    break
+                self._socket.settimeout(remaining)
+                try:
+                    reply = self._socket.recv(2048)
+                except socket.timeout:
+                    break
+                try:
+                    result = accept(reply)
+                except (MalformedPacket, IndexError, ValueError, struct.error):
+                    continue
+                if result is not None:
+                    return result
+        raise IpmiLanTimeout(f"BMC {self.address[0]} did not answer")
+
+    def open(self, deadline: float):
+        self.close_socket()
+        family = socket.AF_INET6 if ":" in self.address[0] else socket.AF_INET
+        self._socket = socket.socket(family, socket.SOCK_DGRAM)
+        self._socket.connect(self.address)
+        console_sid = os.urandom(4)
+        tag = os.urandom(1)[0]
+
+        request = bytes([tag, PRIVILEGE_ADMINISTRATOR, 0, 0]) + console_sid + CIPHER_SUITE_3
+
+        def open_response(reply):
+            payload_type, _sid, _seq, payload = parse_packet(reply)
+            if payload_type != PAYLOAD_OPEN_SESSION_RESPONSE or payload[0] != tag:
+                return None
+            if payload[1] != 0:
+                raise_status("Open Session", payload[1])
+            if payload[4:8] != console_sid:
+                return None
+            return payload[8:12]
+
+        bmc_sid = self._exchange(
+            build_packet(PAYLOAD_OPEN_SESSION_REQUEST, 0, 0, request), deadline, open_response
+        )
+
+        console_random = os.urandom(16)
+        rakp1 = (
+            bytes([tag, 0, 0, 0]) + bmc_sid + console_random
+            + bytes([RAKP_ROLE, 0, 0, len(self.username)]) + self.username
+        )
+
+        def rakp2(reply):
+            payload_type, _sid, _seq, payload = parse_packet(reply)
+            if payload_type != PAYLOAD_RAKP2 or payload[0] != tag:
+                return None
+            if payload[1] != 0:
+                raise_status("RAKP", payload[1])
+            bmc_random, guid, auth_code = payload[8:24], payload[24:40], payload[40:60]
+            expected = rakp2_auth_code(
+                self.kuid, console_sid, bmc_sid, console_random, bmc_random, guid,
+                RAKP_ROLE, self.username,
+            )
+            if not hmac.compare_digest(auth_code, expected):
+                raise IpmiLanAuthError("BMC rejected the IPMI username or password")
+            return bmc_random, guid
+
+        bmc_random, guid = self._exchange(
+            build_packet(PAYLOAD_RAKP1, 0, 0, rakp1), deadline, rakp2
+        )
+        sik, k1, k2 = session_keys(self.kuid, console_random, bmc_random, RAKP_ROLE, self.username)
+        rakp3 = bytes([tag, 0, 0, 0]) + bmc_sid + rakp3_auth_code(
+            self.kuid, bmc_random, console_sid, RAKP_ROLE, self.username
+        )
+
+        def rakp4(reply):
+            payload_type, _sid, _seq, payload = parse_packet(reply)
+            if payload_type != PAYLOAD_RAKP4 or payload[0] != tag:
+                return None
+            if payload[1] != 0:
+                raise_status("RAKP", payload[1])
+            if not hmac.compare_digest(
+                payload[8:20], rakp4_integrity_value(sik, console_random, console_sid, guid)
+            ):
+                raise IpmiLanAuthError("BMC RAKP4 integrity check failed")
+            return True
+
+        self._exchange(build_packet(PAYLOAD_RAKP3, 0, 0, rakp3), deadline, rakp4)
+        self._bmc_sid = struct.unpack("<I", bmc_sid)[0]
+        self._k1, self._k2 = k1, k2
+        self._sequence = 0
+        self.authentications += 1
+        code, _data = self.request(NETFN_APP, CMD_SET_SESSION_PRIVILEGE, bytes([PRIVILEGE_ADMINISTRATOR]), deadline)
+        if code != 0:
+            self.close(deadline)
+            raise IpmiLanError(f"BMC refused administrator privilege (completion code 0x{code:02x})")
+
+    def request(self, netfn: int, command: int, data: bytes, deadline: float) -> Tuple[int, bytes]:
+        """Send one IPMI request in the active session and return ``(completion_code, data)``."""
+        self._rq_seq = (self._rq_seq + 1) & 0x3F
+        rq_seq = self._rq_seq
+        self._sequence = self._sequence % 0xFFFFFFFF + 1
+        message = build_ipmi_request(netfn, command, data, rq_seq)
+        packet = build_packet(PAYLOAD_IPMI, self._bmc_sid, self._sequence, message, self._k1, self._k2)
+
+        def response(reply):
+            payload_type, _sid, _seq, payload = parse_packet(reply, self._k1, self._k2)
+            if payload_type != PAYLOAD_IPMI:
+                return None
+            reply_netfn, reply_seq, reply_command, code, reply_data = parse_ipmi_response(payload)
+            if reply_netfn != netfn + 1 or reply_seq != rq_seq or reply_command != command:
+                return None
+            return code, reply_data
+
+        result = self._exchange(packet, deadline, response)
+        self.last_used = self._clock()
+        return result
+
+    def execute(self, netfn: int, command: int, data: bytes, deadline: float) -> Tuple[int, bytes]:
+        """Run a request, authenticating first and once more if the session has expired."""
+        if not self.active:
+            self.open(deadline)
+            return self.request(netfn, command, data, deadline)
+        try:
+            return self.request(netfn, command, data, deadline)
+        except IpmiLanTimeout:
+            # An expired session is silently dropped by most BMCs.
+            self.reset()
+            self.open(deadline)
+            return self.request(netfn, command, data, deadline)
+
+    def keepalive(self, idle_seconds: float, deadline: float):
+        if self.active and self.last_used is not None and self._clock() - self.last_used >= idle_seconds:
+            try:
+                self.request(NETFN_APP, CMD_GET_DEVICE_ID, b"", deadline)
+            except IpmiLanError:
+                self.reset()
+
+    def close(self, deadline: Optional[float] = None):
+        if self.active:
+            try:
+                self.request(
+                    NETFN_APP, CMD_CLOSE_SESSION, struct.pack("<I", self._bmc_sid),
+                    deadline if deadline is not None else self._clock() + self.retry_interval,
+                )
+            except (IpmiLanError, OSError):
+                pass
+        self.reset()
+
+    def reset(self):
+        self._bmc_sid = None
+        self._k1 = self._k2 = None
+        self.close_socket()
+
+    def close_socket(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+_STATUS_MESSAGES = {
+    0x01: "insufficient resources to create a session",
+    0x02: "invalid session ID",
+    0x09: "invalid role",
+    0x0D: "unauthorized name",
+    0x12: "invalid integrity check value",
+}
+
+
+def raise_status(stage, status):
+    message = _STATUS_MESSAGES.get(status, f"status code 0x{status:02x}")
+    error = IpmiLanAuthError if status in (0x0D, 0x12) else IpmiLanError
+    raise error(f"{stage} failed: {message}")
+
+
+class LanplusPool:
+    """Authenticated ``LanplusSession`` objects keyed by BMC and credentials.
+
+    A background thread sends Get Device ID on sessions idle for
+    ``keepalive_interval`` seconds so the BMC does not expire them between
+    fan writes.
+    """
+
+    def __init__(self, port: int = IPMI_PORT, keepalive_interval: float = 30.0, retry_interval: float = 1.0):
+        self.port = port
+        self.keepalive_interval = keepalive_interval
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._stop = threading.Event()
+        self._keepalive_thread = None
+
+    @staticmethod
+    def _key(ipmi):
+        digest = hashlib.sha256(str(ipmi['password']).encode("utf-8")).hexdigest()
+        return str(ipmi['host']).strip(), str(ipmi['username']), digest
+
+    def _session(self, ipmi):
+        key = self._key(ipmi)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = LanplusSession(
+                    key[0], key[1], str(ipmi['password']), port=self.port,
+                    retry_interval=self.retry_interval,
+                )
+            if self._keepalive_thread is None and self.keepalive_interval > 0:
+                self._stop.clear()
+                self._keepalive_thread = threading.Thread(
+                    target=self._keepalive_loop, name="ipmi-lan-keepalive", daemon=True
+                )
+                self._keepalive_thread.start()
+        return session
+
+    def execute(self, host: dict, raw_args: Sequence[str], timeouts: Optional[CommandTimeouts] = None):
+        """Run ipmitool-style ``raw`` arguments and return ``(output, error)`` like ``run_command``."""
+        total = timeouts.total if timeouts and timeouts.total else 30.0
+        deadline = time.monotonic() + total
+        try:
+            netfn, command, data = parse_raw_args(raw_args)
+        except ValueError as exc:
+            return None, str(exc)
+        session = self._session(host['ipmi_credentials'])
+        with session.lock:
+            try:
+                code, reply = session.execute(netfn, command, data, deadline)
+            except IpmiLanTimeout as exc:
+                session.reset()
+                return None, CommandTimeout(f"{exc} ({total:g}s)")
+            except (IpmiLanError, OSError) as exc:
+                session.reset()
+                return None, f"IPMI lanplus error: {exc}"
+        if code != 0:
+            return None, f"IPMI command failed with completion code 0x{code:02x}"
+        return " ".join(f"{value:02x}" for value in reply), ""
+
+    def _keepalive_loop(self):
+        while not self._stop.wait(max(1.0, self.keepalive_interval / 2)):
+            with self._lock:
+                sessions = list(self._sessions.values())
+            for session in sessions:
+                if session.lock.acquire(blocking=False):
+                    try:
+                        session.keepalive(
+                            self.keepalive_interval, time.monotonic() + self.retry_interval * 3
+                        )
+                    finally:
+                        session.lock.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            'sessions': len(sessions),
+            'active': sum(session.active for session in sessions),
+            'authentications': sum(session.authentications for session in sessions),
+        }
+
+    def close_all(self):
+        self._stop.set()
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            thread, self._keepalive_thread = self._keepalive_thread, None
+        for session in sessions:
+            with session.lock:
+                session.close()
+        if thread is not None:
+            thread.join(timeout=5)
+
+
+default_lan_pool = LanplusPool()
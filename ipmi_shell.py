@@ -0,0 +1,181 @@
+import hashlib
+import os
+import select
+import signal
+import subprocess
+import threading
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+from utils import CommandTimeout, CommandTimeouts
+
+PROMPT = b"ipmitool> "
+_HEX_DIGITS = set("0123456789abcdefABCDEF")
+
+
+def shell_argv(host: dict, executable: str = "ipmitool") -> Tuple[list, dict]:
+    """Return the ``ipmitool shell`` argv and extra environment for ``host``.
+
+    The shell reads commands from stdin, so the password cannot be passed
+    with ``-f /dev/stdin`` as for one-shot commands; ``-E`` reads it from
+    ``IPMI_PASSWORD`` instead, which keeps it out of the process arguments.
+    """
+    ipmi = host.get('ipmi_credentials')
+    argv = [executable]
+    env = {}
+    if ipmi:
+        argv.extend([
+            '-I', 'lanplus',
+            '-H', str(ipmi['host']).strip(),
+            '-U', str(ipmi['username']),
+            '-E',
+        ])
+        env['IPMI_PASSWORD'] = str(ipmi['password'])
+    argv.append('shell')
+    return argv, env
+
+
+def parse_raw_response(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """Split shell output for a ``raw`` command into ``(output, error)``."""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if all(len(token) == 2 and set(token) <= _HEX_DIGITS for line in lines for token in line.split()):
+        return " ".join(lines), ""
+    return None, "\n".join(lines)
+
+
+class IpmiShell:
+    """One ``ipmitool shell`` coprocess with prompt-framed request/response."""
+
+    def __init__(self, argv: Sequence[str], env: Optional[Dict[str, str]] = None):
+        self.argv = list(argv)
+        self.env = dict(env or {})
+        self.lock = threading.Lock()
+        self.starts = 0
+        self._process = None
+        self._buffer = b""
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def _start(self, deadline):
+        self._process = subprocess.Popen(
+            self.argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=dict(os.environ, **self.env),
+            start_new_session=True,
+        )
+        self._buffer = b""
+        self.starts += 1
+        self._read_until_prompt(deadline)
+
+    def _read_until_prompt(self, deadline) -> bytes:
+        fd = self._process.stdout.fileno()
+        while True:
+            index = self._buffer.find(PROMPT)
+            if index != -1:
+                response = self._buffer[:index]
+                self._buffer = self._buffer[index + len(PROMPT):]
+                return response
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError("ipmitool shell did not answer before the deadline")
+            readable, _, _ = select.select([fd], [], [], remaining)
+            if not readable:
+                continue
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                raise EOFError("ipmitool shell exited")
+            self._buffer += chunk
+
+    def execute(self, raw_args: Sequence[str], timeouts: Optional[CommandTimeouts] = None):
+        """Send one command and return ``(output, error)`` like ``run_command``.
+
+        The coprocess is restarted on the next call after any error, timeout,
+        or unexpected exit, so a broken RMCP+ session is never reused.
+        """
+        line = " ".join(raw_args)
+        total = timeouts.total if timeouts else None
+        deadline = None if total is None else time.monotonic() + total
+        with self.lock:
+            try:
+                if not self.running:
+                    self.close()
+                    self._start(deadline)
+                self._process.stdin.write(line.encode("utf-8") + b"\n")
+                self._process.stdin.flush()
+                response = self._read_until_prompt(deadline).decode("utf-8", "replace")
+            except TimeoutError as exc:
+                self.close()
+                return None, CommandTimeout(f"{exc} ({total:g}s)")
+            except (OSError, EOFError) as exc:
+                self.close()
+                return None, f"ipmitool shell failed: {exc}"
+
+            lines = response.splitlines()
+            # readline echoes the command when stdin is not a terminal.
+            if lines and lines[0].strip() == line:
+                lines = lines[1:]
+            output, error = parse_raw_response("\n".join(lines))
+            if error:
+                self.close()
+            return output, error
+
+    def close(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
+        process.stdin.close()
+        process.stdout.close()
+
+
+class IpmiShellPool:
+    """``IpmiShell`` coprocesses keyed by BMC address and credentials."""
+
+    def __init__(self, executable: str = "ipmitool"):
+        self.executable = executable
+        self._lock = threading.Lock()
+        self._shells = {}
+
+    @staticmethod
+    def _key(host: dict):
+        ipmi = host.get('ipmi_credentials') or {}
+        password = ipmi.get('password')
+        digest = hashlib.sha256(password.encode("utf-8")).hexdigest() if password else None
+        return ipmi.get('host'), ipmi.get('username'), digest
+
+    def execute(self, host: dict, raw_args: Sequence[str], timeouts=None):
+        key = self._key(host)
+        with self._lock:
+            shell = self._shells.get(key)
+            if shell is None:
+                argv, env = shell_argv(host, self.executable)
+                shell = self._shells[key] = IpmiShell(argv, env)
+        return shell.execute(raw_args, timeouts)
+
+    def stats(self) -> dict:
+        with self._lock:
+            shells = list(self._shells.values())
+        return {
+            'shells': len(shells),
+            'running': sum(shell.running for shell in shells),
+            'starts': sum(shell.starts for shell in shells),
+        }
+
+    def close_all(self):
+        with self._lock:
+            shells = list(self._shells.values())
+            self._shells.clear()
+        for shell in shells:
+            with shell.lock:
+                shell.close()
+
+
+default_shells = IpmiShellPool()
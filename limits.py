@@ -0,0 +1,179 @@
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Mapping, Optional
+
+LIMIT_KINDS = ('ssh_connect', 'ssh_exec', 'ipmi_session')
+
+
+class LimitTimeout(TimeoutError):
+    """Raised when a limiter slot is not available before the caller's deadline."""
+
+
+class TokenBucket:
+    """Rate limiter that hands out reservations in arrival order."""
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = clock()
+
+    def reserve(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """Take one token and return the seconds to wait before using it.
+
+        Returns ``None`` without taking a token when the wait would exceed
+        ``max_wait``.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+
+@dataclass
+class LimitStats:
+    acquired: int = 0
+    waited: int = 0
+    timeouts: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    in_use: int = 0
+
+    def as_dict(self):
+        return {
+            'acquired': self.acquired,
+            'waited': self.waited,
+            'timeouts': self.timeouts,
+            'in_use': self.in_use,
+            'wait_seconds': round(self.wait_seconds, 4),
+            'max_wait_seconds': round(self.max_wait_seconds, 4),
+        }
+
+
+@dataclass
+class _Budget:
+    settings: Mapping
+    total: Optional[threading.BoundedSemaphore]
+    bucket: Optional[TokenBucket]
+    per_host: Dict[str, threading.BoundedSemaphore] = field(default_factory=dict)
+
+
+class RemoteLimiter:
+    """Concurrency and connection-rate budgets for remote operations.
+
+    Each kind in ``LIMIT_KINDS`` may set ``global`` and ``per_host``
+    concurrency limits and a token bucket (``rate`` per second, ``burst``)
+    for starting new operations. Kinds without settings are unlimited but
+    still counted.
+    """
+
+    def __init__(self, limits: Optional[Mapping] = None, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stats = {kind: LimitStats() for kind in LIMIT_KINDS}
+        self._budgets = {}
+        self.configure(limits)
+
+    def configure(self, limits: Optional[Mapping]):
+        """Apply new limits; operations already holding a slot release it to the old budget."""
+        limits = limits or {}
+        with self._lock:
+            for kind in LIMIT_KINDS:
+                settings = dict(limits.get(kind) or {})
+                current = self._budgets.get(kind)
+                if current is not None and current.settings == settings:
+                    continue
+                self._budgets[kind] = _Budget(
+                    settings=settings,
+                    total=threading.BoundedSemaphore(settings['global']) if settings.get('global') else None,
+                    bucket=(
+                        TokenBucket(settings['rate'], settings.get('burst', 1), clock=self._clock)
+                        if settings.get('rate') else None
+                    ),
+                )
+
+    def _host_semaphore(self, budget, target):
+        limit = budget.settings.get('per_host')
+        if not limit:
+            return None
+        with self._lock:
+            semaphore = budget.per_host.get(target)
+            if semaphore is None:
+                semaphore = budget.per_host[target] = threading.BoundedSemaphore(limit)
+            return semaphore
+
+    def acquire(self, kind: str, target: str, timeout: Optional[float] = None):
+        """Wait for a ``kind`` slot on ``target`` and return its release callable.
+
+        Raises ``LimitTimeout`` if no slot is free within ``timeout`` seconds.
+        """
+        with self._lock:
+            budget = self._budgets[kind]
+        started = self._clock()
+        deadline = None if timeout is None else started + timeout
+
+        def remaining():
+            return None if deadline is None else max(0.0, deadline - self._clock())
+
+        held = []
+        try:
+            for semaphore in (self._host_semaphore(budget, target), budget.total):
+                if semaphore is None:
+                    continue
+                if not semaphore.acquire(timeout=remaining()):
+                    raise LimitTimeout(f"No {kind} slot for {target} within {timeout:g} seconds")
+                held.append(semaphore)
+            if budget.bucket is not None:
+                wait = budget.bucket.reserve(max_wait=remaining())
+                if wait is None:
+                    raise LimitTimeout(f"{kind} rate limit for {target} exceeds the {timeout:g}s deadline")
+                if wait:
+                    time.sleep(wait)
+        except LimitTimeout:
+            for semaphore in held:
+                semaphore.release()
+            with self._lock:
+                self._stats[kind].timeouts += 1
+            raise
+
+        waited = self._clock() - started
+        with self._lock:
+            stats = self._stats[kind]
+            stats.acquired += 1
+            stats.in_use += 1
+            stats.wait_seconds += waited
+            stats.max_wait_seconds = max(stats.max_wait_seconds, waited)
+            if waited >= 0.001:
+                stats.waited += 1
+
+        def release():
+            for semaphore in held:
+                semaphore.release()
+            with self._lock:
+                self._stats[kind].in_use -= 1
+
+        return release
+
+    @contextmanager
+    def slot(self, kind: str, target: str, timeout: Optional[float] = None):
+        release = self.acquire(kind, target, timeout)
+        try:
+            yield
+        finally:
+            release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {kind: stats.as_dict() for kind, stats in self._stats.items()}
+
+
+default_limiter = RemoteLimiter()
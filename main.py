@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import math
 import os
 import signal
 import sys
@@ -7,22 +8,56 @@ import time
 import datetime
 
 from config_loader import Config, ConfigError, ConfigWatcher
-from state import state, init_state_from_config
+from state import state, init_state_from_config, state_version
 from fan_controller import FanController
+from host_plan import plan_for
 from temp_monitor import TempMonitor
-from utils import log, redact_mapping
+from utils import POLL_SOURCES, command_latency, command_timeouts, log, redact_mapping
+from ssh_pool import default_pool as ssh_pool
+from ipmi_shell import default_shells as ipmi_shells
+from ipmi_lan import default_lan_pool as ipmi_lan
 from control_policy import SensorSnapshot, determine_control_temperature
 from lifecycle import restore_automatic_control
 from monitoring_web import MonitoringServer, WebSettings
+from polling import HostPoller
+from push_receiver import PushReceiver, push_keys
+from limits import default_limiter
+from scheduler import Scheduler, stagger_offsets
+from adaptive_polling import SLOPE_WINDOW, next_interval
+from history import DEFAULT_HISTORY_CAPACITY, DEFAULT_ROLLUPS
+from history_store import HOST_STORE_COLUMNS, VM_STORE_COLUMNS
+from history_store import default_history_store as history_store
+
+def host_source_intervals(config, host, interval=None):
+    """Return ``{source: seconds}`` for the poll sources ``host`` actually has.
+
+    ``interval`` replaces the host interval, e.g. with adaptive polling; explicit
+    ``source_intervals`` still take precedence.
+    """
+    interval = interval or host.get('interval', config.general.get('interval', 60))
+    intervals = dict(host.get('source_intervals') or {})
+    return {
+        source: intervals.get(source, interval)
+        for source in POLL_SOURCES
+        if source == 'cpu'
+        or (source == 'host_gpu' and host.get('gpu_type'))
+        or (source == 'vm_gpu' and host.get('vms'))
+    }
+
 
 def web_settings(config):
     if not config.general.get('web_enabled', True):
         return None
+    adaptive = config.general.get('adaptive_polling') or {}
+    slowest_poll = max(
+        [config.general.get('interval', 60), adaptive.get('max_interval', 0)]
+        + [min(host_source_intervals(config, host).values()) for host in config.hosts]
+    )
     return WebSettings(
         host=config.general.get('web_host', '127.0.0.1'),
         port=config.general.get('web_port', 8080),
         refresh_interval_seconds=config.general.get('web_refresh_interval', 3),
-        stale_after_seconds=max(180, config.general.get('interval', 60) * 3),
+        stale_after_seconds=max(180, slowest_poll * 3),
     )
 
 
@@ -36,6 +71,19 @@ def start_web_server(settings):
     return server
 
 
+def push_endpoint(settings):
+    return settings and (settings['host'], settings['port'])
+
+
+def start_push_receiver(settings, table):
+    if settings is None:
+        return None
+    receiver = PushReceiver(table, settings['host'], settings['port']).start()
+    push_host, push_port = receiver.address
+    log("INFO", "push", f"Receiving sensor pushes on udp://{push_host}:{push_port}")
+    return receiver
+
+
 def configure_hosts(config, controller):
     debug = config.general.get('debug', False)
     for host in config.hosts:
@@ -49,10 +97,50 @@ def configure_hosts(config, controller):
         controller.set_fan_control(host.get('fan_control_mode', 'manual'), host)
         if debug:
             log("DEBUG", host['name'], f"Host config: {redact_mapping(host)}")
+    state_version.publish()
+
+
+def init_runtime_state(config):
+    """Reset ``state`` for ``config.hosts`` and reload each source's history from disk, if enabled."""
+    init_state_from_config(
+        config.hosts,
+        config.general.get('history_capacity', DEFAULT_HISTORY_CAPACITY),
+        config.general.get('history_rollups', DEFAULT_ROLLUPS),
+    )
+    try:
+        history_store.configure(config.general.get('history_store'))
+    except OSError as exc:
+        log("ERROR", "HISTORY", f"History is kept in memory only: {exc}", file=sys.stderr)
+        return
+    if not history_store.enabled:
+        return
+    sources = []
+    for host in config.hosts:
+        host_state = state[host['name']]
+        sources.append((host['name'], host_state['history'], HOST_STORE_COLUMNS))
+        for vm in host.get('vms') or []:
+            vm_name = f"{host['name']}/{vm['name']}"
+            sources.append((vm_name, host_state['vms'][vm['name']]['history'], VM_STORE_COLUMNS))
+    for name, history, columns in sources:
+        retention = history.retention()
+        try:
+            history.attach(
+                history_store.source(name, columns),
+                since=time.time() - retention if retention else -math.inf,
+            )
+        except OSError as exc:
+            log("ERROR", "HISTORY", f"History for {name} is not persisted: {exc}", file=sys.stderr)
+
+
+def stop_fan_writers(config, controller):
+    """Discard queued fan levels so none lands after a mode change."""
+    timeouts = command_timeouts(config.general, 'ipmi_write')
+    controller.writer.close(timeout=timeouts.total if timeouts else None)
 
 
 def apply_config_reload(config, candidate, controller, monitor, on_reload=None):
     old_hosts = config.hosts
+    stop_fan_writers(config, controller)
     failures = restore_automatic_control(controller, old_hosts, logger=log)
     if failures:
         log(
@@ -75,9 +163,15 @@ def apply_config_reload(config, candidate, controller, monitor, on_reload=None):
 
     config.general = candidate.general
     config.hosts = candidate.hosts
+    config.plans = candidate.plans
+    default_limiter.configure(config.general.get('remote_limits'))
+    monitor.close()
+    ssh_pool.close_all()
+    ipmi_shells.close_all()
+    ipmi_lan.close_all()
     controller.config = config
-    monitor.config = config
-    init_state_from_config(config.hosts)
+    monitor.update_config(config)
+    init_runtime_state(config)
     configure_hosts(config, controller)
     log("INFO", "CONFIG", "Configuration reloaded successfully.")
     return True
@@ -86,11 +180,18 @@ def apply_config_reload(config, candidate, controller, monitor, on_reload=None):
 def main(config_path="fan_control_config.yaml"):
     config = Config(config_path)
     config_watcher = ConfigWatcher(config_path)
-    init_state_from_config(config.hosts)
+    scheduler = Scheduler()
+    # SIGHUP checks the configuration file now instead of at the next wake-up.
+    signal.signal(signal.SIGHUP, lambda signum, frame: scheduler.wake())
+    init_runtime_state(config)
+    default_limiter.configure(config.general.get('remote_limits'))
     controller = FanController(config)
     monitor = TempMonitor(config)
     current_web_settings = web_settings(config)
     web_server = start_web_server(current_web_settings)
+    monitor.pushes.configure(push_keys(config))
+    current_push_settings = config.general.get('push_receiver')
+    push_server = start_push_receiver(current_push_settings, monitor.pushes)
 
     def reconfigure_web(candidate):
         nonlocal web_server, current_web_settings
@@ -109,17 +210,42 @@ def main(config_path="fan_control_config.yaml"):
             raise
         current_web_settings = next_settings
 
+    def reconfigure_push(candidate):
+        nonlocal push_server, current_push_settings
+        next_settings = candidate.general.get('push_receiver')
+        if push_endpoint(next_settings) != push_endpoint(current_push_settings):
+            previous_settings = current_push_settings
+            if push_server:
+                push_server.stop()
+                push_server = None
+            try:
+                push_server = start_push_receiver(next_settings, monitor.pushes)
+            except Exception:
+                push_server = start_push_receiver(previous_settings, monitor.pushes)
+                raise
+        current_push_settings = next_settings
+        monitor.pushes.configure(push_keys(candidate))
+
+    def reconfigure(candidate):
+        reconfigure_web(candidate)
+        reconfigure_push(candidate)
+
     try:
         run_controller(
             config,
             controller,
             monitor,
             config_watcher=config_watcher,
-            on_reload=reconfigure_web,
+            on_reload=reconfigure,
+            scheduler=scheduler,
         )
     finally:
+        monitor.close()
         if web_server:
             web_server.stop()
+        if push_server:
+            push_server.stop()
+        stop_fan_writers(config, controller)
         failures = restore_automatic_control(controller, config.hosts, logger=log)
         if failures:
             log(
@@ -128,134 +254,284 @@ def main(config_path="fan_control_config.yaml"):
                 "Failed to restore automatic fan control for: " + ", ".join(failures),
                 file=sys.stderr,
             )
+        ssh_pool.close_all()
+        ipmi_shells.close_all()
+        ipmi_lan.close_all()
+        history_store.close()
 
 
-def run_controller(config, controller, monitor, config_watcher=None, on_reload=None):
+def poll_host(config, controller, monitor, host, sources=None):
+    debug = config.general.get('debug', False)
+    log("INFO", host['name'], "-" * 50)
+    log("INFO", host['name'], f"Host: {host['name']}, IP: {plan_for(config, host).display_ip}")
+    log("INFO", host['name'], "-" * 50)
+
+    try:
+        readings = monitor.read_host(
+            host, deadline_seconds=config.general.get('sensor_deadline', 30), sources=sources
+        )
+        cpu_temps = readings.cpu_temps
+        gpu_temps, host_gpu_error = readings.host_gpu
+        if debug:
+            log("DEBUG", host['name'], f"Host CPU temperature: {cpu_temps}")
+            log("DEBUG", host['name'], f"Host GPU temperature: {gpu_temps}")
+
+        vm_gpu_temps = []
+        gpu_source_errors = []
+        if host.get('gpu_type') and not gpu_temps:
+            gpu_source_errors.append(host_gpu_error or 'Host GPU temperature unavailable')
+        if 'vms' in host and isinstance(host['vms'], list):
+            for vm in host['vms']:
+                temps, vm_error = readings.vm_gpus[vm['name']]
+                if debug:
+                    log("DEBUG", host['name'], f"VM {vm['name']} GPU temps: {temps}")
+                if temps:
+                    vm_gpu_temps.extend(temps)
+                else:
+                    gpu_source_errors.append(
+                        vm_error or f"VM {vm['name']} GPU temperature unavailable"
+                    )
+                vm_state = state[host['name']]['vms'][vm['name']]
+                vm_state['gpu_temps'] = list(temps or [])
+                vm_state['sensor_status'] = 'ok' if temps else 'error'
+                vm_state['last_error'] = None if temps else (vm_error or 'GPU temperature unavailable')
+                vm_state['last_updated'] = datetime.datetime.now().astimezone().isoformat()
+                vm_state['history'].append(
+                    monotonic=time.monotonic(),
+                    timestamp=time.time(),
+                    temp_avg=sum(temps) / len(temps) if temps else None,
+                    temp_max=max(temps) if temps else None,
+                )
+
+        all_gpu_temps = list(gpu_temps) if gpu_temps else []
+        all_gpu_temps.extend(vm_gpu_temps)
+
+        cached_sources = tuple(
+            kind if vm_name is None else f"vm_gpu/{vm_name}" for kind, vm_name in readings.cached
+        )
+        decision = determine_control_temperature(
+            SensorSnapshot(
+                cpu_temps=cpu_temps,
+                gpu_temps=all_gpu_temps,
+                gpu_sources_healthy=not gpu_source_errors,
+                cached_sources=cached_sources,
+            ),
+            mode=config.general.get('temperature_control_mode', 'max'),
+        )
+
+        if decision.fail_safe:
+            log("ERROR", host['name'], "Required temperature data unavailable, fans running at full speed", file=sys.stderr)
+        else:
+            log("INFO", host['name'], f"Host CPU avg temperature: {decision.cpu_avg:.2f}°C")
+            log("INFO", host['name'], f"Host CPU max temperature: {decision.cpu_max:.2f}°C")
+
+            if all_gpu_temps:
+                log("INFO", host['name'], f"Host GPU avg temperature: {decision.gpu_avg:.2f}°C")
+                log("INFO", host['name'], f"Host GPU max temperature: {decision.gpu_max:.2f}°C")
+            else:
+                log("INFO", host['name'], "No GPU temperature data for host, using CPU only.")
+
+            log("INFO", host['name'], f"Host all avg temperature: {decision.combined_avg:.2f}°C")
+            log("INFO", host['name'], f"Host all max temperature: {decision.combined_max:.2f}°C")
+            mode = config.general.get('temperature_control_mode', 'max')
+            log("INFO", host['name'], f"Host control temperature ({mode}): {decision.control_temperature:.2f}°C")
+
+        temp_avg = decision.combined_avg
+        temp_max = decision.combined_max
+        control_temperature = decision.control_temperature
+        host_state = state[host['name']]
+        host_state['cpu_temps'] = list(cpu_temps or [])
+        host_state['gpu_temps'] = list(all_gpu_temps or [])
+        host_state['control_temperature'] = control_temperature
+        host_state['sensor_status'] = 'error' if decision.fail_safe else 'ok'
+        host_state['cached_sources'] = list(decision.cached_sources)
+        if not cpu_temps:
+            host_state['last_error'] = readings.cpu_error or 'CPU temperature unavailable'
+        elif gpu_source_errors:
+            host_state['last_error'] = '; '.join(gpu_source_errors)
+        else:
+            host_state['last_error'] = None
+
+        host_state['last_updated'] = datetime.datetime.now().astimezone().isoformat()
+        fan_speed = controller.apply_fan_speed(control_temperature, host)
+        host_state['history'].append(
+            monotonic=time.monotonic(),
+            timestamp=time.time(),
+            temp_avg=temp_avg,
+            temp_max=temp_max,
+            control_temperature=control_temperature,
+            fan_speed=fan_speed,
+        )
+    except Exception as e:
+        log("ERROR", host['name'], f"Unexpected error: {e}", file=sys.stderr)
+        state[host['name']]['sensor_status'] = 'error'
+        state[host['name']]['last_error'] = str(e)
+        state[host['name']]['control_temperature'] = 999.0
+        state[host['name']]['last_updated'] = datetime.datetime.now().astimezone().isoformat()
+        controller.apply_fan_speed(999, host)
+    finally:
+        state_version.publish()
+
+
+def log_poll_report(report):
+    log(
+        "INFO",
+        "main",
+        f"Polled {len(report.durations)} host(s) in {report.wall_seconds:.2f} seconds",
+    )
+    if report.late:
+        log(
+            "WARN",
+            "main",
+            "Hosts still running at the cycle deadline: " + ", ".join(report.late),
+            file=sys.stderr,
+        )
+    if report.skipped:
+        log(
+            "WARN",
+            "main",
+            "Hosts skipped because their previous poll is still running: "
+            + ", ".join(report.skipped),
+            file=sys.stderr,
+        )
+
+
+def sync_schedule(scheduler, config):
+    intervals = {host['name']: host_source_intervals(config, host) for host in config.hosts}
+    offsets = stagger_offsets(
+        [(name, min(sources.values())) for name, sources in intervals.items()],
+        config.general.get('poll_stagger', 'none'),
+    )
+    keys = []
+    for name, sources in intervals.items():
+        for source, interval in sources.items():
+            scheduler.set((name, source), interval, phase=offsets[name] % interval)
+            keys.append((name, source))
+    scheduler.retain(keys)
+
+
+def publish_schedule(scheduler, hosts, spacing=None):
+    """Publish schedule stats and the seconds since the previous batch of polls started."""
+    snapshot = scheduler.snapshot()
+    for host in hosts:
+        if host['name'] in state:
+            state[host['name']]['schedule'] = {
+                source: stats for (name, source), stats in snapshot.items() if name == host['name']
+            }
+            state[host['name']]['poll_spacing'] = None if spacing is None else round(spacing, 3)
+
+
+def adapt_intervals(config, scheduler, hosts):
+    """Record each host's poll interval, re-planning it from its temperature trend if enabled."""
+    adaptive = config.general.get('adaptive_polling')
+    field = 'temp_max' if config.general.get('temperature_control_mode', 'max') == 'max' else 'temp_avg'
+    for host in hosts:
+        host_state = state.get(host['name'])
+        if host_state is None:
+            continue
+        interval = host.get('interval', config.general['interval'])
+        if adaptive:
+            history = host_state['history'].raw
+            latest = history.latest()
+            if latest and latest[field] is not None:
+                samples = [
+                    (timestamp, value)
+                    for timestamp, value in zip(
+                        history.values('monotonic', SLOPE_WINDOW), history.values(field, SLOPE_WINDOW)
+                    )
+                    if timestamp is not None and value is not None
+                ]
+                previous = host_state.get('poll_interval') or interval
+            else:
+                # Without a usable latest sample, fall back to the configured cadence.
+                samples, previous = [], interval
+            interval = next_interval(
+                samples,
+                host['temperatures'],
+                previous=previous,
+                min_interval=adaptive['min_interval'],
+                max_interval=adaptive['max_interval'],
+                max_step=adaptive['max_step'],
+            )
+            for source, seconds in host_source_intervals(config, host, interval).items():
+                scheduler.set((host['name'], source), seconds)
+        host_state['poll_interval'] = round(interval, 3)
+
+
+def run_controller(config, controller, monitor, config_watcher=None, on_reload=None, scheduler=None):
     configure_hosts(config, controller)
     log("INFO", "main", "=" * 50)
     log("INFO", "main", "Initialization complete. Start main loop.")
     log("INFO", "main", "=" * 50)
-    
-    while True:
-        if config_watcher:
-            try:
-                candidate = config_watcher.load_if_changed()
-                if candidate:
-                    apply_config_reload(
-                        config, candidate, controller, monitor, on_reload=on_reload
+    scheduler = scheduler or Scheduler()
+    sync_schedule(scheduler, config)
+    previous_batch = None
+    poller = HostPoller(
+        lambda host, sources=None: poll_host(config, controller, monitor, host, sources=sources),
+        workers=config.general.get('poll_workers', 1),
+    )
+    try:
+        while True:
+            if config_watcher:
+                try:
+                    candidate = config_watcher.load_if_changed()
+                    if candidate:
+                        apply_config_reload(
+                            config, candidate, controller, monitor, on_reload=on_reload
+                        )
+                        sync_schedule(scheduler, config)
+                except (ConfigError, OSError, RuntimeError) as exc:
+                    log(
+                        "ERROR",
+                        "CONFIG",
+                        f"Configuration reload rejected; keeping previous settings: {exc}",
+                        file=sys.stderr,
                     )
-            except (ConfigError, OSError, RuntimeError) as exc:
-                log(
-                    "ERROR",
-                    "CONFIG",
-                    f"Configuration reload rejected; keeping previous settings: {exc}",
-                    file=sys.stderr,
-                )
 
-        debug = config.general.get('debug', False)
-        for host in config.hosts:
-            log("INFO", host['name'], "-" * 50)
-            ip = (
-                host.get('ipmi_credentials', {}).get('host')
-                or host.get('ssh_credentials', {}).get('host')
-                or 'localhost'
+            # The configuration file is checked at least once per general.interval.
+            runs = scheduler.wait(timeout=config.general['interval'])
+            if not runs:
+                continue
+            due = {}
+            for run in runs:
+                host_name, source = run.key
+                due.setdefault(host_name, set()).add(source)
+                if run.skipped:
+                    log(
+                        "WARN",
+                        host_name,
+                        f"Polling {source} overran its {run.interval:g}s interval; "
+                        f"skipped {run.skipped} period(s)",
+                        file=sys.stderr,
+                    )
+            hosts = [host for host in config.hosts if host['name'] in due]
+            batch_started = time.monotonic()
+            spacing = None if previous_batch is None else batch_started - previous_batch
+            previous_batch = batch_started
+
+            debug = config.general.get('debug', False)
+            poller.resize(config.general.get('poll_workers', 1))
+            report = poller.run_cycle(
+                hosts,
+                deadline_seconds=min(run.interval for run in runs),
+                sources=due,
             )
-            log("INFO", host['name'], f"Host: {host['name']}, IP: {ip}")
-            log("INFO", host['name'], "-" * 50)
-
-            try:
-                cpu_temps = monitor.get_cpu_temps(host)
-                gpu_temps, host_gpu_error = monitor.get_gpu_temps(host)
-                if debug:
-                    log("DEBUG", host['name'], f"Host CPU temperature: {cpu_temps}")
-                    log("DEBUG", host['name'], f"Host GPU temperature: {gpu_temps}")
-
-                vm_gpu_temps = []
-                gpu_source_errors = []
-                if host.get('gpu_type') and not gpu_temps:
-                    gpu_source_errors.append(host_gpu_error or 'Host GPU temperature unavailable')
-                if 'vms' in host and isinstance(host['vms'], list):
-                    for vm in host['vms']:
-                        temps, vm_error = monitor.get_gpu_temps(host, vm['name'])
-                        if debug:
-                            log("DEBUG", host['name'], f"VM {vm['name']} GPU temps: {temps}")
-                        if temps:
-                            vm_gpu_temps.extend(temps)
-                        else:
-                            gpu_source_errors.append(
-                                vm_error or f"VM {vm['name']} GPU temperature unavailable"
-                            )
-                        vm_state = state[host['name']]['vms'][vm['name']]
-                        vm_state['gpu_temps'] = list(temps or [])
-                        vm_state['sensor_status'] = 'ok' if temps else 'error'
-                        vm_state['last_error'] = None if temps else (vm_error or 'GPU temperature unavailable')
-                        vm_state['last_updated'] = datetime.datetime.now().astimezone().isoformat()
-
-                all_gpu_temps = list(gpu_temps) if gpu_temps else []
-                all_gpu_temps.extend(vm_gpu_temps)
-
-                decision = determine_control_temperature(
-                    SensorSnapshot(
-                        cpu_temps=cpu_temps,
-                        gpu_temps=all_gpu_temps,
-                        gpu_sources_healthy=not gpu_source_errors,
-                    ),
-                    mode=config.general.get('temperature_control_mode', 'max'),
-                )
-
-                if decision.fail_safe:
-                    log("ERROR", host['name'], "Required temperature data unavailable, fans running at full speed", file=sys.stderr)
-                else:
-                    log("INFO", host['name'], f"Host CPU avg temperature: {decision.cpu_avg:.2f}°C")
-                    log("INFO", host['name'], f"Host CPU max temperature: {decision.cpu_max:.2f}°C")
-
-                    if all_gpu_temps:
-                        log("INFO", host['name'], f"Host GPU avg temperature: {decision.gpu_avg:.2f}°C")
-                        log("INFO", host['name'], f"Host GPU max temperature: {decision.gpu_max:.2f}°C")
-                    else:
-                        log("INFO", host['name'], "No GPU temperature data for host, using CPU only.")
-
-                    log("INFO", host['name'], f"Host all avg temperature: {decision.combined_avg:.2f}°C")
-                    log("INFO", host['name'], f"Host all max temperature: {decision.combined_max:.2f}°C")
-                    mode = config.general.get('temperature_control_mode', 'max')
-                    log("INFO", host['name'], f"Host control temperature ({mode}): {decision.control_temperature:.2f}°C")
-
-                temp_avg = decision.combined_avg
-                temp_max = decision.combined_max
-                control_temperature = decision.control_temperature
-                host_state = state[host['name']]
-                host_state['cpu_temps'] = list(cpu_temps or [])
-                host_state['gpu_temps'] = list(all_gpu_temps or [])
-                host_state['control_temperature'] = control_temperature
-                host_state['sensor_status'] = 'error' if decision.fail_safe else 'ok'
-                if not cpu_temps:
-                    host_state['last_error'] = 'CPU temperature unavailable'
-                elif gpu_source_errors:
-                    host_state['last_error'] = '; '.join(gpu_source_errors)
-                else:
-                    host_state['last_error'] = None
-
-                host_state['temps'].append({
-                    'temp_avg': temp_avg,
-                    'temp_max': temp_max,
-                    'last_updated': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                })
-                host_state['temps'] = host_state['temps'][-120:]
-                host_state['last_updated'] = datetime.datetime.now().astimezone().isoformat()
-                controller.apply_fan_speed(control_temperature, host)
-            except Exception as e:
-                log("ERROR", host['name'], f"Unexpected error: {e}", file=sys.stderr)
-                state[host['name']]['sensor_status'] = 'error'
-                state[host['name']]['last_error'] = str(e)
-                state[host['name']]['control_temperature'] = 999.0
-                state[host['name']]['last_updated'] = datetime.datetime.now().astimezone().isoformat()
-                controller.apply_fan_speed(999, host)
-
-        time.sleep(config.general['interval'])
-
-        log("INFO", "main", "=" * 50)
-        log("INFO", "main", f"Loop triggered by interval ({config.general['interval']} seconds)")
-        log("INFO", "main", "=" * 50)
+            adapt_intervals(config, scheduler, hosts)
+            publish_schedule(scheduler, hosts, spacing)
+            state_version.publish()
+            log_poll_report(report)
+            if debug:
+                log("DEBUG", "main", f"Due sources: {due}")
+                log("DEBUG", "main", f"SSH connection pool: {ssh_pool.stats()}")
+                log("DEBUG", "main", f"Remote limits: {default_limiter.stats()}")
+                log("DEBUG", "main", f"Command latency: {command_latency.snapshot()}")
+                log("DEBUG", "main", f"IPMI shells: {ipmi_shells.stats()}")
+                log("DEBUG", "main", f"IPMI lanplus sessions: {ipmi_lan.stats()}")
+                log("DEBUG", "main", f"Fan writers: {controller.writer.stats()}")
+                log("DEBUG", "main", f"Sensor streams: {monitor.streams.snapshot()}")
+                log("DEBUG", "main", f"Sensor pushes: {monitor.pushes.snapshot()}")
+    finally:
+        poller.shutdown()
 
 if __name__ == "__main__":
     signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
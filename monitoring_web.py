@@ -1,10 +1,23 @@
+import gzip
 import json
+import math
+import secrets
 import threading
+import time
 from dataclasses import dataclass
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from socketserver import TCPServer
 from typing import Mapping
+from urllib.parse import parse_qs, urlsplit
+
+from downsample import DOWNSAMPLE_METHODS, downsample
+from history_codec import BINARY_CONTENT_TYPE, JSON_CONTENT_TYPE, encode_binary, encode_json, wants_binary
+from state import state_version
+
+HISTORY_WINDOW_SECONDS = 3600
+HISTORY_DEFAULT_POINTS = 300
+HISTORY_MAX_POINTS = 5000
 
 
 @dataclass(frozen=True)
@@ -15,22 +28,30 @@ class WebSettings:
     stale_after_seconds: float = 180
 
 
-def _is_stale(last_updated, now, stale_after_seconds):
+def _stale_at(last_updated, stale_after_seconds):
+    """Return when data updated at ``last_updated`` turns stale, or ``None`` if it already is."""
     if not last_updated:
-        return True
+        return None
     try:
         updated = datetime.fromisoformat(last_updated)
         if updated.tzinfo is None:
             updated = updated.replace(tzinfo=timezone.utc)
-        return (now - updated.astimezone(timezone.utc)).total_seconds() > stale_after_seconds
+        return updated.astimezone(timezone.utc) + timedelta(seconds=stale_after_seconds)
     except (TypeError, ValueError):
-        return True
+        return None
+
+
+def _is_stale(last_updated, now, stale_after_seconds):
+    stale_at = _stale_at(last_updated, stale_after_seconds)
+    return stale_at is None or now > stale_at
 
 
 def _public_error(error):
     if not error:
         return None
     normalized = str(error).lower()
+    if normalized.startswith("circuit open"):
+        return "Sensor source paused after repeated failures"
     if "authentication failed" in normalized:
         return "SSH authentication failed"
     if "host key" in normalized:
@@ -67,11 +88,15 @@ def _fan_display(device):
     return f"{'--' if speed is None else f'{speed}%'} / {label}"
 
 
-def _public_device(name, device, now, stale_after_seconds):
+def _public_device(name, device, now, stale_after_seconds, deadlines=None):
     status = device.get("sensor_status", "unknown")
-    if status == "ok" and _is_stale(device.get("last_updated"), now, stale_after_seconds):
-        status = "stale"
-    return {
+    stale_at = None
+    if status == "ok":
+        stale_at = _stale_at(device.get("last_updated"), stale_after_seconds)
+        if stale_at is None or now > stale_at:
+            status = "stale"
+            stale_at = None
+    public = {
         "name": name,
         "control_state": _control_state(device),
         "fan_display": _fan_display(device),
@@ -84,28 +109,218 @@ def _public_device(name, device, now, stale_after_seconds):
         "last_error": _public_error(device.get("last_error")),
         "last_updated": device.get("last_updated"),
         "vms": [
-            _public_device(vm_name, vm_state, now, stale_after_seconds)
+            _public_device(vm_name, vm_state, now, stale_after_seconds, deadlines)
             for vm_name, vm_state in sorted((device.get("vms") or {}).items())
         ],
     }
+    if stale_at is not None and deadlines is not None:
+        deadlines.append((stale_at, public))
+    if "history" in device:
+        public["history"] = device["history"].stats()
+    if "ipmi_writes" in device:
+        public["ipmi_writes"] = dict(device["ipmi_writes"])
+    if "fan_writer" in device:
+        public["fan_writer"] = dict(device["fan_writer"])
+    if "fan_write_error" in device:
+        public["fan_write_error"] = _public_error(device["fan_write_error"])
+    if "poll_interval" in device:
+        public["poll_interval"] = device["poll_interval"]
+    if "poll_spacing" in device:
+        public["poll_spacing"] = device["poll_spacing"]
+    if "breaker" in device:
+        public["breaker"] = dict(device["breaker"])
+    if "breakers" in device:
+        public["breakers"] = {source: dict(stats) for source, stats in device["breakers"].items()}
+    if "sensor_cache" in device:
+        cache = device["sensor_cache"]
+        public["sensor_cache"] = dict(cache, ages=dict(cache["ages"], vm_gpu=dict(cache["ages"]["vm_gpu"])))
+    if device.get("cached_sources"):
+        public["cached_sources"] = list(device["cached_sources"])
+    if "schedule" in device:
+        public["schedule"] = {source: dict(stats) for source, stats in device["schedule"].items()}
+    return public
 
 
 def build_status_snapshot(
     runtime_state: Mapping,
     stale_after_seconds=180,
     refresh_interval_seconds=3,
+    now=None,
+    deadlines=None,
 ) -> dict:
-    now = datetime.now(timezone.utc)
+    """Build the ``/api/status`` document.
+
+    If ``deadlines`` is a list, a ``(stale_at, device)`` pair is appended to
+    it for every device currently reported ``ok``.
+    """
+    now = now or datetime.now(timezone.utc)
     return {
         "generated_at": now.isoformat(),
         "refresh_interval_seconds": refresh_interval_seconds,
         "hosts": [
-            _public_device(host_name, host_state, now, stale_after_seconds)
+            _public_device(host_name, host_state, now, stale_after_seconds, deadlines)
             for host_name, host_state in sorted(runtime_state.items())
         ],
     }
 
 
+@dataclass(frozen=True)
+class EncodedStatus:
+    etag: str
+    body: bytes
+    gzip_body: bytes
+
+    @property
+    def gzip_etag(self):
+        return self.etag[:-1] + '-gzip"'
+
+
+class StatusCache:
+    """Encoded ``/api/status`` snapshot shared by every request.
+
+    The snapshot is rebuilt only when ``version`` has been published since
+    the last build. Between versions, devices reported ``ok`` are flipped to
+    ``stale`` in place once the clock passes their deadline, without walking
+    ``state`` again. Each encoding gets a strong ETag from a per-process
+    token, the version, and an encoding counter, so tags never repeat across
+    restarts.
+    """
+
+    def __init__(
+        self,
+        runtime_state: Mapping,
+        version=state_version,
+        stale_after_seconds=180,
+        refresh_interval_seconds=3,
+        clock=lambda: datetime.now(timezone.utc),
+    ):
+        self.runtime_state = runtime_state
+        self.version = version
+        self.stale_after_seconds = stale_after_seconds
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._token = secrets.token_hex(4)
+        self._encodings = 0
+        self._built_version = None
+        self._snapshot = None
+        self._deadlines = []
+        self._encoded = None
+
+    def get(self) -> EncodedStatus:
+        with self._lock:
+            now = self._clock()
+            version = self.version.value
+            if version != self._built_version:
+                self._build(version, now)
+            elif self._deadlines and now > self._deadlines[0][0]:
+                self._expire(now)
+            return self._encoded
+
+    def _build(self, version, now):
+        deadlines = []
+        self._snapshot = build_status_snapshot(
+            self.runtime_state,
+            stale_after_seconds=self.stale_after_seconds,
+            refresh_interval_seconds=self.refresh_interval_seconds,
+            now=now,
+            deadlines=deadlines,
+        )
+        self._deadlines = sorted(deadlines, key=lambda deadline: deadline[0])
+        self._built_version = version
+        self._encode()
+
+    def _expire(self, now):
+        while self._deadlines and now > self._deadlines[0][0]:
+            _stale_at, device = self._deadlines.pop(0)
+            device["sensor_status"] = "stale"
+        self._snapshot["generated_at"] = now.isoformat()
+        self._encode()
+
+    def _encode(self):
+        self._encodings += 1
+        body = json.dumps(self._snapshot).encode("utf-8")
+        self._encoded = EncodedStatus(
+            etag=f'"{self._token}-{self._built_version}-{self._encodings}"',
+            body=body,
+            gzip_body=gzip.compress(body, mtime=0),
+        )
+
+
+class HistoryRequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _query_value(query, name):
+    values = query.get(name)
+    return values[-1] if values else None
+
+
+def _query_number(query, name, default, cast=float):
+    value = _query_value(query, name)
+    if value is None:
+        return default
+    try:
+        number = cast(value)
+    except ValueError:
+        raise HistoryRequestError(400, f"{name} must be a number.") from None
+    if not math.isfinite(number):
+        raise HistoryRequestError(400, f"{name} must be a finite number.")
+    return number
+
+
+def build_history_response(runtime_state: Mapping, query: Mapping, now=None) -> dict:
+    """Answer ``/api/history`` for one host or VM column, downsampled to at most ``points`` points.
+
+    ``from`` and ``to`` are Unix seconds and default to the last hour. The
+    data comes from the finest history tier that still covers the range at
+    ``(to - from) / points`` seconds per point.
+    """
+    host_name = _query_value(query, "host")
+    host = runtime_state.get(host_name) if host_name else None
+    if host is None:
+        raise HistoryRequestError(404, "Unknown host.")
+    vm_name = _query_value(query, "vm")
+    device = host if vm_name is None else (host.get("vms") or {}).get(vm_name)
+    if device is None or "history" not in device:
+        raise HistoryRequestError(404, "Unknown VM." if vm_name is not None else "Host has no history.")
+    history = device["history"]
+    sources = [name for name in history.raw.columns if name not in ("monotonic", "timestamp")]
+    source = _query_value(query, "source") or ("control_temperature" if vm_name is None else "temp_max")
+    if source not in sources:
+        raise HistoryRequestError(404, f"source must be one of: {', '.join(sources)}.")
+    method = _query_value(query, "method") or "minmax"
+    if method not in DOWNSAMPLE_METHODS:
+        raise HistoryRequestError(400, f"method must be one of: {', '.join(DOWNSAMPLE_METHODS)}.")
+    end = _query_number(query, "to", time.time() if now is None else now)
+    start = _query_number(query, "from", end - HISTORY_WINDOW_SECONDS)
+    if start >= end:
+        raise HistoryRequestError(400, "from must be earlier than to.")
+    points = _query_number(query, "points", HISTORY_DEFAULT_POINTS, int)
+    if not 2 <= points <= HISTORY_MAX_POINTS:
+        raise HistoryRequestError(400, f"points must be between 2 and {HISTORY_MAX_POINTS}.")
+
+    series = history.query(source, start, end, (end - start) / points)
+    resolution = series.pop("resolution")
+    series = downsample(series, points, method)
+    return {
+        "host": host_name,
+        "vm": vm_name,
+        "source": source,
+        "from": start,
+        "to": end,
+        "method": method,
+        "resolution": resolution,
+        "points": len(series["timestamp"]),
+        "timestamp": series["timestamp"],
+        "min": series["min"],
+        "avg": series["avg"],
+        "max": series["max"],
+    }
+
+
 DASHBOARD_HTML_TEMPLATE = """<!doctype html>
 <html lang="en">
 <head>
@@ -128,6 +343,9 @@ DASHBOARD_HTML_TEMPLATE = """<!doctype html>
     .vms { margin-top:12px; padding-top:10px; border-top:1px dashed var(--line); }
     .vm { margin-top:8px; padding-left:8px; border-left:2px solid var(--line); }
     .vm-head { display:flex; justify-content:space-between; gap:12px; }
+    .spark { display:block; width:100%; height:36px; margin-top:10px; }
+    .spark polyline { fill:none; stroke:var(--ok); stroke-width:1.5; vector-effect:non-scaling-stroke; }
+    .spark polygon { fill:var(--line); opacity:.6; }
     footer { margin-top:18px; color:var(--dim); }
   </style>
 </head>
@@ -142,6 +360,7 @@ const connection = document.querySelector('#connection');
 const refreshStatus = document.querySelector('#refresh-status');
 let refreshIntervalSeconds = __REFRESH_SECONDS__;
 let refreshTimer;
+let statusEtag;
 const el = (tag, text, cls) => { const node=document.createElement(tag); if(text!==undefined) node.textContent=text; if(cls) node.className=cls; return node; };
 const metric = (label, value) => { const box=el('div',undefined,'metric'); box.append(el('span',label,'dim'),el('b',value)); return box; };
 const temperatures = values => values && values.length ? values.map(v => `${Number(v).toFixed(1)}°C`).join('  ') : '--';
@@ -150,11 +369,49 @@ const timestamp = value => {
   const date = new Date(value);
   return Number.isNaN(date.getTime()) ? '--' : date.toLocaleString(undefined,{hour12:false});
 };
+const breakerText = breaker => `CIRCUIT ${String(breaker.state).replace('_','-').toUpperCase()} // ${breaker.consecutive_failures} FAILURES${breaker.retry_in_seconds==null?'':` // RETRY IN ${Math.round(breaker.retry_in_seconds)}s`}`;
+const SVG_NS='http://www.w3.org/2000/svg';
+const SPARKLINE_REFRESH_MS=30000;
+const sparklines=new Map();
+function drawSparkline(svg, data) {
+  svg.replaceChildren();
+  if(!data || data.points<2) return;
+  const low=Math.min(...data.min), high=Math.max(...data.max), first=data.timestamp[0], span=(data.timestamp[data.points-1]-first)||1;
+  const point=(index, values) => `${((data.timestamp[index]-first)/span*100).toFixed(2)},${(23-(values[index]-low)/((high-low)||1)*22).toFixed(2)}`;
+  const indexes=Array.from(data.timestamp,(_,index)=>index);
+  const line=document.createElementNS(SVG_NS,'polyline'); line.setAttribute('points',indexes.map(i=>point(i,data.avg)).join(' '));
+  const band=document.createElementNS(SVG_NS,'polygon'); band.setAttribute('points',[...indexes.map(i=>point(i,data.max)),...indexes.reverse().map(i=>point(i,data.min))].join(' '));
+  const title=document.createElementNS(SVG_NS,'title'); title.textContent=`CONTROL LAST HOUR ${low.toFixed(1)}-${high.toFixed(1)}°C`;
+  svg.append(title,band,line);
+}
+function decodeHistory(buffer) {
+  const view=new DataView(buffer);
+  if(String.fromCharCode(...new Uint8Array(buffer,0,4))!=='FCHB' || view.getUint8(4)!==1) throw new Error('Unsupported history format');
+  const points=view.getUint32(8,true), metadataLength=view.getUint32(12,true);
+  const data=JSON.parse(new TextDecoder().decode(new Uint8Array(buffer,16,metadataLength)));
+  let offset=16+metadataLength;
+  for(const [name,type] of data.columns) { const Type=type==='float64'?Float64Array:Float32Array; data[name]=new Type(buffer,offset,points); offset+=Math.ceil(points*Type.BYTES_PER_ELEMENT/8)*8; }
+  return data;
+}
+function sparkline(name) {
+  const svg=document.createElementNS(SVG_NS,'svg'); svg.setAttribute('class','spark'); svg.setAttribute('viewBox','0 0 100 24'); svg.setAttribute('preserveAspectRatio','none');
+  const cached=sparklines.get(name);
+  if(cached) drawSparkline(svg,cached.data);
+  if(!cached || Date.now()-cached.at>=SPARKLINE_REFRESH_MS) {
+    sparklines.set(name,{at:Date.now(),data:cached&&cached.data});
+    fetch(`/api/history?host=${encodeURIComponent(name)}&source=control_temperature&points=120`,{cache:'no-store',headers:{Accept:'application/octet-stream'}})
+      .then(response=>response.ok?response.arrayBuffer().then(decodeHistory):null)
+      .then(data=>{ if(data) { sparklines.set(name,{at:Date.now(),data}); drawSparkline(svg,data); } })
+      .catch(()=>{});
+  }
+  return svg;
+}
 function vmRow(vm) {
   const row=el('div',undefined,'vm'); const head=el('div',undefined,'vm-head');
   head.append(el('span',`${vm.name}: ${temperatures(vm.gpu_temps)}`),el('span',String(vm.sensor_status||'unknown').toUpperCase(),`status-${vm.sensor_status||'stale'}`));
   row.append(head,el('div',`UPDATED ${timestamp(vm.last_updated)}`,'dim'));
   if(vm.last_error) row.append(el('div',`! ${vm.last_error}`,'status-error'));
+  if(vm.breaker && vm.breaker.state!=='closed') row.append(el('div',breakerText(vm.breaker),'status-stale'));
   return row;
 }
 function hostCard(host) {
@@ -162,8 +419,10 @@ function hostCard(host) {
   head.append(el('strong',`[${host.name}]`),el('span',String(host.sensor_status||'unknown').toUpperCase(),`status-${host.sensor_status||'stale'}`));
   const grid=el('div',undefined,'grid');
   grid.append(metric('CPU',temperatures(host.cpu_temps)),metric('GPU',temperatures(host.gpu_temps)),metric('CONTROL',host.control_temperature==null?'--':`${Number(host.control_temperature).toFixed(1)}°C`),metric('FAN',host.fan_display||'--'),metric('UPDATED',timestamp(host.last_updated)));
-  card.append(head,grid);
+  card.append(head,grid,sparkline(host.name));
   if(host.last_error) card.append(el('div',`! ${host.last_error}`,'status-error'));
+  if(host.fan_write_error) card.append(el('div',`! ${host.fan_write_error}`,'status-error'));
+  Object.entries(host.breakers||{}).filter(([,breaker])=>breaker.state!=='closed').forEach(([source,breaker])=>card.append(el('div',`${source.toUpperCase()} ${breakerText(breaker)}`,'status-stale')));
   if(host.vms && host.vms.length) { const vms=el('div',undefined,'vms'); vms.append(el('div','VM GPU SOURCES','dim')); host.vms.forEach(vm=>vms.append(vmRow(vm))); card.append(vms); }
   return card;
 }
@@ -177,13 +436,33 @@ function applyRefreshInterval(value) {
   refreshTimer=setInterval(refresh,seconds*1000);
 }
 async function refresh() {
-  try { const response=await fetch('/api/status',{cache:'no-store'}); if(!response.ok) throw new Error(`HTTP ${response.status}`); const data=await response.json(); applyRefreshInterval(data.refresh_interval_seconds); hosts.replaceChildren(...data.hosts.map(hostCard)); if(!data.hosts.length) hosts.append(el('div','NO HOST DATA','dim')); connection.textContent='ONLINE'; connection.className='status-ok'; }
+  try { const response=await fetch('/api/status',{cache:'no-cache'}); if(!response.ok) throw new Error(`HTTP ${response.status}`); const etag=response.headers.get('ETag'); if(!etag || etag!==statusEtag) { const data=await response.json(); applyRefreshInterval(data.refresh_interval_seconds); hosts.replaceChildren(...data.hosts.map(hostCard)); if(!data.hosts.length) hosts.append(el('div','NO HOST DATA','dim')); statusEtag=etag; } connection.textContent='ONLINE'; connection.className='status-ok'; }
   catch(error) { connection.textContent=`OFFLINE // ${error.message}`; connection.className='status-error'; }
 }
 applyRefreshInterval(__REFRESH_SECONDS__); refresh();
 </script></body></html>"""
 
 
+def _accepts_gzip(accept_encoding):
+    for entry in (accept_encoding or "").split(","):
+        coding, _, parameters = entry.partition(";")
+        if coding.strip().lower() != "gzip":
+            continue
+        key, _, value = parameters.strip().partition("=")
+        try:
+            return key != "q" or float(value) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def _etag_matches(if_none_match, etags):
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or not candidates.isdisjoint(etags)
+
+
 def build_dashboard_html(refresh_interval_seconds: int) -> str:
     return DASHBOARD_HTML_TEMPLATE.replace(
         "__REFRESH_SECONDS__", str(refresh_interval_seconds)
@@ -192,37 +471,65 @@ def build_dashboard_html(refresh_interval_seconds: int) -> str:
 
 class _Handler(BaseHTTPRequestHandler):
     runtime_state = None
+    status_cache = None
 
-    def _headers(self, status, content_type, length=None):
+    def _headers(self, status, content_type, length=None, extra=(), cache_control="no-store"):
         self.send_response(status)
-        self.send_header("Content-Type", content_type)
-        self.send_header("Cache-Control", "no-store")
+        if content_type is not None:
+            self.send_header("Content-Type", content_type)
+        for name, value in extra:
+            self.send_header(name, value)
+        self.send_header("Cache-Control", cache_control)
         self.send_header("X-Content-Type-Options", "nosniff")
         self.send_header("Content-Security-Policy", "default-src 'self'; script-src 'unsafe-inline'; style-src 'unsafe-inline'; connect-src 'self'")
         if length is not None:
             self.send_header("Content-Length", str(length))
         self.end_headers()
 
+    def _text(self, status, message):
+        payload = message.encode("utf-8")
+        self._headers(status, "text/plain; charset=utf-8", len(payload))
+        self.wfile.write(payload)
+
     def do_GET(self):
-        if self.path == "/api/status":
-            payload = json.dumps(
-                build_status_snapshot(
-                    self.runtime_state,
-                    stale_after_seconds=self.stale_after_seconds,
-                    refresh_interval_seconds=self.refresh_interval_seconds,
-                )
-            ).encode("utf-8")
-            self._headers(200, "application/json; charset=utf-8", len(payload))
+        url = urlsplit(self.path)
+        if url.path == "/api/status":
+            self._status()
+        elif url.path == "/api/history":
+            try:
+                history = build_history_response(self.runtime_state, parse_qs(url.query))
+            except HistoryRequestError as exc:
+                self._text(exc.status, str(exc))
+                return
+            if wants_binary(self.headers.get("Accept")):
+                payload, content_type = encode_binary(history), BINARY_CONTENT_TYPE
+            else:
+                payload, content_type = encode_json(history), JSON_CONTENT_TYPE
+            self._headers(200, content_type, len(payload), extra=(("Vary", "Accept"),))
             self.wfile.write(payload)
-        elif self.path == "/":
+        elif url.path == "/":
             payload = self.dashboard_html.encode("utf-8")
             self._headers(200, "text/html; charset=utf-8", len(payload))
             self.wfile.write(payload)
-        elif self.path == "/favicon.ico":
+        elif url.path == "/favicon.ico":
             self._headers(204, "image/x-icon", 0)
         else:
             self._headers(404, "text/plain; charset=utf-8", 0)
 
+    def _status(self):
+        encoded = self.status_cache.get()
+        if _accepts_gzip(self.headers.get("Accept-Encoding")):
+            etag, payload, extra = encoded.gzip_etag, encoded.gzip_body, (("Content-Encoding", "gzip"),)
+        else:
+            etag, payload, extra = encoded.etag, encoded.body, ()
+        extra += (("ETag", etag), ("Vary", "Accept-Encoding"))
+        # Browsers store the response but revalidate it on every poll.
+        if _etag_matches(self.headers.get("If-None-Match"), (encoded.etag, encoded.gzip_etag)):
+            self._headers(304, None, extra=extra, cache_control="no-cache")
+            return
+        self._headers(200, "application/json; charset=utf-8", len(payload), extra=extra, cache_control="no-cache")
+        self.wfile.write(payload)
+
     def _method_not_allowed(self):
         self.send_response(405)
         self.send_header("Allow", "GET")
@@ -248,14 +555,18 @@ class _MonitoringHTTPServer(ThreadingHTTPServer):
 
 
 class MonitoringServer:
-    def __init__(self, runtime_state, settings=WebSettings()):
+    def __init__(self, runtime_state, settings=WebSettings(), version=state_version):
         handler = type(
             "RuntimeStatusHandler",
             (_Handler,),
             {
                 "runtime_state": runtime_state,
-                "stale_after_seconds": settings.stale_after_seconds,
-                "refresh_interval_seconds": settings.refresh_interval_seconds,
+                "status_cache": StatusCache(
+                    runtime_state,
+                    version,
+                    stale_after_seconds=settings.stale_after_seconds,
+                    refresh_interval_seconds=settings.refresh_interval_seconds,
+                ),
                 "dashboard_html": build_dashboard_html(settings.refresh_interval_seconds),
             },
         )
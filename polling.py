@@ -0,0 +1,129 @@
+import concurrent.futures
+import time
+from dataclasses import dataclass
+from typing import Callable, Collection, Iterable, Mapping, Optional, Tuple
+
+from utils import log
+
+
+@dataclass(frozen=True)
+class PollReport:
+    wall_seconds: float
+    durations: Mapping[str, float]
+    late: Tuple[str, ...] = ()
+    skipped: Tuple[str, ...] = ()
+    failed: Tuple[str, ...] = ()
+
+
+class HostPoller:
+    """Run each host's read, decide, and apply pipeline once per control cycle.
+
+    With one worker hosts are polled inline, in configuration order. With more
+    workers every host runs independently on a thread pool; a host that has not
+    finished by the cycle deadline is reported late and is not started again
+    until its previous poll returns.
+    """
+
+    def __init__(self, poll: Callable[[dict], None], workers: int = 1, clock=time.monotonic):
+        self._poll = poll
+        self._clock = clock
+        self._workers = workers
+        self._executor = None
+        self._in_flight = {}
+
+    @property
+    def workers(self):
+        return self._workers
+
+    def resize(self, workers: int):
+        if workers == self._workers:
+            return
+        self._workers = workers
+        if self._executor is not None:
+            # Hosts still in flight keep running on the old pool.
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._in_flight.clear()
+
+    def _timed_poll(self, host, sources=None):
+        started = self._clock()
+        try:
+            if sources is None:
+                self._poll(host)
+            else:
+                self._poll(host, sources.get(host['name']))
+        except Exception as exc:
+            log("ERROR", host['name'], f"Host poll failed: {exc}")
+            return self._clock() - started, False
+        return self._clock() - started, True
+
+    def run_cycle(
+        self,
+        hosts: Iterable[dict],
+        deadline_seconds: float,
+        sources: Optional[Mapping[str, Collection[str]]] = None,
+    ) -> PollReport:
+        """Poll ``hosts``; with ``sources``, each poll also receives its host's due sources."""
+        if self._workers <= 1:
+            return self._run_sequential(hosts, deadline_seconds, sources)
+        return self._run_concurrent(hosts, deadline_seconds, sources)
+
+    def _run_sequential(self, hosts, deadline_seconds, sources=None):
+        started = self._clock()
+        durations = {}
+        late = []
+        failed = []
+        for host in hosts:
+            durations[host['name']], ok = self._timed_poll(host, sources)
+            if not ok:
+                failed.append(host['name'])
+            if self._clock() - started > deadline_seconds:
+                late.append(host['name'])
+        return PollReport(
+            wall_seconds=self._clock() - started,
+            durations=durations,
+            late=tuple(late),
+            failed=tuple(failed),
+        )
+
+    def _run_concurrent(self, hosts, deadline_seconds, sources=None):
+        started = self._clock()
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self._workers, thread_name_prefix="host-poll"
+            )
+        for name, future in list(self._in_flight.items()):
+            if future.done():
+                del self._in_flight[name]
+
+        futures = {}
+        skipped = []
+        for host in hosts:
+            if host['name'] in self._in_flight:
+                skipped.append(host['name'])
+                continue
+            future = self._executor.submit(self._timed_poll, host, sources)
+            futures[future] = host['name']
+            self._in_flight[host['name']] = future
+
+        done, pending = concurrent.futures.wait(futures, timeout=deadline_seconds)
+        durations = {}
+        failed = []
+        for future in done:
+            name = futures[future]
+            durations[name], ok = future.result()
+            if not ok:
+                failed.append(name)
+            del self._in_flight[name]
+        return PollReport(
+            wall_seconds=self._clock() - started,
+            durations=durations,
+            late=tuple(sorted(futures[future] for future in pending)),
+            skipped=tuple(skipped),
+            failed=tuple(sorted(failed)),
+        )
@@ -0,0 +1,191 @@
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sensor_agent import MAX_DATAGRAM, DatagramError, decode_datagram
+from utils import log
+
+SensorReading = Tuple[Optional[List[float]], Optional[str]]
+# Seconds an agent's clock may differ from the controller's; older or newer datagrams are rejected.
+MAX_CLOCK_SKEW = 30
+
+
+@dataclass
+class PushedSample:
+    readings: Dict[str, List[float]]
+    errors: Dict[str, str]
+    # Agent wall-clock time the sample was taken.
+    ts: float
+    boot: str
+    seq: int
+
+
+@dataclass
+class PushStats:
+    received: int = 0
+    rejected: int = 0
+    replayed: int = 0
+    skewed: int = 0
+    lost: int = 0
+    per_source: Dict[str, dict] = field(default_factory=dict)
+
+
+class PushTable:
+    """Latest pushed sample per source, verified against the configured keys.
+
+    A datagram whose timestamp is more than ``MAX_CLOCK_SKEW`` seconds from
+    ``clock`` is rejected. Within a boot id, sequence numbers must increase;
+    a new boot id is only accepted with a timestamp newer than the stored
+    sample, so a captured datagram cannot replace a fresher reading. Sample
+    age is measured from the agent's timestamp.
+    """
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._latest = {}
+        self._stats = PushStats()
+
+    def configure(self, keys: Dict[str, bytes]):
+        with self._lock:
+            self._keys = dict(keys)
+            for source in set(self._latest) - set(self._keys):
+                del self._latest[source]
+            for source in set(self._stats.per_source) - set(self._keys):
+                del self._stats.per_source[source]
+
+    def ingest(self, datagram: bytes) -> bool:
+        with self._lock:
+            keys = self._keys
+        try:
+            message = decode_datagram(datagram, keys.get)
+        except DatagramError as exc:
+            with self._lock:
+                self._stats.rejected += 1
+            log("WARN", "push", f"Rejected sensor push: {exc}")
+            return False
+
+        source = message['src']
+        with self._lock:
+            if source not in self._keys:
+                return False
+            previous = self._latest.get(source)
+            counters = self._stats.per_source.setdefault(source, {'received': 0, 'lost': 0, 'replayed': 0})
+            if abs(message['ts'] - self._clock()) > MAX_CLOCK_SKEW:
+                self._stats.skewed += 1
+                log("WARN", "push", f"Rejected sensor push from {source}: timestamp is outside the allowed clock skew")
+                return False
+            if previous is not None and previous.boot != message['boot'] and message['ts'] <= previous.ts:
+                self._stats.replayed += 1
+                counters['replayed'] += 1
+                return False
+            if previous is not None and previous.boot == message['boot']:
+                if message['seq'] <= previous.seq:
+                    self._stats.replayed += 1
+                    counters['replayed'] += 1
+                    return False
+                gap = message['seq'] - previous.seq - 1
+                self._stats.lost += gap
+                counters['lost'] += gap
+            self._latest[source] = PushedSample(
+                readings={kind: [float(value) for value in temps] for kind, temps in message['r'].items()},
+                errors={kind: str(error) for kind, error in message['e'].items()},
+                ts=float(message['ts']),
+                boot=message['boot'],
+                seq=message['seq'],
+            )
+            self._stats.received += 1
+            counters['received'] += 1
+        return True
+
+    def reading(self, source: str, kind: str, max_age: float) -> SensorReading:
+        with self._lock:
+            sample = self._latest.get(source)
+        if sample is None:
+            return None, f"No sensor push received from {source}"
+        age = max(0.0, self._clock() - sample.ts)
+        if age > max_age:
+            return None, f"Last sensor push from {source} is stale ({age:.0f}s old)"
+        temps = sample.readings.get(kind)
+        if temps:
+            return list(temps), None
+        return None, sample.errors.get(kind) or f"Sensor push from {source} has no {kind} temperatures"
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = self._clock()
+            return {
+                'received': self._stats.received,
+                'rejected': self._stats.rejected,
+                'replayed': self._stats.replayed,
+                'skewed': self._stats.skewed,
+                'lost': self._stats.lost,
+                'sources': {
+                    source: dict(
+                        counters,
+                        age_seconds=(
+                            round(max(0.0, now - self._latest[source].ts), 3)
+                            if source in self._latest else None
+                        ),
+                    )
+                    for source, counters in self._stats.per_source.items()
+                },
+            }
+
+
+class PushReceiver:
+    """UDP endpoint feeding agent datagrams into a ``PushTable``."""
+
+    def __init__(self, table: PushTable, host: str, port: int):
+        self.table = table
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        self._socket = socket.socket(family, socket.SOCK_DGRAM)
+        try:
+            self._socket.bind((host, port))
+        except OSError:
+            self._socket.close()
+            raise
+        # Wake up periodically so stop() does not depend on socket shutdown semantics.
+        self._socket.settimeout(0.5)
+        self._thread = threading.Thread(target=self._serve, name="push-receiver", daemon=True)
+        self._stopped = threading.Event()
+
+    @property
+    def address(self):
+        return self._socket.getsockname()[:2]
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            try:
+                datagram, _peer = self._socket.recvfrom(MAX_DATAGRAM + 1)
+            except socket.timeout:
+                continue
+            except OSError:
+                if self._stopped.is_set():
+                    return
+                continue
+            self.table.ingest(datagram)
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self._socket.close()
+
+
+def push_keys(config) -> Dict[str, bytes]:
+    """Return the configured ``{source: key}`` of every pushing host and VM."""
+    keys = {}
+    for host in config.hosts:
+        for device in [host, *host.get('vms', [])]:
+            push = device.get('push')
+            if push:
+                keys[push['source']] = push['key'].encode('utf-8')
+    return keys
@@ -0,0 +1,180 @@
+import hashlib
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class DueRun:
+    key: Hashable
+    interval: float
+    lateness: float
+    skipped: int
+
+
+@dataclass
+class _Entry:
+    interval: float
+    due: float
+    generation: int
+    phase: float = 0.0
+    # Nominal due time the next period is counted from, when it differs from ``due``.
+    anchor: Optional[float] = None
+    runs: int = 0
+    overruns: int = 0
+    last_lateness: Optional[float] = None
+    max_lateness: float = 0.0
+
+
+class Scheduler:
+    """Heap of next-due times on a monotonic clock.
+
+    Each key is due every ``interval`` seconds counted from its previous due
+    time rather than from when the work finished, so the period does not
+    drift. Periods that passed entirely while earlier work was still running
+    are skipped and counted as overruns.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._heap = []
+        self._entries = {}
+        self._generations = itertools.count()
+
+    def set(
+        self,
+        key: Hashable,
+        interval: float,
+        first_due: Optional[float] = None,
+        phase: Optional[float] = None,
+    ):
+        """Add ``key`` or change its interval or phase.
+
+        New keys are due at ``first_due`` (default: now). An existing key
+        keeps its next due time unless the new interval brings it closer.
+        A ``phase`` shifts the periods after the next run by that many
+        seconds, so keys with equal intervals can be spread apart without
+        delaying their first run.
+        """
+        with self._lock:
+            now = self._clock()
+            entry = self._entries.get(key)
+            if entry is None:
+                due = now if first_due is None else first_due
+                entry = self._entries[key] = _Entry(interval, due, next(self._generations))
+            elif entry.interval != interval or first_due is not None:
+                entry.interval = interval
+                entry.due = min(entry.due, now + interval) if first_due is None else first_due
+                entry.anchor = None
+                entry.generation = next(self._generations)
+            elif phase is None or phase == entry.phase:
+                return
+            if phase is not None and phase != entry.phase:
+                shift = (phase - entry.phase) % interval
+                entry.anchor = (entry.anchor if entry.anchor is not None else entry.due) + shift - interval
+                entry.phase = phase
+            heapq.heappush(self._heap, (entry.due, entry.generation, key))
+
+    def retain(self, keys: Iterable[Hashable]):
+        keep = set(keys)
+        with self._lock:
+            for key in set(self._entries) - keep:
+                del self._entries[key]
+
+    def wake(self):
+        """Make a pending ``wait`` return immediately, e.g. on reload or shutdown."""
+        self._wake.set()
+
+    def _pop_due(self, now) -> List[DueRun]:
+        runs = []
+        while self._heap and self._heap[0][0] <= now:
+            due, generation, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            if entry is None or entry.generation != generation:
+                continue
+            base = due if entry.anchor is None else entry.anchor
+            periods = max(1, int((now - base) // entry.interval) + 1)
+            lateness = now - due
+            entry.due = base + periods * entry.interval
+            entry.anchor = None
+            entry.generation = next(self._generations)
+            entry.runs += 1
+            entry.overruns += periods - 1
+            entry.last_lateness = lateness
+            entry.max_lateness = max(entry.max_lateness, lateness)
+            heapq.heappush(self._heap, (entry.due, entry.generation, key))
+            runs.append(DueRun(key, entry.interval, lateness, periods - 1))
+        return runs
+
+    def _next_due(self):
+        while self._heap:
+            due, generation, key = self._heap[0]
+            entry = self._entries.get(key)
+            if entry is not None and entry.generation == generation:
+                return due
+            heapq.heappop(self._heap)
+        return None
+
+    def wait(self, timeout: Optional[float] = None) -> List[DueRun]:
+        """Block until keys are due and return them, already rescheduled.
+
+        Returns an empty list when woken or when ``timeout`` expires first.
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            with self._lock:
+                now = self._clock()
+                runs = self._pop_due(now)
+                if runs:
+                    return runs
+                next_due = self._next_due()
+            delays = [limit - now for limit in (next_due, deadline) if limit is not None]
+            delay = max(0.0, min(delays)) if delays else None
+            if deadline is not None and now >= deadline:
+                return []
+            if self._wake.wait(delay):
+                self._wake.clear()
+                return []
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = self._clock()
+            return {
+                key: {
+                    'interval': entry.interval,
+                    'phase_seconds': round(entry.phase, 3),
+                    'due_in_seconds': round(entry.due - now, 3),
+                    'runs': entry.runs,
+                    'overruns': entry.overruns,
+                    'last_lateness_seconds': (
+                        None if entry.last_lateness is None else round(entry.last_lateness, 3)
+                    ),
+                    'max_lateness_seconds': round(entry.max_lateness, 3),
+                }
+                for key, entry in self._entries.items()
+            }
+
+
+STAGGER_MODES = ('none', 'even', 'hashed')
+
+
+def stagger_offsets(hosts: Sequence[Tuple[str, float]], mode: str) -> Dict[str, float]:
+    """Return a phase offset in seconds for each ``(name, interval)``.
+
+    ``even`` spaces hosts by ``interval / len(hosts)`` in configuration order.
+    ``hashed`` derives the offset from the host name, so it does not change
+    when other hosts are added or removed.
+    """
+    if mode == 'even':
+        return {name: interval * index / len(hosts) for index, (name, interval) in enumerate(hosts)}
+    if mode == 'hashed':
+        return {
+            name: int.from_bytes(hashlib.sha256(name.encode('utf-8')).digest()[:4], 'big') / 2 ** 32 * interval
+            for name, interval in hosts
+        }
+    return {name: 0.0 for name, _interval in hosts}
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Push local temperatures to the fan controller as signed UDP datagrams.
+
+This file is self-contained and only uses the standard library, so it can be
+copied to a host or VM on its own:
+
+    FAN_CONTROL_PUSH_KEY=... python3 sensor_agent.py \\
+        --controller 10.0.0.5:9870 --source gpu-vm-1 \\
+        --nvidia "nvidia-smi --query-gpu=temperature.gpu --format=csv,noheader,nounits | paste -sd ';' -"
+
+Each datagram is ``HMAC-SHA256(key, payload) || payload`` where the payload
+is compact JSON carrying the source name, a per-process boot id, a sequence
+number, the wall-clock time, and the latest readings or errors per sensor
+kind. The controller rejects datagrams whose time differs from its own by
+more than 30 seconds, so the host needs a synchronized clock.
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import math
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import time
+
+PROTOCOL_VERSION = 1
+MAC_SIZE = hashlib.sha256().digest_size
+MAX_DATAGRAM = 8192
+SENSOR_KINDS = ('cpu', 'nvidia', 'amd')
+
+
+class DatagramError(ValueError):
+    pass
+
+
+def encode_datagram(key, source, boot, seq, readings, errors=None, timestamp=None):
+    payload = json.dumps(
+        {
+            'v': PROTOCOL_VERSION,
+            'src': source,
+            'boot': boot,
+            'seq': seq,
+            'ts': round(time.time() if timestamp is None else timestamp, 3),
+            'r': readings,
+            'e': errors or {},
+        },
+        separators=(',', ':'),
+    ).encode('utf-8')
+    return hmac.new(key, payload, hashlib.sha256).digest() + payload
+
+
+def decode_datagram(datagram, key_for_source):
+    """Verify and decode a datagram.
+
+    ``key_for_source`` maps the claimed source name to its key, or returns
+    ``None`` for unknown sources.
+    """
+    if len(datagram) <= MAC_SIZE or len(datagram) > MAX_DATAGRAM:
+        raise DatagramError('datagram has an invalid size')
+    mac, payload = datagram[:MAC_SIZE], datagram[MAC_SIZE:]
+    try:
+        message = json.loads(payload.decode('utf-8'))
+    except (UnicodeDecodeError, ValueError) as exc:
+        raise DatagramError('datagram payload is not JSON') from exc
+    if not isinstance(message, dict) or message.get('v') != PROTOCOL_VERSION:
+        raise DatagramError('unsupported datagram version')
+    if not isinstance(message.get('src'), str):
+        raise DatagramError('datagram has no source name')
+    key = key_for_source(message['src'])
+    if key is None:
+        raise DatagramError(f"unknown source {message.get('src')!r}")
+    if not hmac.compare_digest(mac, hmac.new(key, payload, hashlib.sha256).digest()):
+        raise DatagramError(f"bad signature from source {message['src']!r}")
+    if (
+        not isinstance(message.get('boot'), str)
+        or not isinstance(message.get('seq'), int)
+        or not isinstance(message.get('ts'), (int, float))
+        or isinstance(message.get('ts'), bool)
+        or not math.isfinite(message['ts'])
+        or not isinstance(message.get('r'), dict)
+        or not isinstance(message.get('e'), dict)
+    ):
+        raise DatagramError('datagram is missing required fields')
+    for temps in message['r'].values():
+        if not isinstance(temps, list) or not all(
+            isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+            for value in temps
+        ):
+            raise DatagramError('datagram readings must be lists of finite numbers')
+    return message
+
+
+def parse_temperatures(output):
+    return [float(value) for value in output.strip().split(';') if value.strip()]
+
+
+def read_sensors(commands, timeout):
+    """Run ``{kind: command}`` locally and return ``(readings, errors)``."""
+    readings = {}
+    errors = {}
+    for kind, command in commands.items():
+        try:
+            result = subprocess.run(
+                command, shell=True, capture_output=True, text=True, timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            errors[kind] = f'command timed out after {timeout:g} seconds'
+            continue
+        try:
+            temps = parse_temperatures(result.stdout)
+        except ValueError:
+            temps = []
+        if temps:
+            readings[kind] = temps
+        else:
+            errors[kind] = result.stderr.strip() or f'no temperatures (exit status {result.returncode})'
+    return readings, errors
+
+
+def parse_address(value):
+    host, _, port = value.rpartition(':')
+    if not host or not port.isdigit():
+        raise argparse.ArgumentTypeError('expected HOST:PORT')
+    return host.strip('[]'), int(port)
+
+
+def load_key(args):
+    if args.key_file:
+        with open(args.key_file, 'rb') as handle:
+            key = handle.read().strip()
+    else:
+        key = os.environ.get('FAN_CONTROL_PUSH_KEY', '').encode('utf-8')
+    if not key:
+        raise SystemExit('A push key is required: use --key-file or FAN_CONTROL_PUSH_KEY.')
+    return key
+
+
+def run(args):
+    key = load_key(args)
+    commands = {kind: getattr(args, kind) for kind in SENSOR_KINDS if getattr(args, kind)}
+    if not commands:
+        raise SystemExit('Configure at least one of --cpu, --nvidia, or --amd.')
+    address = socket.getaddrinfo(*args.controller, type=socket.SOCK_DGRAM)[0]
+    sock = socket.socket(address[0], socket.SOCK_DGRAM)
+    boot = secrets.token_hex(8)
+    seq = 0
+    next_run = time.monotonic()
+    while True:
+        readings, errors = read_sensors(commands, timeout=args.interval)
+        seq += 1
+        try:
+            sock.sendto(encode_datagram(key, args.source, boot, seq, readings, errors), address[4])
+        except OSError as exc:
+            print(f'Failed to push sensor readings: {exc}', file=sys.stderr)
+        if args.once:
+            return
+        next_run += args.interval
+        time.sleep(max(0.0, next_run - time.monotonic()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--controller', type=parse_address, required=True, help='HOST:PORT of the push receiver')
+    parser.add_argument('--source', required=True, help='source name configured for this host or VM')
+    parser.add_argument('--key-file', help='file holding the shared push key (default: $FAN_CONTROL_PUSH_KEY)')
+    parser.add_argument('--interval', type=float, default=5.0, help='seconds between pushes')
+    parser.add_argument('--once', action='store_true', help='push one sample and exit')
+    for kind in SENSOR_KINDS:
+        parser.add_argument(f'--{kind}', help=f'command printing semicolon-delimited {kind} temperatures')
+    args = parser.parse_args(argv)
+    if args.interval <= 0:
+        parser.error('--interval must be greater than zero')
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import shlex
+from typing import Dict, Optional, Sequence, Tuple
+
+FRAME_MARKER = "@@fan-control@@"
+
+SectionResult = Tuple[Optional[str], Optional[str]]
+
+
+class BundleError(Exception):
+    pass
+
+
+def build_bundle_command(sections: Sequence[Tuple[str, str]]) -> str:
+    """Combine ``(name, command)`` sensor commands into one framed ``sh`` invocation.
+
+    Each command runs in its own group. Its stdout is framed by begin/end
+    lines, its stderr is prefixed line by line, and its exit status is
+    reported, so that one failing section does not hide the others.
+    """
+    lines = []
+    for name, command in sections:
+        begin = shlex.quote(f"{FRAME_MARKER} begin {name}")
+        end = shlex.quote(f"{FRAME_MARKER} end {name}")
+        # The leading newline ends a last output line that has none.
+        status = shlex.quote(f"\\n{FRAME_MARKER} status %s\\n")
+        stderr_prefix = shlex.quote(f"s/^/{FRAME_MARKER} stderr /")
+        lines.append(f"echo {begin}")
+        lines.append(
+            f"{{ {{ {{ {command}\n}}; printf {status} \"$?\"; }} 2>&1 1>&3 "
+            f"| sed {stderr_prefix}; }} 3>&1"
+        )
+        lines.append(f"echo {end}")
+    # The login shell of the remote account is not necessarily POSIX.
+    return "sh -c " + shlex.quote("\n".join(lines))
+
+
+def _lines(output):
+    """Yield output lines, splitting a frame marker that follows data on the same line."""
+    marker = FRAME_MARKER + " "
+    for line in (output or "").splitlines():
+        index = line.find(marker, 1)
+        while index >= 0:
+            yield line[:index]
+            line = line[index:]
+            index = line.find(marker, 1)
+        yield line
+
+
+def parse_bundle_output(output: str, names: Sequence[str]) -> Dict[str, SectionResult]:
+    """Split framed bundle output into ``{name: (stdout, error)}``.
+
+    Raises ``BundleError`` when no section frame is present at all, which
+    means the bundle itself did not run.
+    """
+    stdout = {}
+    stderr = {}
+    statuses = {}
+    finished = set()
+    current = None
+    for line in _lines(output):
+        if not line.startswith(FRAME_MARKER + " "):
+            if current is not None:
+                stdout[current].append(line)
+            continue
+        kind, _, value = line[len(FRAME_MARKER) + 1:].partition(" ")
+        if kind == "begin":
+            current = value
+            stdout.setdefault(current, [])
+            stderr.setdefault(current, [])
+        elif kind == "end":
+            finished.add(value)
+            current = None
+        elif current is not None and kind == "stderr":
+            stderr[current].append(value)
+        elif current is not None and kind == "status":
+            statuses[current] = value
+
+    if not stdout:
+        raise BundleError("Sensor bundle returned no framed sections")
+
+    results = {}
+    for name in names:
+        if name not in finished:
+            results[name] = (None, f"Sensor bundle section {name} did not complete")
+            continue
+        # Drops the blank line left by the newline before the status marker.
+        text = "\n".join(stdout[name]).strip()
+        error = "\n".join(stderr[name]).strip()
+        status = statuses.get(name, "")
+        if status not in ("", "0") and not error and not text:
+            error = f"Exit status {status}"
+        results[name] = (text, error)
+    return results
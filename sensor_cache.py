@@ -0,0 +1,78 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Hashable, Iterable, List, Optional, Tuple
+
+SensorReading = Tuple[Optional[List[float]], Optional[str]]
+
+
+@dataclass
+class _Entry:
+    temps: Optional[List[float]] = None
+    read_at: Optional[float] = None
+    hits: int = 0
+    misses: int = 0
+
+
+class LastGoodCache:
+    """Last successful reading per sensor source.
+
+    A failed reading is replaced by the last good one while that is at most
+    ``max_age`` seconds old. A hit is a failed read answered from the cache;
+    a miss is a failed read whose last good reading was missing or too old.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def resolve(
+        self, key: Hashable, reading: SensorReading, max_age: float, fresh: bool = True
+    ) -> Tuple[SensorReading, Optional[float]]:
+        """Return the reading to use and the age of the cached value, if one was used.
+
+        ``fresh`` marks a reading that was just taken. Reused readings are
+        neither stored nor counted, but a reused failure is still answered
+        from the cache while it is young enough.
+        """
+        temps, error = reading
+        with self._lock:
+            now = self._clock()
+            entry = self._entries.setdefault(key, _Entry())
+            if error is None:
+                if fresh and temps:
+                    entry.temps, entry.read_at = list(temps), now
+                return reading, None
+            age = None if entry.read_at is None else now - entry.read_at
+            usable = age is not None and age <= max_age
+            if fresh:
+                if usable:
+                    entry.hits += 1
+                else:
+                    entry.misses += 1
+            if usable:
+                return (list(entry.temps), None), age
+            return reading, None
+
+    def age(self, key: Hashable) -> Optional[float]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.read_at is None:
+                return None
+            return self._clock() - entry.read_at
+
+    def stats(self, keys: Iterable[Hashable]) -> dict:
+        with self._lock:
+            entries = [self._entries[key] for key in keys if key in self._entries]
+        hits = sum(entry.hits for entry in entries)
+        misses = sum(entry.misses for entry in entries)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
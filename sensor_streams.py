@@ -0,0 +1,229 @@
+import os
+import signal
+import subprocess
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from ssh_pool import default_pool
+from utils import log
+
+SensorReading = Tuple[Optional[List[float]], Optional[str]]
+
+
+def loop_command(command: str, period: float) -> str:
+    """Wrap a polling sensor command in a loop that prints one sample per period."""
+    return f"while :; do {command}\nsleep {period:g}; done"
+
+
+def parse_sample(line: str) -> List[float]:
+    return [float(value) for value in line.strip().split(';') if value.strip()]
+
+
+class SensorStream:
+    """Keep one long-running sensor command alive and remember its latest line.
+
+    Each output line is one complete, semicolon-delimited sample. The stream is
+    restarted with exponential backoff whenever the command or its SSH channel
+    ends, or when no line arrives for ``stall_timeout`` seconds.
+    """
+
+    def __init__(self, name, device, command, pool=None, clock=time.monotonic, max_backoff=30.0,
+                 stall_timeout=None):
+        self.name = name
+        self.device = device
+        self.command = command
+        self._pool = pool or default_pool
+        self._clock = clock
+        self._max_backoff = max_backoff
+        self._stall_timeout = stall_timeout
+        self._stalled = threading.Event()
+        self._lock = threading.Lock()
+        self._first_sample = threading.Event()
+        self._stop = threading.Event()
+        self._handle = None
+        self._latest = None
+        self._updated = None
+        self._last_error = None
+        self.restarts = 0
+        self._thread = threading.Thread(target=self._run, name=f"sensor-stream-{name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._close_handle()
+
+    def wait_for_sample(self, timeout):
+        return self._first_sample.wait(timeout)
+
+    def age(self) -> Optional[float]:
+        with self._lock:
+            return None if self._updated is None else self._clock() - self._updated
+
+    def reading(self, max_age: float) -> SensorReading:
+        with self._lock:
+            latest, updated, last_error = self._latest, self._updated, self._last_error
+        if updated is None:
+            return None, last_error or 'Sensor stream has not produced a sample'
+        age = self._clock() - updated
+        if age > max_age:
+            detail = f"Sensor stream sample is stale ({age:.0f}s old)"
+            return None, f"{detail}: {last_error}" if last_error else detail
+        return list(latest), None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'age_seconds': None if self._updated is None else round(self._clock() - self._updated, 3),
+                'restarts': self.restarts,
+                'last_error': self._last_error,
+            }
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            self._stalled.clear()
+            watchdog = None
+            try:
+                lines = self._lines()
+                watchdog = self._watch()
+                for line in lines:
+                    watchdog = self._watch(watchdog)
+                    try:
+                        sample = parse_sample(line)
+                    except ValueError:
+                        log("WARN", self.name, f"Ignoring non-numeric sensor stream line: {line.strip()}")
+                        continue
+                    if not sample:
+                        continue
+                    with self._lock:
+                        self._latest = sample
+                        self._updated = self._clock()
+                        self._last_error = None
+                    self._first_sample.set()
+                    backoff = 1.0
+                error = 'Sensor stream ended'
+            except Exception as exc:
+                error = f"Sensor stream failed: {exc}"
+            finally:
+                if watchdog is not None:
+                    watchdog.cancel()
+                self._close_handle()
+            if self._stop.is_set():
+                break
+            if self._stalled.is_set():
+                error = f"Sensor stream stalled for {self._stall_timeout:g} seconds"
+            with self._lock:
+                self._last_error = error
+                self.restarts += 1
+            log("WARN", self.name, f"{error}; restarting in {backoff:g} seconds")
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, self._max_backoff)
+
+    def _watch(self, previous=None):
+        """(Re)arm the timer that interrupts a stream whose command stopped printing."""
+        if previous is not None:
+            previous.cancel()
+        if self._stall_timeout is None:
+            return None
+        timer = threading.Timer(self._stall_timeout, self._stall)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def _stall(self):
+        self._stalled.set()
+        with self._lock:
+            handle = self._handle
+        if handle is None:
+            return
+        # Only unblock the reader here; ``_run`` closes the handle itself.
+        if isinstance(handle, subprocess.Popen):
+            try:
+                os.killpg(handle.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        else:
+            handle.close()
+
+    def _lines(self):
+        creds = self.device.get('ssh_credentials')
+        if creds:
+            # Nothing reads the remote stderr, so discard it before it fills the channel window.
+            _stdin, stdout, _stderr = self._pool.exec_command(
+                creds.get('host'),
+                creds.get('username'),
+                f"{{ {self.command}\n}} 2>/dev/null",
+                password=creds.get('password'),
+                key_path=creds.get('key_path'),
+            )
+            self._set_handle(stdout.channel)
+            return iter(stdout.readline, '')
+        process = subprocess.Popen(
+            self.command,
+            shell=True,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            start_new_session=True,
+        )
+        self._set_handle(process)
+        return iter(process.stdout.readline, '')
+
+    def _set_handle(self, handle):
+        with self._lock:
+            self._handle = handle
+        if self._stop.is_set():
+            self._close_handle()
+
+    def _close_handle(self):
+        with self._lock:
+            handle, self._handle = self._handle, None
+        if handle is None:
+            return
+        if isinstance(handle, subprocess.Popen):
+            try:
+                os.killpg(handle.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            handle.wait()
+            handle.stdout.close()
+        else:
+            handle.close()
+
+
+class SensorStreams:
+    """Registry of running sensor streams keyed by device and command."""
+
+    def __init__(self, pool=None):
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._streams = {}
+
+    def reading(self, name, device, command, max_age, first_sample_timeout) -> SensorReading:
+        key = (name, command)
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is None:
+                # A command silent for longer than a sample may be old is treated as hung.
+                stream = self._streams[key] = SensorStream(
+                    name, device, command, pool=self._pool, stall_timeout=max_age
+                ).start()
+        stream.wait_for_sample(first_sample_timeout)
+        return stream.reading(max_age)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            streams = dict(self._streams)
+        return {name: stream.snapshot() for (name, _command), stream in streams.items()}
+
+    def close(self):
+        with self._lock:
+            streams = list(self._streams.values())
+            self._streams.clear()
+        for stream in streams:
+            stream.stop()
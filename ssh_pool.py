@@ -0,0 +1,242 @@
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from limits import default_limiter
+
+SYSTEM_KNOWN_HOSTS = os.path.expanduser(os.path.join("~", ".ssh", "known_hosts"))
+
+
+@dataclass
+class SSHPoolStats:
+    hits: int = 0
+    connects: int = 0
+    reconnects: int = 0
+    handshake_seconds: float = 0.0
+
+    def as_dict(self):
+        handshakes = self.connects + self.reconnects
+        return {
+            "hits": self.hits,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "handshake_seconds": round(self.handshake_seconds, 6),
+            "average_handshake_seconds": (
+                round(self.handshake_seconds / handshakes, 6) if handshakes else None
+            ),
+        }
+
+
+@dataclass
+class _PooledConnection:
+    client: object = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    connected_before: bool = False
+    last_used: Optional[float] = None
+
+
+def pool_key(host: str, username: str, password: str = None, key_path: str = None):
+    """Identify a connection without keeping a readable secret in the key."""
+    if key_path:
+        auth = ("key", key_path)
+    else:
+        auth = ("password", hashlib.sha256((password or "").encode("utf-8")).hexdigest())
+    return (host, username, auth)
+
+
+class SSHConnectionPool:
+    """Keep authenticated SSH transports alive and open one channel per command.
+
+    Parsed ``known_hosts`` entries and private keys are cached and reloaded only
+    when their files change. Unknown host keys are still rejected.
+    """
+
+    def __init__(
+        self,
+        paramiko_module=None,
+        known_hosts_path=SYSTEM_KNOWN_HOSTS,
+        clock=time.monotonic,
+        limiter=None,
+    ):
+        self._paramiko = paramiko_module
+        self._limiter = limiter or default_limiter
+        self._known_hosts_path = known_hosts_path
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._connections = {}
+        self._host_keys = None
+        self._host_keys_signature = None
+        self._private_keys = {}
+        self._stats = SSHPoolStats()
+
+    @property
+    def paramiko(self):
+        if self._paramiko is None:
+            import paramiko
+
+            self._paramiko = paramiko
+        return self._paramiko
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = self._stats.as_dict()
+            result["open_connections"] = sum(
+                1 for entry in self._connections.values() if entry.client is not None
+            )
+        return result
+
+    def _file_signature(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _known_host_keys(self):
+        signature = self._file_signature(self._known_hosts_path)
+        with self._lock:
+            if self._host_keys is None or signature != self._host_keys_signature:
+                host_keys = self.paramiko.HostKeys()
+                if signature is not None:
+                    host_keys.load(self._known_hosts_path)
+                self._host_keys = host_keys
+                self._host_keys_signature = signature
+            return self._host_keys
+
+    def _private_key(self, key_path):
+        signature = self._file_signature(key_path)
+        with self._lock:
+            cached = self._private_keys.get(key_path)
+            if cached and cached[0] == signature:
+                return cached[1]
+        pkey = self.paramiko.PKey.from_path(key_path)
+        with self._lock:
+            self._private_keys[key_path] = (signature, pkey)
+        return pkey
+
+    def _new_client(self, host, username, password, key_path, port, **connect_options):
+        from utils import configure_ssh_client
+
+        client = self.paramiko.SSHClient()
+        configure_ssh_client(client, self.paramiko, load_system_host_keys=False)
+        hostkey_name = host if port == 22 else f"[{host}]:{port}"
+        known = self._known_host_keys().lookup(hostkey_name)
+        if known:
+            client.get_host_keys()[hostkey_name] = {
+                key_type: known[key_type] for key_type in known.keys()
+            }
+        if key_path:
+            connect_options["pkey"] = self._private_key(key_path)
+        else:
+            connect_options["password"] = password
+        try:
+            client.connect(host, port=port, username=username, **connect_options)
+        except Exception:
+            client.close()
+            raise
+        return client
+
+    def _entry(self, key):
+        with self._lock:
+            entry = self._connections.get(key)
+            if entry is None:
+                entry = self._connections[key] = _PooledConnection()
+            return entry
+
+    @staticmethod
+    def _is_alive(client):
+        transport = client.get_transport() if client is not None else None
+        return transport is not None and transport.is_active()
+
+    def _connected_client(self, entry, host, username, password, key_path, port, connect_options):
+        with entry.lock:
+            if self._is_alive(entry.client):
+                with self._lock:
+                    self._stats.hits += 1
+                entry.last_used = self._clock()
+                return entry.client
+
+            reconnect = entry.connected_before
+            self._close_client(entry.client)
+            entry.client = None
+            release = self._limiter.acquire('ssh_connect', host, timeout=connect_options.get('timeout'))
+            try:
+                started = self._clock()
+                client = self._new_client(host, username, password, key_path, port, **connect_options)
+                elapsed = self._clock() - started
+            finally:
+                release()
+            with self._lock:
+                if reconnect:
+                    self._stats.reconnects += 1
+                else:
+                    self._stats.connects += 1
+                self._stats.handshake_seconds += elapsed
+            entry.client = client
+            entry.connected_before = True
+            entry.last_used = self._clock()
+            return client
+
+    def exec_command(
+        self,
+        host: str,
+        username: str,
+        command: str,
+        password: str = None,
+        key_path: str = None,
+        port: int = 22,
+        **connect_options,
+    ):
+        """Return ``(stdin, stdout, stderr)`` for ``command`` on a pooled transport.
+
+        A transport that dies between the liveness check and opening the
+        channel is replaced once before the error is propagated.
+        """
+        key = pool_key(host, username, password, key_path)
+        entry = self._entry(key)
+        for attempt in range(2):
+            client = self._connected_client(
+                entry, host, username, password, key_path, port, connect_options
+            )
+            try:
+                return client.exec_command(command)
+            except self.paramiko.SSHException:
+                if attempt or self._is_alive(client):
+                    raise
+                with entry.lock:
+                    if entry.client is client:
+                        self._close_client(client)
+                        entry.client = None
+
+    def discard(self, host: str, username: str, password: str = None, key_path: str = None):
+        key = pool_key(host, username, password, key_path)
+        with self._lock:
+            entry = self._connections.pop(key, None)
+        if entry is not None:
+            with entry.lock:
+                self._close_client(entry.client)
+                entry.client = None
+
+    def close_all(self):
+        with self._lock:
+            entries = list(self._connections.values())
+            self._connections.clear()
+        for entry in entries:
+            with entry.lock:
+                self._close_client(entry.client)
+                entry.client = None
+
+    @staticmethod
+    def _close_client(client):
+        if client is None:
+            return
+        try:
+            client.close()
+        except Exception:
+            pass
+
+
+default_pool = SSHConnectionPool()
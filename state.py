@@ -1,6 +1,26 @@
+import threading
+
+from history import DEFAULT_HISTORY_CAPACITY, DEFAULT_ROLLUPS, VM_COLUMNS, History
+
 state = {}
 
-def init_state_from_config(hosts):
+
+class StateVersion:
+    """Monotonic version of ``state``; writers call ``publish()`` after each update."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def publish(self) -> int:
+        with self._lock:
+            self.value += 1
+            return self.value
+
+
+state_version = StateVersion()
+
+def init_state_from_config(hosts, history_capacity=DEFAULT_HISTORY_CAPACITY, history_rollups=DEFAULT_ROLLUPS):
     global state
     state.clear()
     for host in hosts:
@@ -16,8 +36,10 @@ def init_state_from_config(hosts):
             'control_temperature': None,
             'sensor_status': 'initializing',
             'last_error': None,
+            'fan_write_error': None,
             'last_updated': None,
-            'temps': [],
+            'history': History(history_capacity, rollups=history_rollups),
+            'ipmi_writes': {'issued': 0, 'suppressed': 0, 'mode_writes': 0},
             'vms': {}
         }
         if 'vms' in host and isinstance(host['vms'], list):
@@ -30,5 +52,6 @@ def init_state_from_config(hosts):
                     'sensor_status': 'initializing',
                     'last_error': None,
                     'last_updated': None,
-                    'temps': []
+                    'history': History(history_capacity, VM_COLUMNS, history_rollups)
                 }
+    state_version.publish()
@@ -1,84 +1,476 @@
-from typing import List, Optional, Tuple
+import concurrent.futures
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from breaker import BreakerTable
+from host_plan import plan_for
+from hwmon import HWMON_ROOT, HwmonCpuReader
 from state import state
-from utils import log, run_command
+from push_receiver import PushTable
+from sensor_cache import LastGoodCache
+from sensor_streams import SensorStreams, loop_command
+from sensor_bundle import BundleError, build_bundle_command, parse_bundle_output
+from utils import command_timeouts, log, run_command
+
+SensorReading = Tuple[Optional[List[float]], Optional[str]]
+
+
+@dataclass
+class HostReadings:
+    cpu_temps: Optional[List[float]] = None
+    cpu_error: Optional[str] = None
+    host_gpu: SensorReading = (None, None)
+    vm_gpus: Dict[str, SensorReading] = field(default_factory=dict)
+    # Age in seconds of each slot whose failed reading was replaced by its
+    # last good reading.
+    cached: Dict[Tuple[str, Optional[str]], float] = field(default_factory=dict)
+
 
 class TempMonitor:
-    def __init__(self, config):
+    def __init__(self, config, hwmon_root=HWMON_ROOT):
         self.config = config
+        self.hwmon_root = hwmon_root
+        self._executor = None
+        self._executor_workers = None
+        self._executor_lock = threading.Lock()
+        self._hwmon = None
+        self._hwmon_lock = threading.Lock()
+        self.streams = SensorStreams()
+        self.pushes = PushTable()
+        # Latest result per host and (source, vm) slot, reused by read_host
+        # for sources that are not due.
+        self._last_results = {}
+        self._breakers = None
+        self.last_good = LastGoodCache()
+
+    def _sensor_executor(self):
+        # Several poll workers can read hosts at once; only one may create the pool.
+        with self._executor_lock:
+            if self._executor is None:
+                workers = self.config.general.get('sensor_workers', 8)
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix="sensor-read"
+                )
+                self._executor_workers = workers
+            return self._executor
+
+    def update_config(self, config):
+        """Use a reloaded configuration, replacing the sensor pool if ``sensor_workers`` changed."""
+        self.config = config
+        with self._executor_lock:
+            executor = self._executor
+            if executor is None or self._executor_workers == config.general.get('sensor_workers', 8):
+                return
+            self._executor = None
+        executor.shutdown(wait=False)
+
+    def close(self):
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        if self._hwmon is not None:
+            self._hwmon.close()
+            self._hwmon = None
+        self.streams.close()
+        self._last_results = {}
+        self._breakers = None
+        self.last_good.clear()
+
+    def _breaker_table(self):
+        settings = self.config.general.get('circuit_breaker')
+        if not settings:
+            self._breakers = None
+        elif self._breakers is None or self._breakers.settings != settings:
+            self._breakers = BreakerTable(settings)
+        return self._breakers
+
+    def _polled(self, host, slot):
+        device = plan_for(self.config, host).device(slot[1])
+        return device is not None and device.polled
+
+    def _open_circuits(self, host, slots):
+        """Return a failed reading for each polled slot whose breaker refuses a read."""
+        breakers = self._breaker_table()
+        if breakers is None:
+            return {}
+        rejected = {}
+        for slot in slots:
+            if not self._polled(host, slot):
+                continue
+            breaker = breakers.get((host['name'], *slot))
+            if not breaker.allow():
+                error = (
+                    f"Circuit open after {breaker.consecutive_failures} consecutive failures, "
+                    f"retrying in {breaker.retry_in():.0f}s: {breaker.last_error}"
+                )
+                rejected[slot] = (None, error)
+        return rejected
+
+    def _record_circuits(self, host, results, read_slots):
+        if self._breakers is None:
+            return
+        for slot in read_slots:
+            if not self._polled(host, slot):
+                continue
+            breaker = self._breakers.get((host['name'], *slot))
+            was_open = breaker.state == 'open'
+            error = results[slot][1]
+            breaker.record(error is None, error)
+            if breaker.state == 'open' and not was_open:
+                source = slot[0] if slot[1] is None else f"VM {slot[1]}"
+                log(
+                    "WARN",
+                    host['name'],
+                    f"Circuit opened for {source} after {breaker.consecutive_failures} consecutive "
+                    f"failures; next attempt in {breaker.backoff:g} seconds",
+                )
+        host_state = state.get(host['name'])
+        if host_state is None:
+            return
+        snapshots = self._breakers.snapshot()
+        host_state['breakers'] = {
+            kind: snapshots[(host['name'], kind, None)]
+            for kind in ('cpu', 'host_gpu')
+            if (host['name'], kind, None) in snapshots
+        }
+        for vm_name, vm_state in host_state['vms'].items():
+            snapshot = snapshots.get((host['name'], 'vm_gpu', vm_name))
+            if snapshot is not None:
+                vm_state['breaker'] = snapshot
+
+    def _latest_reading(self, name, device, source, command):
+        """Return the latest pushed or streamed reading, or ``None`` if ``source`` is polled."""
+        general = self.config.general
+        push = device.get('push')
+        if push:
+            temps, error = self.pushes.reading(
+                push['source'], source, max_age=general['push_receiver']['max_age']
+            )
+            if error:
+                log("ERROR", name, f"Error reading pushed {source} temperatures: {error}")
+            return temps, error
+
+        streaming = device.get('streaming')
+        if not streaming:
+            return None
+        if isinstance(streaming, dict) and streaming.get(source):
+            command = streaming[source]
+        else:
+            command = loop_command(command, general.get('stream_interval', 5))
+        temps, error = self.streams.reading(
+            name,
+            device,
+            command,
+            max_age=general.get('stream_max_age', 30),
+            first_sample_timeout=general.get('sensor_deadline', 30),
+        )
+        if error:
+            log("ERROR", name, f"Error reading {source} sensor stream: {error}")
+        return temps, error
+
+    def _hwmon_reader(self):
+        with self._hwmon_lock:
+            if self._hwmon is None:
+                self._hwmon = HwmonCpuReader(self.hwmon_root)
+            return self._hwmon
+
+    def _get_hwmon_cpu_temps(self, host):
+        try:
+            temps = self._hwmon_reader().read()
+        except (OSError, ValueError) as e:
+            log("ERROR", host['name'], f"Error reading CPU temps from hwmon: {e}")
+            return None
+        if not temps:
+            log("ERROR", host['name'], "Error reading CPU temps from hwmon: No CPU sensors found")
+        return temps
+
+    def read_host(self, host: dict, deadline_seconds: float, sources=None) -> HostReadings:
+        """Read the CPU, host GPU, and every VM GPU source of ``host`` concurrently.
+
+        Sources that have not answered when the deadline expires are reported
+        as failed; their reads keep running in the background and are ignored.
+        With ``sources``, only those poll sources are read and the others reuse
+        the host's previous result; a source without one is always read.
+        A polled source whose circuit breaker is open fails immediately.
+        """
+        cached = self._last_results.get(host['name'], {})
+        slots = [('cpu', None), ('host_gpu', None)]
+        slots.extend(('vm_gpu', vm['name']) for vm in host.get('vms') or [])
+        results = {
+            slot: cached[slot]
+            for slot in slots
+            if not (sources is None or slot[0] in sources or slot not in cached)
+        }
+        rejected = self._open_circuits(host, [slot for slot in slots if slot not in results])
+        results.update(rejected)
+
+        def due(slot):
+            return slot not in results
+
+        executor = self._sensor_executor()
+        bundle = self.config.general.get('sensor_bundle', False)
+        futures = {}
+        if bundle and host.get('ssh_credentials') and due(('cpu', None)) and due(('host_gpu', None)):
+            futures[executor.submit(self.read_device, host, host, True)] = [
+                ('cpu', None), ('host_gpu', None)
+            ]
+        else:
+            if due(('cpu', None)):
+                futures[executor.submit(self._read_cpu, host)] = [('cpu', None)]
+            if due(('host_gpu', None)):
+                futures[executor.submit(self.get_gpu_temps, host)] = [('host_gpu', None)]
+        for vm in host.get('vms') or []:
+            if not due(('vm_gpu', vm['name'])):
+                continue
+            if bundle:
+                task = executor.submit(self.read_device, host, vm, False)
+            else:
+                task = executor.submit(self.get_gpu_temps, host, vm['name'])
+            futures[task] = [('vm_gpu', vm['name'])]
+
+        started = time.monotonic()
+        done, pending = concurrent.futures.wait(futures, timeout=deadline_seconds)
+        for future in done:
+            future_slots = futures[future]
+            try:
+                result = future.result()
+            except Exception as exc:
+                result = {slot: (None, str(exc)) for slot in future_slots}
+            if len(future_slots) == 1 and not isinstance(result, dict):
+                result = {future_slots[0]: result}
+            for slot in future_slots:
+                results[slot] = result[slot]
+        for future in pending:
+            future.cancel()
+            error = f"Sensor read timed out after the {deadline_seconds:g}s host deadline"
+            for slot in futures[future]:
+                results[slot] = (None, error)
+        if pending:
+            log(
+                "WARN",
+                host['name'],
+                f"{len(pending)} sensor read(s) missed the host deadline after "
+                f"{time.monotonic() - started:.2f} seconds",
+            )
+        read_slots = [slot for future_slots in futures.values() for slot in future_slots]
+        self._record_circuits(host, results, read_slots)
+        self._last_results[host['name']] = results
+        return self._resolve_readings(host, slots, results, set(read_slots) | set(rejected))
+
+    def _resolve_readings(self, host, slots, results, fresh_slots):
+        """Build ``HostReadings``, answering failed slots from the last-good cache when enabled."""
+        max_age = self.config.general.get('sensor_cache_max_age', 0)
+        readings = HostReadings()
+        for slot in slots:
+            result = results[slot]
+            if max_age:
+                result, age = self.last_good.resolve(
+                    (host['name'], *slot), result, max_age, fresh=slot in fresh_slots
+                )
+                if age is not None:
+                    readings.cached[slot] = age
+                    source = slot[0] if slot[1] is None else f"VM {slot[1]}"
+                    log("WARN", host['name'], f"Using {source} reading from {age:.0f} seconds ago: {results[slot][1]}")
+            self._store_reading(readings, slot, result)
+        if max_age and host['name'] in state:
+            self._publish_cache(host, slots)
+        return readings
+
+    def _publish_cache(self, host, slots):
+        keys = [(host['name'], *slot) for slot in slots]
+        ages = {
+            'cpu': _rounded_age(self.last_good.age((host['name'], 'cpu', None))),
+            'host_gpu': _rounded_age(self.last_good.age((host['name'], 'host_gpu', None))),
+            'vm_gpu': {
+                vm_name: _rounded_age(self.last_good.age((host['name'], kind, vm_name)))
+                for kind, vm_name in slots
+                if kind == 'vm_gpu'
+            },
+        }
+        state[host['name']]['sensor_cache'] = dict(self.last_good.stats(keys), ages=ages)
+
+    @staticmethod
+    def _store_reading(readings, slot, result):
+        kind, vm_name = slot
+        if kind == 'cpu':
+            readings.cpu_temps, readings.cpu_error = result
+        elif kind == 'host_gpu':
+            readings.host_gpu = result
+        else:
+            readings.vm_gpus[vm_name] = result
+
+    def read_device(self, host: dict, device: dict, include_cpu: bool) -> dict:
+        """Collect every sensor of one device with a single framed command.
+
+        Returns readings keyed like ``read_host`` slots. When the bundle as a
+        whole fails, each sensor command is executed separately instead.
+        """
+        cpu_slot = ('cpu', None)
+        gpu_slot = ('host_gpu', None) if device is host else ('vm_gpu', device['name'])
+        gpu_commands, gpu_error = self._gpu_commands(host, device)
+        sections = list(gpu_commands)
+        if include_cpu:
+            sections.insert(0, ('cpu', self.config.general['cpu_temperature_command']))
+        if len(sections) < 2 or not device.get('ssh_credentials') or device.get('streaming') or device.get('push'):
+            return self._read_device_separately(host, device, include_cpu, cpu_slot, gpu_slot)
+
+        name = device.get('name', '')
+        debug = self.config.general.get('debug', False)
+        output, error = run_command(
+            device,
+            build_bundle_command(sections),
+            logger=log,
+            log_tag=name,
+            debug=debug,
+            timeouts=command_timeouts(self.config.general, 'gpu_sensor'),
+            command_class='sensor_bundle',
+        )
+        try:
+            if output is None:
+                raise BundleError(error or 'No output')
+            sections_output = parse_bundle_output(output, [section for section, _ in sections])
+        except BundleError as e:
+            log("WARN", name, f"Sensor bundle failed, reading sensors separately: {e}")
+            return self._read_device_separately(host, device, include_cpu, cpu_slot, gpu_slot)
+
+        results = {}
+        if include_cpu:
+            results[cpu_slot] = self._parse_cpu_output(device, *sections_output['cpu'])
+        if gpu_commands:
+            temps, errors = [], []
+            for vendor, _command in gpu_commands:
+                self._parse_gpu_output(name, *sections_output[vendor], temps, errors)
+            results[gpu_slot] = self._gpu_result(temps, errors)
+        else:
+            results[gpu_slot] = (None, gpu_error)
+        return results
+
+    def _read_device_separately(self, host, device, include_cpu, cpu_slot, gpu_slot):
+        results = {}
+        if include_cpu:
+            results[cpu_slot] = self._read_cpu(device)
+        vm_name = None if device is host else device['name']
+        results[gpu_slot] = self.get_gpu_temps(host, vm_name)
+        return results
 
     def get_cpu_temps(self, host: dict) -> Optional[List[float]]:
+        return self._read_cpu(host)[0]
+
+    def _read_cpu(self, host: dict) -> SensorReading:
         if 'name' not in host:
             log("WARN", "TEMP", f"Invalid host configuration: {host}")
-            return None
+            return None, 'Invalid host configuration'
         if host['name'] not in state:
             log("WARN", host.get('name', 'TEMP'), f"Host {host['name']} not found in state.")
-            return None
+            return None, f"Host {host['name']} not found in state."
+
+        streamed = self._latest_reading(
+            host['name'], host, 'cpu', self.config.general['cpu_temperature_command']
+        )
+        if streamed is not None:
+            return streamed
+
+        if (
+            self.config.general.get('cpu_temperature_source') == 'hwmon'
+            and not host.get('ssh_credentials')
+        ):
+            temps = self._get_hwmon_cpu_temps(host)
+            return temps, None if temps else 'CPU temperature unavailable'
 
         debug = self.config.general.get('debug', False)
         ssh_command = self.config.general['cpu_temperature_command']
 
-        temps = []
         try:
-            output, error = run_command(host, ssh_command, logger=log, log_tag=host['name'], debug=debug)
-            if error or not output or not output.strip():
-                log("ERROR", host['name'], f"Error getting CPU temps from host {host['name']}: {error if error else 'No output'}")
-                return None
-            temps = [float(n) for n in output.strip().split(';') if n]
+            output, error = run_command(
+                host,
+                ssh_command,
+                logger=log,
+                log_tag=host['name'],
+                debug=debug,
+                timeouts=command_timeouts(self.config.general, 'cpu_sensor'),
+                command_class='cpu_sensor',
+            )
         except Exception as e:
             log("ERROR", host['name'], f"Error getting CPU temps from host {host['name']}: {e}")
-            return None
-        return temps if temps else None
+            return None, str(e)
+        return self._parse_cpu_output(host, output, error)
+
+    def _parse_cpu_output(self, host, output, error):
+        if error or not output or not output.strip():
+            log("ERROR", host['name'], f"Error getting CPU temps from host {host['name']}: {error if error else 'No output'}")
+            return None, str(error).strip() if error else 'No output'
+        try:
+            temps = [float(n) for n in output.strip().split(';') if n]
+        except ValueError as e:
+            log("ERROR", host['name'], f"Error getting CPU temps from host {host['name']}: {e}")
+            return None, str(e)
+        return (temps, None) if temps else (None, 'No output')
+
+    def _gpu_commands(self, host, device):
+        plan = plan_for(self.config, host).device(None if device is host else device['name'])
+        return plan.gpu_commands, plan.gpu_error
 
     def get_gpu_temps(
         self, host: dict, vm_name: Optional[str] = None
     ) -> Tuple[Optional[List[float]], Optional[str]]:
-        if vm_name is not None:
-            device = next((v for v in host.get('vms', []) if v['name'] == vm_name), None)
-            if not device:
-                error = f"VM ({vm_name}) not found in host {host['name']}."
-                log("WARN", host['name'], error)
-                return None, error
-        else:
-            device = host
+        plan = plan_for(self.config, host).device(vm_name)
+        if plan is None:
+            error = f"VM ({vm_name}) not found in host {host['name']}."
+            log("WARN", host['name'], error)
+            return None, error
+        device = plan.device
 
         debug = self.config.general.get('debug', False)
-        name = device.get('name', '')
-        gpu_type = device.get('gpu_type')
-        if not gpu_type or (isinstance(gpu_type, list) and len(gpu_type) == 0):
-            return None, None
-        if isinstance(gpu_type, list):
-            gpu_types = [str(gt).lower() for gt in gpu_type]
-        elif isinstance(gpu_type, str):
-            gpu_types = [gpu_type.lower()]
-        else:
-            gpu_types = []
-
-        cmds = []
-        if any('nvidia' in gt for gt in gpu_types):
-            cmds.append(self.config.general['gpu_temperature_command_nvidia'])
-        if any('amd' in gt for gt in gpu_types):
-            cmds.append(self.config.general['gpu_temperature_command_amd'])
-
+        name = plan.name
+        cmds = plan.gpu_commands
         if not cmds:
-            error = f"Device {name} has invalid GPU type: {gpu_type}"
-            log("WARN", name, error)
-            return None, error
+            return None, plan.gpu_error
 
         temps = []
         errors = []
-        for ssh_command in cmds:
-            output, error = run_command(device, ssh_command, logger=log, log_tag=name, debug=debug)
-            if error or not output or not isinstance(output, str) or not output.strip():
-                detail = str(error).strip() if error else 'No output'
-                errors.append(detail)
-                log("ERROR", name, f"Error getting GPU temps from Device {name}: {detail}")
+        stream_name = name if vm_name is None else f"{host['name']}/{name}"
+        for vendor, ssh_command in cmds:
+            streamed = self._latest_reading(stream_name, device, vendor, ssh_command)
+            if streamed is not None:
+                if streamed[0]:
+                    temps.extend(streamed[0])
+                else:
+                    errors.append(streamed[1])
+                continue
+            output, error = run_command(
+                device,
+                ssh_command,
+                logger=log,
+                log_tag=name,
+                debug=debug,
+                timeouts=command_timeouts(self.config.general, 'gpu_sensor'),
+                command_class='gpu_sensor',
+            )
+            self._parse_gpu_output(name, output, error, temps, errors)
+        return self._gpu_result(temps, errors)
+
+    @staticmethod
+    def _parse_gpu_output(name, output, error, temps, errors):
+        if error or not output or not isinstance(output, str) or not output.strip():
+            detail = str(error).strip() if error else 'No output'
+            errors.append(detail)
+            log("ERROR", name, f"Error getting GPU temps from Device {name}: {detail}")
+            return
+        for n in output.strip().split(';'):
+            try:
+                temps.append(float(n))
+            except ValueError:
+                log("WARN", name, f"Warning: The GPU temperature response is not a numeric value: {n}")
                 continue
-            for n in output.strip().split(';'):
-                try:
-                    temps.append(float(n))
-                except ValueError:
-                    log("WARN", name, f"Warning: The GPU temperature response is not a numeric value: {n}")
-                    continue
+
+    @staticmethod
+    def _gpu_result(temps, errors):
         if temps:
             return temps, None
         return None, '; '.join(errors) if errors else 'GPU temperature unavailable'
+
+
+def _rounded_age(age):
+    return None if age is None else round(age, 1)
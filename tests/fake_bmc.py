@@ -0,0 +1,177 @@
+"""Local UDP stand-in for a Dell iDRAC speaking IPMI v2.0 RMCP+ (cipher suite 3)."""
+
+import os
+import socket
+import struct
+import threading
+import uuid
+
+from ipmi_lan import (
+    CMD_CLOSE_SESSION,
+    CMD_GET_DEVICE_ID,
+    CMD_SET_SESSION_PRIVILEGE,
+    NETFN_APP,
+    PAYLOAD_IPMI,
+    PAYLOAD_OPEN_SESSION_REQUEST,
+    PAYLOAD_OPEN_SESSION_RESPONSE,
+    PAYLOAD_RAKP1,
+    PAYLOAD_RAKP2,
+    PAYLOAD_RAKP3,
+    PAYLOAD_RAKP4,
+    RMCP_HEADER,
+    IpmiLanError,
+    build_packet,
+    checksum,
+    parse_packet,
+    rakp2_auth_code,
+    rakp3_auth_code,
+    rakp4_integrity_value,
+    session_keys,
+)
+
+CMD_GET_CHANNEL_AUTH_CAPABILITIES = 0x38
+
+
+def ipmi_response(request, code, data=b""):
+    netfn, rq_seq, command = request[1] >> 2, request[4] >> 2, request[5]
+    header = bytes([request[3], (netfn + 1) << 2])
+    body = bytes([request[0], rq_seq << 2, command, code]) + bytes(data)
+    return header + bytes([checksum(header)]) + body + bytes([checksum(body)])
+
+
+class FakeBmc:
+    def __init__(self, users, host="127.0.0.1"):
+        self.users = {name.encode(): password.encode()[:20] for name, password in users.items()}
+        self.guid = uuid.uuid4().bytes
+        self.sessions = {}
+        self.writes = []
+        self.authentications = 0
+        self.drop_requests = 0
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, 0))
+        self._socket.settimeout(0.2)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    @property
+    def port(self):
+        return self._socket.getsockname()[1]
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join(timeout=5)
+        self._socket.close()
+
+    def expire_sessions(self):
+        """Forget every session, as a BMC does after its idle timeout."""
+        self.sessions.clear()
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            try:
+                packet, peer = self._socket.recvfrom(2048)
+            except socket.timeout:
+                continue
+            try:
+                reply = self._handle(packet)
+            except (IpmiLanError, IndexError, KeyError, struct.error):
+                reply = None
+            if reply:
+                self._socket.sendto(reply, peer)
+
+    def _handle(self, packet):
+        if packet[:4] == RMCP_HEADER and packet[4] == 0x00:
+            return self._handle_v15(packet)
+        session_id = struct.unpack("<I", packet[6:10])[0]
+        if session_id == 0:
+            payload_type, _sid, _seq, payload = parse_packet(packet)
+            handler = {
+                PAYLOAD_OPEN_SESSION_REQUEST: self._open_session,
+                PAYLOAD_RAKP1: self._rakp1,
+                PAYLOAD_RAKP3: self._rakp3,
+            }.get(payload_type)
+            return handler(payload) if handler else None
+        session = self.sessions.get(session_id)
+        if session is None or not session.get('active'):
+            return None
+        payload_type, _sid, _seq, message = parse_packet(packet, session['k1'], session['k2'])
+        if payload_type != PAYLOAD_IPMI:
+            return None
+        if self.drop_requests:
+            self.drop_requests -= 1
+            return None
+        session['out_seq'] += 1
+        return build_packet(
+            PAYLOAD_IPMI, session['console_sid'], session['out_seq'],
+            self._ipmi(session_id, message), session['k1'], session['k2'],
+        )
+
+    def _handle_v15(self, packet):
+        # ipmitool asks for channel authentication capabilities before RMCP+.
+        message = packet[14:14 + packet[13]]
+        if message[1] >> 2 != NETFN_APP or message[5] != CMD_GET_CHANNEL_AUTH_CAPABILITIES:
+            return None
+        response = ipmi_response(message, 0, bytes([0x01, 0x80, 0x04, 0x02, 0, 0, 0, 0]))
+        return RMCP_HEADER + bytes([0x00]) + bytes(8) + bytes([len(response)]) + response
+
+    def _ipmi(self, session_id, message):
+        netfn, command, data = message[1] >> 2, message[5], message[6:-1]
+        if netfn == NETFN_APP and command == CMD_SET_SESSION_PRIVILEGE:
+            return ipmi_response(message, 0, data[:1])
+        if netfn == NETFN_APP and command == CMD_CLOSE_SESSION:
+            self.sessions.pop(session_id, None)
+            return ipmi_response(message, 0)
+        if netfn == NETFN_APP and command == CMD_GET_DEVICE_ID:
+            return ipmi_response(message, 0, bytes([0x20, 0x81, 0x06, 0x10, 0x02, 0xBF, 0xA2, 0x02, 0, 0, 0, 0, 0, 0, 0]))
+        if netfn == 0x30 and command == 0x30:
+            self.writes.append(bytes(data))
+            return ipmi_response(message, 0)
+        return ipmi_response(message, 0xC1)
+
+    def _open_session(self, payload):
+        bmc_sid = struct.unpack("<I", os.urandom(4))[0] | 1
+        self.sessions[bmc_sid] = {'console_sid': struct.unpack("<I", payload[4:8])[0], 'out_seq': 0}
+        response = bytes([payload[0], 0, 0x04, 0]) + payload[4:8] + struct.pack("<I", bmc_sid) + payload[8:32]
+        return build_packet(PAYLOAD_OPEN_SESSION_RESPONSE, 0, 0, response)
+
+    def _rakp1(self, payload):
+        bmc_sid = struct.unpack("<I", payload[4:8])[0]
+        session = self.sessions[bmc_sid]
+        username = payload[28:28 + payload[27]]
+        password = self.users.get(username)
+        if password is None:
+            return build_packet(PAYLOAD_RAKP2, 0, 0, bytes([payload[0], 0x0D, 0, 0]) + struct.pack("<I", session['console_sid']))
+        session.update(
+            console_random=payload[8:24], bmc_random=os.urandom(16), role=payload[24],
+            username=username, kuid=password,
+        )
+        console_sid = struct.pack("<I", session['console_sid'])
+        auth_code = rakp2_auth_code(
+            password, console_sid, payload[4:8], session['console_random'], session['bmc_random'],
+            self.guid, session['role'], username,
+        )
+        return build_packet(
+            PAYLOAD_RAKP2, 0, 0,
+            bytes([payload[0], 0, 0, 0]) + console_sid + session['bmc_random'] + self.guid + auth_code,
+        )
+
+    def _rakp3(self, payload):
+        bmc_sid = struct.unpack("<I", payload[4:8])[0]
+        session = self.sessions[bmc_sid]
+        console_sid = struct.pack("<I", session['console_sid'])
+        expected = rakp3_auth_code(
+            session['kuid'], session['bmc_random'], console_sid, session['role'], session['username']
+        )
+        if payload[8:28] != expected:
+            return build_packet(PAYLOAD_RAKP4, 0, 0, bytes([payload[0], 0x0F, 0, 0]) + console_sid)
+        sik, k1, k2 = session_keys(
+            session['kuid'], session['console_random'], session['bmc_random'], session['role'], session['username']
+        )
+        session.update(k1=k1, k2=k2, active=True)
+        self.authentications += 1
+        icv = rakp4_integrity_value(sik, session['console_random'], console_sid, self.guid)
+        return build_packet(PAYLOAD_RAKP4, 0, 0, bytes([payload[0], 0, 0, 0]) + console_sid + icv)
@@ -0,0 +1,105 @@
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from adaptive_polling import next_interval, temperature_slope
+from history_store import HOST_STORE_COLUMNS, HistoryStore
+from main import adapt_intervals
+from scheduler import Scheduler
+from state import init_state_from_config, state
+
+BOUNDS = {"min_interval": 5, "max_interval": 120, "max_step": 2}
+
+
+def ramp(start, per_second, count=5, period=10):
+    return [(index * period, start + per_second * index * period) for index in range(count)]
+
+
+class NextIntervalTests(unittest.TestCase):
+    def test_slope_is_fitted_over_the_samples(self):
+        self.assertAlmostEqual(temperature_slope(ramp(40, 0.5)), 0.5)
+        self.assertIsNone(temperature_slope([(0, 40)]))
+
+    def test_fast_ramp_shortens_the_interval(self):
+        interval = next_interval(ramp(40, 0.2), [70, 90], previous=60, **BOUNDS)
+
+        # 2 °C at 0.2 °C/s is reached in 10 seconds.
+        self.assertAlmostEqual(interval, 10)
+
+    def test_stable_host_lengthens_gradually_up_to_the_cap(self):
+        flat = ramp(40, 0)
+
+        self.assertEqual(next_interval(flat, [70, 90], previous=30, **BOUNDS), 60)
+        self.assertEqual(next_interval(flat, [70, 90], previous=100, **BOUNDS), 120)
+
+    def test_proximity_to_the_next_threshold_uses_the_minimum(self):
+        self.assertEqual(next_interval(ramp(69, 0), [70, 90], previous=60, **BOUNDS), 5)
+
+    def test_headroom_is_checked_twice_before_the_threshold(self):
+        # 11.5 °C of headroom at 0.05 °C/s is 230 seconds away; 2 °C steps allow 40.
+        interval = next_interval(
+            ramp(58, 0.05, count=2), [70], previous=60, min_interval=5, max_interval=300, max_step=2
+        )
+
+        self.assertAlmostEqual(interval, 40)
+
+    def test_without_samples_the_previous_interval_is_clamped(self):
+        self.assertEqual(next_interval([], [70], previous=600, **BOUNDS), 120)
+
+
+class AdaptIntervalsTests(unittest.TestCase):
+    def setUp(self):
+        self.host = {"name": "node-a", "interval": 60, "temperatures": [70, 90], "source_intervals": {}}
+        init_state_from_config([self.host])
+        self.config = SimpleNamespace(
+            general={"interval": 60, "temperature_control_mode": "max", "adaptive_polling": dict(BOUNDS)}
+        )
+        self.scheduler = Scheduler()
+
+    def add_samples(self, samples):
+        for timestamp, temp in samples:
+            state["node-a"]["history"].append(monotonic=timestamp, temp_avg=temp, temp_max=temp)
+
+    def test_chosen_interval_is_scheduled_and_published(self):
+        self.add_samples(ramp(40, 0.2))
+
+        adapt_intervals(self.config, self.scheduler, [self.host])
+
+        self.assertEqual(state["node-a"]["poll_interval"], 10)
+        self.assertEqual(self.scheduler.snapshot()[("node-a", "cpu")]["interval"], 10)
+
+    def test_failed_latest_sample_falls_back_to_the_host_interval(self):
+        self.add_samples(ramp(40, 0.2))
+        state["node-a"]["poll_interval"] = 5
+        state["node-a"]["history"].append(monotonic=50)
+
+        adapt_intervals(self.config, self.scheduler, [self.host])
+
+        self.assertEqual(state["node-a"]["poll_interval"], 60)
+
+    def test_history_replayed_after_a_restart_does_not_break_the_slope_fit(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = HistoryStore({"path": directory})
+            history_file = store.source("node-a", HOST_STORE_COLUMNS)
+            for index in range(5):
+                history_file.append({"timestamp": 1000.0 + index * 10, "temp_max": 40.0 + index})
+            state["node-a"]["history"].attach(history_file)
+            self.add_samples([(0, 45.0)])
+
+            adapt_intervals(self.config, self.scheduler, [self.host])
+            store.close()
+
+        self.assertEqual(len(state["node-a"]["history"].raw), 1)
+        self.assertEqual(state["node-a"]["poll_interval"], 120)
+
+    def test_without_adaptive_polling_the_configured_interval_is_reported(self):
+        self.config.general["adaptive_polling"] = None
+
+        adapt_intervals(self.config, self.scheduler, [self.host])
+
+        self.assertEqual(state["node-a"]["poll_interval"], 60)
+        self.assertEqual(self.scheduler.snapshot(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
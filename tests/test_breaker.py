@@ -0,0 +1,77 @@
+import unittest
+
+from breaker import BreakerTable, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failures=2, base_backoff=10, max_backoff=25, clock=self.clock)
+
+    def fail(self, times=1):
+        for _ in range(times):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record(False, "timed out")
+
+    def test_opens_after_consecutive_failures(self):
+        self.fail()
+        self.assertEqual(self.breaker.state, "closed")
+        self.fail()
+
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.snapshot()["retry_in_seconds"], 10)
+        self.assertEqual(self.breaker.snapshot()["rejected"], 1)
+
+    def test_success_resets_the_failure_count(self):
+        self.fail()
+        self.breaker.record(True)
+        self.fail()
+
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_allows_a_single_half_open_probe_after_the_backoff(self):
+        self.fail(2)
+        self.clock.now += 10
+
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, "half_open")
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record(True)
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_doubles_the_backoff_up_to_the_limit(self):
+        self.fail(2)
+        backoffs = []
+        for _ in range(3):
+            self.clock.now += self.breaker.backoff
+            self.fail()
+            backoffs.append(self.breaker.backoff)
+
+        self.assertEqual(backoffs, [20, 25, 25])
+        self.assertEqual(self.breaker.snapshot()["opened"], 4)
+
+
+class BreakerTableTests(unittest.TestCase):
+    def test_breakers_are_created_per_key_with_the_table_settings(self):
+        table = BreakerTable({"failures": 1, "base_backoff": 5, "max_backoff": 5})
+        table.get(("host1", "vm_gpu", "vm1")).record(False, "down")
+
+        self.assertIs(table.get(("host1", "vm_gpu", "vm1")), table.get(("host1", "vm_gpu", "vm1")))
+        self.assertEqual(table.snapshot()[("host1", "vm_gpu", "vm1")]["state"], "open")
+        table.retain([])
+        self.assertEqual(table.snapshot(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
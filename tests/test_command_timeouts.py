@@ -0,0 +1,78 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from utils import CommandLatency, CommandTimeout, CommandTimeouts, command_timeouts, run_command
+
+
+def process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    try:
+        # A killed orphan may linger as a zombie until init reaps it.
+        stat = Path(f"/proc/{pid}/stat").read_text(encoding="utf-8")
+    except OSError:
+        return True
+    return stat.rsplit(")", 1)[1].split()[0] != "Z"
+
+
+class CommandTimeoutTests(unittest.TestCase):
+    def test_expired_local_pipeline_is_killed_and_reported_as_timeout(self):
+        with tempfile.TemporaryDirectory() as directory:
+            pid_file = Path(directory) / "child.pid"
+            command = f"sleep 30 & echo $! > {pid_file}; wait"
+
+            started = time.monotonic()
+            output, error = run_command(
+                {}, command, logger=None, timeouts=CommandTimeouts(total=0.5)
+            )
+            elapsed = time.monotonic() - started
+
+            self.assertIsNone(output)
+            self.assertIsInstance(error, CommandTimeout)
+            self.assertIn("timed out", error)
+            self.assertLess(elapsed, 5)
+            child = int(pid_file.read_text(encoding="utf-8"))
+            for _ in range(50):
+                if not process_exists(child):
+                    break
+                time.sleep(0.02)
+            self.assertFalse(process_exists(child))
+
+    def test_command_finishing_in_time_is_not_a_timeout(self):
+        output, error = run_command(
+            {}, "echo 42", logger=None, timeouts=CommandTimeouts(command=5, total=5)
+        )
+
+        self.assertEqual(output, "42")
+        self.assertNotIsInstance(error, CommandTimeout)
+
+    def test_latency_percentiles_and_timeouts_are_recorded_per_class(self):
+        latency = CommandLatency()
+        for value in range(1, 101):
+            latency.record("cpu_sensor", value / 100)
+        latency.record("ipmi_write", 30.0, timed_out=True)
+
+        snapshot = latency.snapshot()
+
+        self.assertEqual(snapshot["cpu_sensor"]["samples"], 100)
+        self.assertEqual(snapshot["cpu_sensor"]["p50"], 0.51)
+        self.assertEqual(snapshot["cpu_sensor"]["p99"], 1.0)
+        self.assertEqual(snapshot["cpu_sensor"]["timeouts"], 0)
+        self.assertEqual(snapshot["ipmi_write"]["timeouts"], 1)
+
+    def test_timeouts_are_resolved_from_general_configuration(self):
+        general = {"command_timeouts": {"gpu_sensor": {"connect": 2, "command": 3, "total": 4}}}
+
+        self.assertEqual(
+            command_timeouts(general, "gpu_sensor"), CommandTimeouts(2, 3, 4)
+        )
+        self.assertIsNone(command_timeouts({}, "gpu_sensor"))
+
+
+if __name__ == "__main__":
+    unittest.main()
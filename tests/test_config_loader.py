@@ -54,6 +54,44 @@ class ConfigLoaderTests(unittest.TestCase):
                     }
                 )
 
+    def test_rejects_invalid_poll_worker_count(self):
+        for value in (True, 0, 257, 2.5):
+            with self.subTest(value=value), self.assertRaises(ConfigError):
+                load_config(
+                    {
+                        "general": {"poll_workers": value},
+                        "hosts": [base_host()],
+                    }
+                )
+
+    def test_command_timeouts_merge_overrides_with_defaults(self):
+        config = load_config(
+            {
+                "general": {"command_timeouts": {"ipmi_write": {"total": 12}}},
+                "hosts": [base_host()],
+            }
+        )
+
+        self.assertEqual(config.general["command_timeouts"]["ipmi_write"]["total"], 12)
+        self.assertEqual(config.general["command_timeouts"]["ipmi_write"]["connect"], 5)
+        self.assertIn("cpu_sensor", config.general["command_timeouts"])
+
+    def test_rejects_invalid_command_timeouts(self):
+        for value in (
+            {"cpu_sensor": {"total": 0}},
+            {"cpu_sensor": {"total": math.inf}},
+            {"cpu_sensor": {"idle": 5}},
+            {"unknown": {"total": 5}},
+            [],
+        ):
+            with self.subTest(value=value), self.assertRaises(ConfigError):
+                load_config(
+                    {
+                        "general": {"command_timeouts": value},
+                        "hosts": [base_host()],
+                    }
+                )
+
     def test_rejects_fan_speeds_outside_ipmi_percentage_range(self):
         host = base_host()
         host["speeds"] = [20, 150]
@@ -77,6 +115,166 @@ class ConfigLoaderTests(unittest.TestCase):
                 }
             )
 
+    def test_rejects_invalid_streaming_settings(self):
+        for value in ["yes", {"gpu": "nvidia-smi -l 5"}, {"cpu": " "}]:
+            host = base_host()
+            host["streaming"] = value
+            with self.subTest(value=value), self.assertRaises(ConfigError):
+                load_config({"hosts": [host]})
+
+    def test_push_sources_default_to_device_names_and_must_be_unique(self):
+        host = base_host()
+        host["push"] = {"key": "host-key"}
+        host["vms"] = [{"name": "vm1", "gpu_type": "nvidia", "push": {"key": "vm-key"}}]
+
+        config = load_config({"general": {"push_receiver": {"port": 9870}}, "hosts": [host]})
+
+        self.assertEqual(config.hosts[0]["push"]["source"], config.hosts[0]["name"])
+        self.assertEqual(config.hosts[0]["vms"][0]["push"]["source"], f'{host["name"]}/vm1')
+        self.assertEqual(config.general["push_receiver"]["max_age"], 30)
+
+        host["vms"][0]["push"]["source"] = host["name"]
+        with self.assertRaises(ConfigError):
+            load_config({"general": {"push_receiver": {"port": 9870}}, "hosts": [host]})
+
+    def test_push_requires_a_receiver(self):
+        host = base_host()
+        host["push"] = {"key": "host-key"}
+
+        with self.assertRaises(ConfigError):
+            load_config({"hosts": [host]})
+
+    def test_ipmi_transport_must_be_known(self):
+        config = load_config({"general": {"ipmi_transport": "lanplus"}, "hosts": [base_host()]})
+        self.assertEqual(config.general["ipmi_transport"], "lanplus")
+
+        with self.assertRaises(ConfigError):
+            load_config({"general": {"ipmi_transport": "serial"}, "hosts": [base_host()]})
+
+    def test_host_interval_defaults_to_the_general_interval(self):
+        config = load_config({"general": {"interval": 10}, "hosts": [base_host()]})
+
+        self.assertEqual(config.hosts[0]["interval"], 10)
+        self.assertEqual(config.hosts[0]["source_intervals"], {})
+
+    def test_adaptive_polling_bounds_are_validated(self):
+        config = load_config({"general": {"adaptive_polling": {"min_interval": 2}}, "hosts": [base_host()]})
+        self.assertEqual(
+            config.general["adaptive_polling"], {"min_interval": 2, "max_interval": 120, "max_step": 2}
+        )
+
+        for adaptive in ({"min_interval": 0}, {"min_interval": 60, "max_interval": 30}, {"step": 1}):
+            with self.subTest(adaptive=adaptive):
+                with self.assertRaises(ConfigError):
+                    load_config({"general": {"adaptive_polling": adaptive}, "hosts": [base_host()]})
+
+    def test_sensor_cache_max_age_must_not_be_negative(self):
+        self.assertEqual(load_config({"hosts": [base_host()]}).general["sensor_cache_max_age"], 0)
+
+        with self.assertRaises(ConfigError):
+            load_config({"general": {"sensor_cache_max_age": -1}, "hosts": [base_host()]})
+
+    def test_history_capacity_must_be_an_integer_of_at_least_two(self):
+        config = load_config({"general": {"history_capacity": 720}, "hosts": [base_host()]})
+        self.assertEqual(config.general["history_capacity"], 720)
+
+        for capacity in (1, 2.5, True):
+            with self.subTest(capacity=capacity):
+                with self.assertRaises(ConfigError):
+                    load_config({"general": {"history_capacity": capacity}, "hosts": [base_host()]})
+
+    def test_history_rollups_are_validated_and_sorted(self):
+        self.assertEqual(
+            load_config({"hosts": [base_host()]}).general["history_rollups"], ((60, 172800), (900, 2592000))
+        )
+        config = load_config(
+            {
+                "general": {
+                    "history_rollups": [
+                        {"resolution": 300, "retention": 86400},
+                        {"resolution": 10, "retention": 3600},
+                    ]
+                },
+                "hosts": [base_host()],
+            }
+        )
+        self.assertEqual(config.general["history_rollups"], ((10, 3600), (300, 86400)))
+        self.assertEqual(
+            load_config({"general": {"history_rollups": []}, "hosts": [base_host()]}).general["history_rollups"],
+            (),
+        )
+
+        for rollups in (
+            {"resolution": 60},
+            [{"resolution": 60}],
+            [{"resolution": 0, "retention": 60}],
+            [{"resolution": 60, "retention": 30}],
+            [{"resolution": 60, "retention": 600}, {"resolution": 60, "retention": 1200}],
+        ):
+            with self.subTest(rollups=rollups):
+                with self.assertRaises(ConfigError):
+                    load_config({"general": {"history_rollups": rollups}, "hosts": [base_host()]})
+
+    def test_history_store_settings_are_validated(self):
+        config = load_config({"general": {"history_store": {"path": "/var/lib/fan-control"}}, "hosts": [base_host()]})
+        self.assertEqual(
+            config.general["history_store"],
+            {"path": "/var/lib/fan-control", "capacity": 50000, "flush_interval": 60},
+        )
+
+        for store in ({"capacity": 10}, {"path": ""}, {"path": "/tmp", "capacity": 1}, {"path": "/tmp", "fsync": True}):
+            with self.subTest(store=store):
+                with self.assertRaises(ConfigError):
+                    load_config({"general": {"history_store": store}, "hosts": [base_host()]})
+
+    def test_circuit_breaker_settings_are_validated(self):
+        config = load_config({"general": {"circuit_breaker": {"failures": 5}}, "hosts": [base_host()]})
+        self.assertEqual(
+            config.general["circuit_breaker"], {"failures": 5, "base_backoff": 30, "max_backoff": 600}
+        )
+
+        for breaker in ({"failures": 0}, {"base_backoff": 60, "max_backoff": 30}, {"timeout": 1}):
+            with self.subTest(breaker=breaker):
+                with self.assertRaises(ConfigError):
+                    load_config({"general": {"circuit_breaker": breaker}, "hosts": [base_host()]})
+
+    def test_source_intervals_must_name_known_sources(self):
+        for source_intervals in ({"disk": 10}, {"cpu": 0}, ["cpu"]):
+            with self.subTest(source_intervals=source_intervals):
+                host = base_host()
+                host["source_intervals"] = source_intervals
+                with self.assertRaises(ConfigError):
+                    load_config({"hosts": [host]})
+
+    def test_poll_stagger_must_be_known(self):
+        config = load_config({"general": {"poll_stagger": "hashed"}, "hosts": [base_host()]})
+        self.assertEqual(config.general["poll_stagger"], "hashed")
+
+        with self.assertRaises(ConfigError):
+            load_config({"general": {"poll_stagger": "random"}, "hosts": [base_host()]})
+
+    def test_remote_limits_are_validated(self):
+        limits = {"ssh_connect": {"global": 10, "per_host": 2, "rate": 5, "burst": 10}}
+        config = load_config({"general": {"remote_limits": limits}, "hosts": [base_host()]})
+        self.assertEqual(config.general["remote_limits"], limits)
+
+        for limits in (
+            {"sftp": {"global": 1}},
+            {"ssh_exec": {"per_host": 0}},
+            {"ipmi_session": {"rate": -1}},
+            {"ipmi_session": {"burst": 2}},
+        ):
+            with self.subTest(limits=limits):
+                with self.assertRaises(ConfigError):
+                    load_config({"general": {"remote_limits": limits}, "hosts": [base_host()]})
+
+    def test_async_fan_writes_must_be_boolean(self):
+        config = load_config({"hosts": [base_host()]})
+        self.assertFalse(config.general["async_fan_writes"])
+
+        with self.assertRaises(ConfigError):
+            load_config({"general": {"async_fan_writes": "yes"}, "hosts": [base_host()]})
+
     def test_ssh_private_key_does_not_require_a_password(self):
         host = base_host()
         host["ssh_credentials"] = {
@@ -25,11 +25,20 @@ def document(host_name="node-a", mode="manual", interval=60):
     }
 
 
+class RecordingWriter:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def close(self, timeout=None):
+        self.calls.append(("close-writers", None))
+
+
 class RecordingController:
     def __init__(self, config, fail_restore=False):
         self.config = config
         self.fail_restore = fail_restore
         self.calls = []
+        self.writer = RecordingWriter(self.calls)
 
     def set_fan_control(self, mode, host):
         self.calls.append((mode, host["name"]))
@@ -42,6 +51,12 @@ class RecordingMonitor:
     def __init__(self, config):
         self.config = config
 
+    def close(self):
+        pass
+
+    def update_config(self, config):
+        self.config = config
+
 
 class ConfigReloadTests(unittest.TestCase):
     def write(self, path, value):
@@ -92,7 +107,7 @@ class ConfigReloadTests(unittest.TestCase):
             self.assertTrue(applied)
             self.assertEqual(
                 controller.calls,
-                [("automatic", "node-a"), ("automatic", "node-b")],
+                [("close-writers", None), ("automatic", "node-a"), ("automatic", "node-b")],
             )
             self.assertEqual(active.hosts[0]["name"], "node-b")
             self.assertEqual(active.general["interval"], 5)
@@ -117,7 +132,7 @@ class ConfigReloadTests(unittest.TestCase):
             self.assertIs(controller.config, active)
             self.assertEqual(
                 controller.calls,
-                [("automatic", "node-a"), ("manual", "node-a")],
+                [("close-writers", None), ("automatic", "node-a"), ("manual", "node-a")],
             )
 
 
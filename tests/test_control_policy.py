@@ -30,6 +30,17 @@ class DetermineControlTemperatureTests(unittest.TestCase):
         self.assertEqual(result.control_temperature, 999.0)
         self.assertTrue(result.fail_safe)
 
+    def test_cached_sources_are_reported_on_the_decision(self):
+        snapshot = SensorSnapshot(
+            cpu_temps=[45.0], gpu_temps=[60.0], cached_sources=("vm_gpu/vm1",)
+        )
+
+        result = determine_control_temperature(snapshot, mode="max")
+
+        self.assertEqual(result.control_temperature, 60.0)
+        self.assertFalse(result.fail_safe)
+        self.assertEqual(result.cached_sources, ("vm_gpu/vm1",))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from downsample import lttb, minmax
+
+
+def series(values, missing=()):
+    return {
+        "timestamp": [float(index) for index in range(len(values))],
+        "min": [None if index in missing else value - 1 for index, value in enumerate(values)],
+        "avg": [None if index in missing else value for index, value in enumerate(values)],
+        "max": [None if index in missing else value + 1 for index, value in enumerate(values)],
+    }
+
+
+class MinMaxTests(unittest.TestCase):
+    def test_buckets_keep_the_extremes_of_every_merged_point(self):
+        result = minmax(series([40, 41, 90, 42, 43, 44, 20, 45]), 4)
+
+        self.assertEqual(result["timestamp"], [0.0, 2.0, 4.0, 6.0])
+        self.assertEqual(result["min"], [39, 41, 42, 19])
+        self.assertEqual(result["avg"], [40.5, 66.0, 43.5, 32.5])
+        self.assertEqual(result["max"], [42, 91, 45, 46])
+
+    def test_short_series_are_returned_without_missing_points(self):
+        result = minmax(series([40, 41, 42], missing={1}), 10)
+
+        self.assertEqual(result["timestamp"], [0.0, 2.0])
+        self.assertEqual(result["avg"], [40, 42])
+
+
+class LttbTests(unittest.TestCase):
+    def test_keeps_endpoints_and_the_point_that_shapes_each_bucket(self):
+        values = [40] * 50
+        values[17] = 80
+        result = lttb(series(values), 5)
+
+        self.assertEqual(len(result["timestamp"]), 5)
+        self.assertEqual(result["timestamp"][0], 0.0)
+        self.assertEqual(result["timestamp"][-1], 49.0)
+        self.assertIn(17.0, result["timestamp"])
+        self.assertEqual(result["max"][result["timestamp"].index(17.0)], 81)
+
+    def test_output_never_exceeds_the_requested_points(self):
+        for points in (2, 3, 7, 99):
+            with self.subTest(points=points):
+                self.assertEqual(len(lttb(series(list(range(100))), points)["avg"]), min(points, 100))
+
+
+if __name__ == "__main__":
+    unittest.main()
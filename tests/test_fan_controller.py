@@ -0,0 +1,98 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from fan_controller import FanController
+from state import init_state_from_config, state
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def host():
+    return {
+        "name": "node-a",
+        "fan_control_mode": "manual",
+        "temperatures": [40, 80],
+        "speeds": [20, 80],
+        "hysteresis": 0,
+    }
+
+
+class FanControllerWriteTests(unittest.TestCase):
+    def setUp(self):
+        self.host = host()
+        init_state_from_config([self.host])
+        self.clock = FakeClock()
+        self.controller = FanController(
+            SimpleNamespace(general={"debug": False, "ipmi_reassert_interval": 300}),
+            clock=self.clock,
+        )
+        patcher = patch("fan_controller.run_command", return_value=("", ""))
+        self.run_command = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def commands(self):
+        return [call.args[1].argv[-1] for call in self.run_command.call_args_list]
+
+    def test_unchanged_level_is_not_written_again(self):
+        self.controller.set_fan_control("manual", self.host)
+        for _ in range(3):
+            self.controller.set_fan_speed(20, self.host)
+        self.controller.set_fan_speed(30, self.host)
+
+        self.assertEqual(self.commands(), ["0x00", "0x14", "0x1e"])
+        self.assertEqual(state["node-a"]["ipmi_writes"], {"issued": 2, "suppressed": 2, "mode_writes": 1})
+
+    def test_level_and_manual_mode_are_reasserted_periodically(self):
+        self.controller.set_fan_control("manual", self.host)
+        self.controller.set_fan_speed(20, self.host)
+
+        self.clock.now = 301
+        self.controller.set_fan_speed(20, self.host)
+
+        self.assertEqual(self.commands(), ["0x00", "0x14", "0x00", "0x14"])
+
+    def test_failed_reassert_is_retried_and_later_reasserts_continue(self):
+        self.controller.set_fan_control("manual", self.host)
+        self.controller.set_fan_speed(20, self.host)
+
+        self.clock.now = 301
+        self.run_command.return_value = ("", "BMC busy")
+        self.assertFalse(self.controller.set_fan_speed(20, self.host))
+        self.run_command.return_value = ("", "")
+        self.assertTrue(self.controller.set_fan_speed(20, self.host))
+
+        self.clock.now = 602
+        self.controller.set_fan_speed(20, self.host)
+
+        self.assertEqual(self.commands(), ["0x00", "0x14", "0x00", "0x00", "0x14", "0x00", "0x14"])
+        self.assertEqual(state["node-a"]["ipmi_writes"]["mode_writes"], 4)
+
+    def test_failed_write_is_retried_next_cycle(self):
+        self.run_command.return_value = ("", "BMC busy")
+        self.controller.set_fan_speed(20, self.host)
+        self.run_command.return_value = ("", "")
+        self.controller.set_fan_speed(20, self.host)
+        self.controller.set_fan_speed(20, self.host)
+
+        self.assertEqual(self.commands(), ["0x14", "0x14"])
+        self.assertEqual(state["node-a"]["fan_speed"], 20)
+
+    def test_mode_change_forces_the_next_speed_write(self):
+        self.controller.set_fan_control("manual", self.host)
+        self.controller.set_fan_speed(20, self.host)
+        self.controller.set_fan_control("automatic", self.host)
+        self.controller.set_fan_control("manual", self.host)
+        self.controller.set_fan_speed(20, self.host)
+
+        self.assertEqual(self.commands(), ["0x00", "0x14", "0x01", "0x00", "0x14"])
+
+
+if __name__ == "__main__":
+    unittest.main()
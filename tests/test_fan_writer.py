@@ -0,0 +1,155 @@
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from fan_controller import FanController
+from fan_writer import FanWriter
+from state import init_state_from_config, state
+
+
+def host():
+    return {
+        "name": "node-a",
+        "fan_control_mode": "manual",
+        "temperatures": [40, 80],
+        "speeds": [20, 80],
+        "hysteresis": 0,
+    }
+
+
+class BlockingWrite:
+    """Record written levels; the first write blocks until released."""
+
+    def __init__(self, result=True):
+        self.result = result
+        self.levels = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, level, host):
+        self.levels.append(level)
+        self.started.set()
+        self.release.wait(5)
+        return self.result
+
+
+class FanWriterTests(unittest.TestCase):
+    def setUp(self):
+        self.host = host()
+        init_state_from_config([self.host])
+
+    def writer(self, write):
+        writer = FanWriter(write)
+        self.addCleanup(writer.close, 5)
+        return writer
+
+    def test_only_the_newest_pending_level_is_written(self):
+        write = BlockingWrite()
+        writer = self.writer(write)
+
+        writer.post(self.host, 20)
+        self.assertTrue(write.started.wait(5))
+        for level in (30, 40, 50):
+            writer.post(self.host, level)
+        self.assertEqual(writer.stats()["node-a"]["queue_depth"], 1)
+        write.release.set()
+
+        self.assertTrue(writer.wait_idle(5))
+        self.assertEqual(write.levels, [20, 50])
+        stats = writer.stats()["node-a"]
+        self.assertEqual(stats["posted"], 4)
+        self.assertEqual(stats["dropped"], 2)
+        self.assertEqual(stats["written"], 2)
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertIsNotNone(stats["max_latency_seconds"])
+        self.assertEqual(state["node-a"]["fan_writer"]["written"], 2)
+
+    def test_fail_safe_level_replaces_pending_level_and_is_written_first(self):
+        write = BlockingWrite()
+        writer = self.writer(write)
+
+        writer.post(self.host, 20)
+        self.assertTrue(write.started.wait(5))
+        writer.post(self.host, 30)
+        writer.post(self.host, 100, fail_safe=True)
+        writer.post(self.host, 40)
+        write.release.set()
+
+        self.assertTrue(writer.wait_idle(5))
+        self.assertEqual(write.levels, [20, 100, 40])
+        self.assertEqual(writer.stats()["node-a"]["dropped"], 1)
+        self.assertEqual(writer.stats()["node-a"]["fail_safe"], 1)
+
+    def test_failed_write_is_reflected_in_state(self):
+        write = BlockingWrite(result=False)
+        write.release.set()
+        writer = self.writer(write)
+
+        writer.post(self.host, 20)
+
+        self.assertTrue(writer.wait_idle(5))
+        self.assertEqual(state["node-a"]["fan_write_error"], "Failed to set fan speed to 20%")
+        self.assertEqual(state["node-a"]["fan_writer"]["failed"], 1)
+
+        write.result = True
+        writer.post(self.host, 30)
+
+        self.assertTrue(writer.wait_idle(5))
+        self.assertIsNone(state["node-a"]["fan_write_error"])
+
+    def test_close_discards_pending_levels(self):
+        write = BlockingWrite()
+        writer = FanWriter(write)
+
+        writer.post(self.host, 20)
+        self.assertTrue(write.started.wait(5))
+        writer.post(self.host, 30)
+        thread = writer._writers["node-a"]._thread
+        writer.close(timeout=0)
+        write.release.set()
+        thread.join(5)
+
+        self.assertEqual(write.levels, [20])
+        self.assertEqual(writer.stats(), {})
+
+
+class AsyncFanControllerTests(unittest.TestCase):
+    def setUp(self):
+        self.host = host()
+        init_state_from_config([self.host])
+        self.controller = FanController(
+            SimpleNamespace(general={"debug": False, "async_fan_writes": True})
+        )
+        self.addCleanup(self.controller.writer.close, 5)
+        patcher = patch("fan_controller.run_command", return_value=("", ""))
+        self.run_command = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_apply_fan_speed_writes_in_the_background(self):
+        self.controller.apply_fan_speed(60, self.host)
+
+        self.assertTrue(self.controller.writer.wait_idle(5))
+        self.assertEqual(self.run_command.call_args.args[1].argv[-1], "0x14")
+        self.assertEqual(state["node-a"]["fan_speed"], 20)
+
+    def test_apply_fan_speed_returns_the_posted_level_before_it_is_written(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        self.run_command.side_effect = lambda *args, **kwargs: (release.wait(5), ("", ""))[1]
+
+        self.assertEqual(self.controller.apply_fan_speed(60, self.host), 20)
+        self.assertEqual(state["node-a"]["fan_speed"], 0)
+        release.set()
+        self.assertTrue(self.controller.writer.wait_idle(5))
+
+    def test_sentinel_temperature_is_posted_as_fail_safe(self):
+        self.controller.apply_fan_speed(999, self.host)
+
+        self.assertTrue(self.controller.writer.wait_idle(5))
+        self.assertEqual(self.controller.writer.stats()["node-a"]["fail_safe"], 1)
+        self.assertEqual(state["node-a"]["fan_speed"], 80)
+
+
+if __name__ == "__main__":
+    unittest.main()
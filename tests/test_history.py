@@ -0,0 +1,106 @@
+import unittest
+
+from history import VM_COLUMNS, History, RollupRing, SampleRing
+
+
+class SampleRingTests(unittest.TestCase):
+    def test_values_are_returned_oldest_first_after_wrapping(self):
+        ring = SampleRing(capacity=3)
+        for second in range(5):
+            ring.append(monotonic=second, temp_max=40 + second)
+
+        self.assertEqual(len(ring), 3)
+        self.assertEqual(ring.values("monotonic"), [2.0, 3.0, 4.0])
+        self.assertEqual(ring.values("temp_max", last=2), [43.0, 44.0])
+        self.assertEqual([len(segment) for segment in ring.view("temp_max")], [1, 2])
+        self.assertEqual(ring.latest()["temp_max"], 44.0)
+
+    def test_missing_values_read_back_as_none(self):
+        ring = SampleRing(capacity=2, columns=VM_COLUMNS)
+        ring.append(monotonic=1, temp_avg=None)
+
+        self.assertEqual(ring.values("temp_avg"), [None])
+        self.assertIsNone(ring.latest()["temp_max"])
+
+    def test_memory_is_allocated_once(self):
+        ring = SampleRing(capacity=100)
+        before = ring.memory_bytes()
+        for second in range(250):
+            ring.append(monotonic=second)
+
+        self.assertEqual(before, 100 * 8 * 6)
+        self.assertEqual(ring.stats(), {"samples": 100, "capacity": 100, "memory_bytes": before})
+        self.assertEqual(SampleRing(capacity=2).values("monotonic"), [])
+
+
+
+class RollupRingTests(unittest.TestCase):
+    def test_samples_are_folded_into_aligned_buckets(self):
+        tier = RollupRing(60, 180, ["temp_max"])
+        for timestamp, temp in ((600, 40), (630, 50), (659, None), (660, 45)):
+            tier.add(timestamp, {"temp_max": temp})
+
+        self.assertEqual(
+            tier.buckets("temp_max"),
+            {"timestamp": [600, 660], "min": [40, 45], "avg": [45, 45], "max": [50, 45]},
+        )
+
+    def test_capacity_is_fixed_and_the_oldest_bucket_is_overwritten(self):
+        tier = RollupRing(60, 120, ["temp_max"])
+        memory = tier.memory_bytes()
+        for minute in range(5):
+            tier.add(minute * 60, {"temp_max": minute})
+
+        self.assertEqual(tier.buckets("temp_max")["timestamp"], [180, 240])
+        self.assertEqual(tier.oldest(), 180)
+        self.assertEqual(tier.memory_bytes(), memory)
+
+
+class HistoryTests(unittest.TestCase):
+    def setUp(self):
+        self.history = History(capacity=10, rollups=((60, 3600), (900, 86400)))
+        # One sample every 30 seconds for two hours.
+        for index in range(240):
+            self.history.append(timestamp=index * 30, monotonic=index * 30, control_temperature=index)
+
+    def test_every_append_updates_all_tiers(self):
+        self.assertEqual(len(self.history.raw), 10)
+        self.assertEqual([len(tier) for tier in self.history.tiers], [60, 8])
+        stats = self.history.stats()
+        self.assertEqual([tier["buckets"] for tier in stats["rollups"]], [60, 8])
+        self.assertGreater(stats["memory_bytes"], self.history.raw.memory_bytes())
+
+    def test_query_uses_the_coarsest_tier_that_covers_range_and_resolution(self):
+        recent = self.history.query("control_temperature", start=7000, end=7200)
+        self.assertEqual(recent["resolution"], 0.0)
+        self.assertEqual(recent["max"], [234, 235, 236, 237, 238, 239])
+
+        hour = self.history.query("control_temperature", start=3600, end=7200, resolution=120)
+        self.assertEqual(hour["resolution"], 60)
+        self.assertEqual(hour["timestamp"][0], 3600)
+        self.assertEqual((hour["min"][0], hour["avg"][0], hour["max"][0]), (120, 120.5, 121))
+
+        day = self.history.query("control_temperature", start=0, end=7200, resolution=900)
+        self.assertEqual(day["resolution"], 900)
+        self.assertEqual(len(day["timestamp"]), 8)
+
+    def test_range_older_than_a_fine_tier_falls_back_to_a_coarser_one(self):
+        # The 1-minute tier only reaches back one hour.
+        result = self.history.query("control_temperature", start=0, end=7200, resolution=60)
+
+        self.assertEqual(result["resolution"], 900)
+
+
+    def test_query_reads_a_copy_taken_under_the_append_lock(self):
+        tier = self.history.tiers[0]
+        copy = tier.copy(("control_temperature",))
+        self.history.append(timestamp=240 * 30, monotonic=240 * 30, control_temperature=999)
+
+        self.assertEqual(copy.buckets("control_temperature")["max"][-1], 239)
+        self.assertEqual(tier.buckets("control_temperature")["max"][-1], 999)
+        self.assertEqual(self.history.raw.copy(("timestamp",)).columns, ("timestamp",))
+        self.assertFalse(self.history._lock.locked())
+
+
+if __name__ == "__main__":
+    unittest.main()
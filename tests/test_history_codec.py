@@ -0,0 +1,77 @@
+import json
+import struct
+import unittest
+
+from history_codec import HEADER, decode_binary, encode_binary, encode_json, wants_binary
+
+
+def response(points):
+    return {
+        "host": "h1",
+        "vm": None,
+        "source": "control_temperature",
+        "from": 1000.0,
+        "to": 2000.0,
+        "method": "minmax",
+        "resolution": 60,
+        "points": points,
+        "timestamp": [1_700_000_000.125 + index for index in range(points)],
+        "min": [40.5 + index for index in range(points)],
+        "avg": [41.25 + index for index in range(points)],
+        "max": [42.0 + index for index in range(points)],
+    }
+
+
+class BinaryHistoryTests(unittest.TestCase):
+    def test_round_trip_keeps_metadata_and_column_values(self):
+        original = response(3)
+
+        decoded = decode_binary(encode_binary(original))
+
+        self.assertEqual(decoded, original)
+
+    def test_column_blocks_are_eight_byte_aligned_little_endian(self):
+        payload = encode_binary(response(3))
+        magic, version, columns, points, metadata_length = HEADER.unpack_from(payload)
+
+        self.assertEqual((magic, version, columns, points), (b"FCHB", 1, 4, 3))
+        self.assertEqual(metadata_length % 8, 0)
+        offset = HEADER.size + metadata_length
+        self.assertEqual(struct.unpack_from("<3d", payload, offset), (1_700_000_000.125, 1_700_000_001.125, 1_700_000_002.125))
+        self.assertEqual(struct.unpack_from("<3f", payload, offset + 24), (40.5, 41.5, 42.5))
+        # Three float32 values are padded from 12 to 16 bytes.
+        self.assertEqual(len(payload), offset + 24 + 3 * 16)
+        self.assertEqual(json.loads(payload[HEADER.size:offset])["columns"][1], ["min", "float32"])
+
+    def test_empty_series_encodes_header_and_metadata_only(self):
+        decoded = decode_binary(encode_binary(response(0)))
+
+        self.assertEqual(decoded["timestamp"], [])
+        self.assertEqual(decoded["points"], 0)
+
+    def test_json_is_rounded_for_display(self):
+        series = response(1)
+        series["avg"] = [41.256]
+
+        self.assertEqual(json.loads(encode_json(series))["avg"], [41.26])
+
+
+class AcceptNegotiationTests(unittest.TestCase):
+    def test_binary_only_when_ranked_at_least_as_high_as_json(self):
+        cases = {
+            None: False,
+            "": False,
+            "*/*": False,
+            "application/json": False,
+            "application/octet-stream": True,
+            "application/json;q=0.5, application/octet-stream": True,
+            "application/octet-stream;q=0.4, application/json": False,
+            "application/octet-stream;q=0": False,
+        }
+        for accept, expected in cases.items():
+            with self.subTest(accept=accept):
+                self.assertIs(wants_binary(accept), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
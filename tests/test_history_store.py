@@ -0,0 +1,162 @@
+import os
+import stat
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from history import History
+from history_store import HEADER_SIZE, HOST_STORE_COLUMNS, VM_STORE_COLUMNS, HistoryFile, HistoryStore
+from main import init_runtime_state
+from state import state
+
+
+def sample(second):
+    return {"timestamp": 1000.0 + second, "temp_max": 40.0 + second, "control_temperature": None}
+
+
+class HistoryFileTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "node-a.hist")
+
+    def open(self, capacity=4, columns=HOST_STORE_COLUMNS):
+        history_file = HistoryFile(self.path, columns, capacity=capacity)
+        self.addCleanup(history_file.close)
+        return history_file
+
+    def test_records_survive_reopening_after_the_file_wraps(self):
+        history_file = self.open()
+        for second in range(6):
+            history_file.append(sample(second))
+        history_file.close()
+
+        records = self.open().records()
+
+        self.assertEqual([record["temp_max"] for record in records], [42.0, 43.0, 44.0, 45.0])
+        self.assertIsNone(records[0]["control_temperature"])
+        self.assertEqual(os.path.getsize(self.path), HEADER_SIZE + 4 * history_file.record.size)
+
+    def test_new_file_is_renamed_durably(self):
+        synced = []
+        fsync = os.fsync
+
+        def record_fsync(descriptor):
+            synced.append(stat.S_ISDIR(os.fstat(descriptor).st_mode))
+            fsync(descriptor)
+
+        with mock.patch("history_store.os.fsync", side_effect=record_fsync):
+            self.open()
+
+        # The file contents first, then the directory holding the rename.
+        self.assertEqual(synced, [False, True])
+
+    def test_records_are_filtered_by_time(self):
+        history_file = self.open()
+        for second in range(4):
+            history_file.append(sample(second))
+
+        records = history_file.records(start=1001, end=1002)
+
+        self.assertEqual([record["timestamp"] for record in records], [1001.0, 1002.0])
+
+    def test_torn_record_is_skipped(self):
+        history_file = self.open()
+        for second in range(3):
+            history_file.append(sample(second))
+        history_file.close()
+        with open(self.path, "r+b") as handle:
+            handle.seek(HEADER_SIZE + history_file.record.size + 10)
+            handle.write(b"\xff\xff")
+
+        reopened = self.open()
+
+        self.assertEqual([record["temp_max"] for record in reopened.records()], [40.0, 42.0])
+        self.assertEqual(reopened.skipped, 1)
+        reopened.records()
+        self.assertEqual(reopened.skipped, 1)
+
+    def test_corrupt_header_is_recovered_from_record_sequence_numbers(self):
+        history_file = self.open()
+        for second in range(6):
+            history_file.append(sample(second))
+        history_file.close()
+        with open(self.path, "r+b") as handle:
+            handle.seek(20)
+            handle.write(b"\x00" * 8)
+
+        reopened = self.open()
+
+        self.assertEqual(reopened.written, 6)
+        reopened.append(sample(6))
+        self.assertEqual([record["temp_max"] for record in reopened.records()], [43.0, 44.0, 45.0, 46.0])
+
+    def test_capacity_change_compacts_to_the_newest_records(self):
+        history_file = self.open(capacity=4)
+        for second in range(4):
+            history_file.append(sample(second))
+        history_file.close()
+
+        smaller = self.open(capacity=2)
+
+        self.assertEqual([record["temp_max"] for record in smaller.records()], [42.0, 43.0])
+        self.assertEqual(smaller.stats()["file_bytes"], os.path.getsize(self.path))
+
+    def test_file_with_other_columns_is_replaced(self):
+        history_file = self.open()
+        history_file.append(sample(0))
+        history_file.close()
+
+        self.assertEqual(self.open(columns=VM_STORE_COLUMNS).records(), [])
+
+
+class HistoryStoreTests(unittest.TestCase):
+    def test_history_is_replayed_from_the_store_and_keeps_writing_to_it(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = HistoryStore({"path": directory, "capacity": 100, "flush_interval": 60})
+            first = History(capacity=10, rollups=((60, 3600),))
+            first.attach(store.source("node-a/vm 1", HOST_STORE_COLUMNS))
+            for second in range(0, 120, 30):
+                first.append(monotonic=second, **sample(second))
+            store.close()
+
+            store = HistoryStore({"path": directory, "capacity": 100, "flush_interval": 60})
+            second = History(capacity=10, rollups=((60, 3600),))
+            second.attach(store.source("node-a/vm 1", HOST_STORE_COLUMNS), since=1030)
+            second.append(monotonic=120, **sample(120))
+            stats = store.stats()
+            store.close()
+
+            self.assertEqual(os.listdir(directory), ["node-a%2Fvm%201.hist"])
+        # Replayed records reach the tiers only; the raw ring starts with this process's samples.
+        self.assertEqual(second.raw.values("temp_max"), [160.0])
+        self.assertEqual(second.tiers[0].buckets("temp_max")["max"], [100.0, 160.0])
+        self.assertEqual(stats["node-a/vm 1"]["records"], 5)
+
+    def test_uncreatable_directory_leaves_the_store_disabled(self):
+        with tempfile.NamedTemporaryFile() as blocker:
+            store = HistoryStore()
+
+            with self.assertRaises(OSError):
+                store.configure({"path": os.path.join(blocker.name, "history")})
+
+        self.assertFalse(store.enabled)
+
+    def test_runtime_state_falls_back_to_memory_history_when_the_store_fails(self):
+        with tempfile.NamedTemporaryFile() as blocker:
+            store = HistoryStore()
+            config = SimpleNamespace(
+                hosts=[{"name": "node-a", "vms": []}],
+                general={"history_store": {"path": os.path.join(blocker.name, "history")}},
+            )
+            with mock.patch("main.history_store", store), mock.patch("main.log") as log:
+                init_runtime_state(config)
+
+        self.assertFalse(store.enabled)
+        self.assertIsNone(state["node-a"]["history"].sink)
+        self.assertIn("memory only", log.call_args.args[2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import dataclasses
+import tempfile
+import unittest
+from pathlib import Path
+
+import yaml
+
+from config_loader import Config
+from host_plan import plan_for
+
+
+def load_config(document):
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "fan_control_config.yaml"
+        path.write_text(yaml.safe_dump(document), encoding="utf-8")
+        return Config(str(path))
+
+
+def host():
+    return {
+        "name": "node-a",
+        "fan_control_mode": "manual",
+        "temperatures": [40, 80],
+        "speeds": [20, 100],
+        "hysteresis": 5,
+        "gpu_type": "nvidia",
+        "ipmi_credentials": {"host": " 10.0.0.5 ", "username": "root", "password": "secret"},
+        "vms": [
+            {
+                "name": "vm1",
+                "gpu_type": ["nvidia", "amd"],
+                "streaming": True,
+                "ssh_credentials": {"host": "vm1.lan", "username": "monitor", "password": "secret"},
+            }
+        ],
+    }
+
+
+class HostPlanTests(unittest.TestCase):
+    def setUp(self):
+        self.config = load_config({"hosts": [host()]})
+        self.plan = self.config.plans["node-a"]
+
+    def test_plans_are_compiled_at_load(self):
+        general = self.config.general
+        self.assertEqual(self.plan.display_ip, " 10.0.0.5 ")
+        self.assertEqual(self.plan.ipmi_target, "10.0.0.5")
+        self.assertEqual(self.plan.temperatures, tuple(self.config.hosts[0]["temperatures"]))
+        self.assertEqual(self.plan.gpu.gpu_commands, (("nvidia", general["gpu_temperature_command_nvidia"]),))
+        self.assertTrue(self.plan.gpu.polled)
+        self.assertEqual([vendor for vendor, _ in self.plan.vms["vm1"].gpu_commands], ["nvidia", "amd"])
+        self.assertFalse(self.plan.vms["vm1"].polled)
+        self.assertEqual(self.plan.control_commands["manual"].argv[-1], "0x00")
+        self.assertEqual(self.plan.speed_command(100).argv[-1], "0x64")
+        self.assertIs(self.plan.speed_command(100), self.plan.speed_command(100.0))
+        self.assertEqual(self.plan.speed_command(37).argv[-1], "0x25")
+
+    def test_plans_are_immutable(self):
+        self.assertFalse(hasattr(self.plan, "__dict__"))
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            self.plan.display_ip = "10.0.0.6"
+        with self.assertRaises(TypeError):
+            self.plan.vms["vm2"] = self.plan.gpu
+
+    def test_plan_for_only_reuses_the_plan_of_the_same_host_dict(self):
+        self.assertIs(plan_for(self.config, self.config.hosts[0]), self.plan)
+
+        changed = dict(self.config.hosts[0], ssh_credentials={"host": "node-a.lan"})
+        del changed["ipmi_credentials"]
+        self.assertEqual(plan_for(self.config, changed).display_ip, "node-a.lan")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from hwmon import HwmonCpuReader
+from state import init_state_from_config
+from temp_monitor import TempMonitor
+
+
+def write_chip(root, entry, name, sensors):
+    chip = root / entry
+    chip.mkdir()
+    (chip / "name").write_text(f"{name}\n", encoding="utf-8")
+    for index, (label, millidegrees) in sensors.items():
+        if label is not None:
+            (chip / f"temp{index}_label").write_text(f"{label}\n", encoding="utf-8")
+        (chip / f"temp{index}_input").write_text(f"{millidegrees}\n", encoding="utf-8")
+    return chip
+
+
+class HwmonCpuReaderTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+
+    def test_reads_intel_core_sensors_and_ignores_other_chips(self):
+        write_chip(self.root, "hwmon0", "nvme", {1: ("Composite", 30000)})
+        write_chip(
+            self.root,
+            "hwmon1",
+            "coretemp",
+            {1: ("Package id 0", 50000), 2: ("Core 0", 41000), 10: ("Core 8", 47500), 3: ("Core 1", 43000)},
+        )
+        reader = HwmonCpuReader(str(self.root))
+        self.addCleanup(reader.close)
+
+        self.assertEqual(reader.read(), [41.0, 43.0, 47.5])
+
+    def test_kept_open_sensor_files_reflect_new_values(self):
+        chip = write_chip(self.root, "hwmon0", "k10temp", {1: ("Tctl", 61000), 3: ("Tccd1", 55250)})
+        reader = HwmonCpuReader(str(self.root))
+        self.addCleanup(reader.close)
+
+        self.assertEqual(reader.read(), [55.25])
+        (chip / "temp3_input").write_text("57000\n", encoding="utf-8")
+
+        self.assertEqual(reader.read(), [57.0])
+
+    def test_renumbered_devices_are_rediscovered(self):
+        write_chip(self.root, "hwmon0", "coretemp", {2: ("Core 0", 40000)})
+        reader = HwmonCpuReader(str(self.root))
+        self.addCleanup(reader.close)
+        reader.read()
+        reader.close()
+
+        (self.root / "hwmon0").rename(self.root / "hwmon3")
+
+        self.assertEqual(reader.read(), [40.0])
+        self.assertEqual(reader.paths, [str(self.root / "hwmon3" / "temp2_input")])
+
+    def test_local_hosts_use_hwmon_when_configured(self):
+        write_chip(self.root, "hwmon0", "coretemp", {2: ("Core 0", 44000)})
+        host = {"name": "local"}
+        init_state_from_config([host])
+        config = SimpleNamespace(
+            general={"debug": False, "cpu_temperature_source": "hwmon", "cpu_temperature_command": "false"}
+        )
+        monitor = TempMonitor(config, hwmon_root=str(self.root))
+        self.addCleanup(monitor.close)
+
+        self.assertEqual(monitor.get_cpu_temps(host), [44.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+from types import SimpleNamespace
+
+from fake_bmc import FakeBmc
+from fan_controller import FanController
+from ipmi_lan import LanplusPool, decrypt_payload, encrypt_payload, parse_raw_args, rakp4_integrity_value
+from state import init_state_from_config
+from utils import CommandTimeouts
+
+SPEED_20 = ["raw", "0x30", "0x30", "0x02", "0xff", "0x14"]
+
+
+def host(password="calvin"):
+    return {
+        "name": "node-a",
+        "fan_control_mode": "manual",
+        "temperatures": [40, 80],
+        "speeds": [20, 80],
+        "hysteresis": 0,
+        "ipmi_credentials": {"host": "127.0.0.1", "username": "root", "password": password},
+    }
+
+
+class LanplusTests(unittest.TestCase):
+    def setUp(self):
+        self.bmc = FakeBmc({"root": "calvin"}).start()
+        self.addCleanup(self.bmc.stop)
+        self.pool = LanplusPool(port=self.bmc.port, keepalive_interval=0, retry_interval=0.2)
+        self.addCleanup(self.pool.close_all)
+        self.timeouts = CommandTimeouts(total=5)
+
+    def test_writes_reuse_one_authenticated_session(self):
+        for _ in range(3):
+            self.assertEqual(self.pool.execute(host(), SPEED_20, self.timeouts), ("", ""))
+
+        self.assertEqual(self.bmc.writes, [b"\x02\xff\x14"] * 3)
+        self.assertEqual(self.bmc.authentications, 1)
+        self.assertEqual(self.pool.stats()["active"], 1)
+
+    def test_wrong_password_is_reported_without_writing(self):
+        output, error = self.pool.execute(host("wrong"), SPEED_20, self.timeouts)
+
+        self.assertIsNone(output)
+        self.assertIn("password", error)
+        self.assertEqual(self.bmc.writes, [])
+
+    def test_expired_session_is_reauthenticated(self):
+        self.pool.execute(host(), SPEED_20, self.timeouts)
+        self.bmc.expire_sessions()
+
+        self.assertEqual(self.pool.execute(host(), SPEED_20, self.timeouts), ("", ""))
+        self.assertEqual(self.bmc.authentications, 2)
+        self.assertEqual(len(self.bmc.writes), 2)
+
+    def test_lost_request_is_retransmitted(self):
+        self.pool.execute(host(), SPEED_20, self.timeouts)
+        self.bmc.drop_requests = 1
+
+        self.assertEqual(self.pool.execute(host(), SPEED_20, self.timeouts), ("", ""))
+        self.assertEqual(self.bmc.authentications, 1)
+
+    def test_unsupported_command_reports_the_completion_code(self):
+        output, error = self.pool.execute(host(), ["raw", "0x30", "0x99"], self.timeouts)
+
+        self.assertIsNone(output)
+        self.assertIn("0xc1", error)
+
+    def test_fan_controller_uses_the_lanplus_transport(self):
+        init_state_from_config([host()])
+        controller = FanController(
+            SimpleNamespace(general={"debug": False, "ipmi_transport": "lanplus"}),
+            ipmi_lan=self.pool,
+        )
+
+        self.assertTrue(controller.set_fan_control("manual", host()))
+        controller.set_fan_speed(20, host())
+
+        self.assertEqual(self.bmc.writes, [b"\x01\x00", b"\x02\xff\x14"])
+
+
+class LanplusEncodingTests(unittest.TestCase):
+    def test_confidentiality_pad_round_trips(self):
+        key = bytes(range(20))
+        for size in range(0, 40):
+            payload = bytes(range(size))
+            encrypted = encrypt_payload(key, payload)
+            self.assertEqual(len(encrypted) % 16, 0)
+            self.assertEqual(decrypt_payload(key, encrypted), payload)
+
+    def test_rakp4_integrity_value_covers_the_console_session_id(self):
+        sik = bytes(range(20))
+        console_random = bytes(range(16))
+        console_sid = bytes.fromhex("78563412")
+        guid = bytes(range(0x40, 0x50))
+
+        self.assertEqual(
+            rakp4_integrity_value(sik, console_random, console_sid, guid).hex(),
+            "a8ba5f9f32da4c0bf5e154ad",
+        )
+
+    def test_parse_raw_args(self):
+        self.assertEqual(parse_raw_args(SPEED_20), (0x30, 0x30, b"\x02\xff\x14"))
+        with self.assertRaises(ValueError):
+            parse_raw_args(["sensor", "list"])
+
+
+if __name__ == "__main__":
+    unittest.main()
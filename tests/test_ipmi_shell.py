@@ -0,0 +1,140 @@
+import os
+import stat
+import sys
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from fan_controller import FanController
+from ipmi_shell import IpmiShellPool, parse_raw_response, shell_argv
+from state import init_state_from_config
+from utils import CommandTimeout, CommandTimeouts
+
+FAKE_IPMITOOL = textwrap.dedent(
+    """\
+    #!{python}
+    import os
+    import sys
+    import time
+
+    log = open(os.environ["FAKE_IPMITOOL_LOG"], "a")
+    log.write("start " + " ".join(sys.argv[1:]) + " password=" + os.environ.get("IPMI_PASSWORD", "") + "\\n")
+    log.flush()
+    if sys.argv[-1] != "shell":
+        sys.exit(1)
+    while True:
+        sys.stdout.write("ipmitool> ")
+        sys.stdout.flush()
+        line = sys.stdin.readline()
+        if not line:
+            break
+        line = line.strip()
+        sys.stdout.write(line + "\\n")
+        log.write(line + "\\n")
+        log.flush()
+        if line == "raw 0x30 0x30 0x02 0xff 0x63":
+            sys.stderr.write("Unable to send RAW command (rsp=0xc1): Invalid command\\n")
+            sys.stderr.flush()
+        elif line == "raw 0x30 0x30 0x02 0xff 0x62":
+            time.sleep(30)
+        elif line == "raw 0x06 0x01":
+            sys.stdout.write(" 20 81 06 10\\n")
+    """
+)
+
+
+def host():
+    return {
+        "name": "node-a",
+        "fan_control_mode": "manual",
+        "temperatures": [40, 80],
+        "speeds": [20, 80],
+        "hysteresis": 0,
+        "ipmi_credentials": {"host": "192.0.2.10", "username": "admin", "password": "secret"},
+    }
+
+
+class IpmiShellTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log = Path(directory.name) / "ipmitool.log"
+        self.log.touch()
+        executable = Path(directory.name) / "ipmitool"
+        executable.write_text(FAKE_IPMITOOL.format(python=sys.executable), encoding="utf-8")
+        executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+        os.environ["FAKE_IPMITOOL_LOG"] = str(self.log)
+        self.addCleanup(os.environ.pop, "FAKE_IPMITOOL_LOG", None)
+        self.pool = IpmiShellPool(executable=str(executable))
+        self.addCleanup(self.pool.close_all)
+        self.timeouts = CommandTimeouts(total=5)
+
+    def log_lines(self):
+        return self.log.read_text(encoding="utf-8").splitlines()
+
+    def test_password_is_passed_through_the_environment(self):
+        argv, env = shell_argv(host())
+
+        self.assertNotIn("secret", argv)
+        self.assertEqual(argv[-2:], ["-E", "shell"])
+        self.assertEqual(env, {"IPMI_PASSWORD": "secret"})
+
+    def test_commands_share_one_coprocess(self):
+        for _ in range(3):
+            self.assertEqual(
+                self.pool.execute(host(), ["raw", "0x30", "0x30", "0x02", "0xff", "0x14"], self.timeouts),
+                ("", ""),
+            )
+        self.assertEqual(self.pool.execute(host(), ["raw", "0x06", "0x01"], self.timeouts), ("20 81 06 10", ""))
+
+        starts = [line for line in self.log_lines() if line.startswith("start ")]
+        self.assertEqual(len(starts), 1)
+        self.assertIn("password=secret", starts[0])
+        self.assertEqual(self.pool.stats()["starts"], 1)
+
+    def test_error_response_restarts_the_coprocess(self):
+        output, error = self.pool.execute(host(), ["raw", "0x30", "0x30", "0x02", "0xff", "0x63"], self.timeouts)
+        self.assertIsNone(output)
+        self.assertIn("Invalid command", error)
+
+        self.pool.execute(host(), ["raw", "0x30", "0x30", "0x02", "0xff", "0x14"], self.timeouts)
+
+        self.assertEqual(self.pool.stats()["starts"], 2)
+
+    def test_hung_command_times_out_and_restarts(self):
+        output, error = self.pool.execute(
+            host(), ["raw", "0x30", "0x30", "0x02", "0xff", "0x62"], CommandTimeouts(total=0.5)
+        )
+
+        self.assertIsNone(output)
+        self.assertIsInstance(error, CommandTimeout)
+        self.assertEqual(
+            self.pool.execute(host(), ["raw", "0x30", "0x30", "0x02", "0xff", "0x14"], self.timeouts),
+            ("", ""),
+        )
+        self.assertEqual(self.pool.stats()["starts"], 2)
+
+    def test_fan_controller_uses_the_shell_transport(self):
+        init_state_from_config([host()])
+        controller = FanController(
+            SimpleNamespace(general={"debug": False, "ipmi_transport": "shell"}),
+            ipmi_shells=self.pool,
+        )
+
+        self.assertTrue(controller.set_fan_control("manual", host()))
+        controller.set_fan_speed(20, host())
+
+        self.assertEqual(
+            self.log_lines()[1:],
+            ["raw 0x30 0x30 0x01 0x00", "raw 0x30 0x30 0x02 0xff 0x14"],
+        )
+
+    def test_parse_raw_response(self):
+        self.assertEqual(parse_raw_response(" 00 1a\n"), ("00 1a", ""))
+        self.assertEqual(parse_raw_response("Error: session closed"), (None, "Error: session closed"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import threading
+import time
+import unittest
+
+from limits import LimitTimeout, RemoteLimiter, TokenBucket, default_limiter
+from utils import CommandTimeout, CommandTimeouts, run_command
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketTests(unittest.TestCase):
+    def test_reservations_beyond_the_burst_wait_for_the_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, burst=2, clock=clock)
+
+        self.assertEqual([bucket.reserve() for _ in range(4)], [0.0, 0.0, 0.5, 1.0])
+        clock.now = 10
+        self.assertEqual(bucket.reserve(), 0.0)
+
+    def test_reservation_that_would_exceed_max_wait_takes_no_token(self):
+        bucket = TokenBucket(rate=1, burst=1, clock=FakeClock())
+        bucket.reserve()
+
+        self.assertIsNone(bucket.reserve(max_wait=0.5))
+        self.assertEqual(bucket.reserve(), 1.0)
+
+
+class RemoteLimiterTests(unittest.TestCase):
+    def test_per_host_limit_is_independent_per_target(self):
+        limiter = RemoteLimiter({"ssh_exec": {"per_host": 1}})
+        limiter.acquire("ssh_exec", "bastion")
+
+        release = limiter.acquire("ssh_exec", "other", timeout=0.1)
+        with self.assertRaises(LimitTimeout):
+            limiter.acquire("ssh_exec", "bastion", timeout=0.1)
+
+        release()
+        stats = limiter.stats()["ssh_exec"]
+        self.assertEqual(stats["acquired"], 2)
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertEqual(stats["in_use"], 1)
+
+    def test_global_limit_waits_for_a_release_and_records_the_wait(self):
+        limiter = RemoteLimiter({"ipmi_session": {"global": 1}})
+        release = limiter.acquire("ipmi_session", "idrac-a")
+        threading.Timer(0.2, release).start()
+
+        with limiter.slot("ipmi_session", "idrac-b", timeout=5):
+            pass
+
+        stats = limiter.stats()["ipmi_session"]
+        self.assertEqual(stats["waited"], 1)
+        self.assertGreaterEqual(stats["max_wait_seconds"], 0.15)
+        self.assertEqual(stats["in_use"], 0)
+
+    def test_unconfigured_kinds_are_unlimited_but_counted(self):
+        limiter = RemoteLimiter()
+        releases = [limiter.acquire("ssh_connect", "bastion") for _ in range(50)]
+
+        self.assertEqual(limiter.stats()["ssh_connect"]["in_use"], 50)
+        for release in releases:
+            release()
+
+    def test_reconfigure_keeps_slots_held_under_the_old_budget(self):
+        limiter = RemoteLimiter({"ssh_exec": {"global": 1}})
+        release = limiter.acquire("ssh_exec", "bastion")
+        limiter.configure({"ssh_exec": {"global": 2}})
+
+        limiter.acquire("ssh_exec", "bastion", timeout=0.1)()
+        release()
+
+
+class RunCommandLimitTests(unittest.TestCase):
+    def setUp(self):
+        default_limiter.configure({"ipmi_session": {"per_host": 1}})
+        self.addCleanup(default_limiter.configure, {})
+
+    def test_ipmi_commands_to_one_bmc_are_serialized(self):
+        host = {"name": "node-a", "ipmi_credentials": {"host": "10.0.0.10"}}
+        results = []
+
+        def write():
+            results.append(run_command(host, "sleep 0.3", logger=None, command_class="ipmi_write"))
+
+        threads = [threading.Thread(target=write) for _ in range(2)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.55)
+        self.assertEqual(results, [("", ""), ("", "")])
+
+    def test_waiting_for_a_slot_counts_against_the_command_deadline(self):
+        host = {"name": "node-a", "ipmi_credentials": {"host": "10.0.0.10"}}
+        release = default_limiter.acquire("ipmi_session", "10.0.0.10")
+        self.addCleanup(release)
+
+        output, error = run_command(
+            host,
+            "true",
+            logger=None,
+            timeouts=CommandTimeouts(total=0.2),
+            command_class="ipmi_write",
+        )
+
+        self.assertIsNone(output)
+        self.assertIsInstance(error, CommandTimeout)
+
+
+if __name__ == "__main__":
+    unittest.main()
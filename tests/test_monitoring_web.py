@@ -1,17 +1,24 @@
+import gzip
 import json
 import unittest
+from datetime import datetime, timedelta, timezone
 from types import SimpleNamespace
 from urllib.error import HTTPError
 from urllib.request import Request, urlopen
 
+from history import VM_COLUMNS, History
+from history_codec import decode_binary
 from monitoring_web import (
+    HistoryRequestError,
     MonitoringServer,
+    StatusCache,
     WebSettings,
     build_dashboard_html,
+    build_history_response,
     build_status_snapshot,
 )
 from main import configure_hosts
-from state import init_state_from_config, state
+from state import StateVersion, init_state_from_config, state, state_version
 
 
 class RecordingController:
@@ -133,6 +140,25 @@ class MonitoringWebTests(unittest.TestCase):
         self.assertIn("SSH authentication failed", encoded)
         self.assertNotIn("must-not-leak", encoded)
 
+    def test_status_snapshot_exposes_vm_circuit_breaker_state(self):
+        breaker = {"state": "open", "consecutive_failures": 3, "retry_in_seconds": 42.0}
+        runtime_state = {
+            "node-a": {
+                "vms": {
+                    "vm1": {
+                        "sensor_status": "error",
+                        "last_error": "Circuit open after 3 consecutive failures, retrying in 42s: timed out",
+                        "breaker": breaker,
+                    }
+                },
+            }
+        }
+
+        vm_status = build_status_snapshot(runtime_state)["hosts"][0]["vms"][0]
+
+        self.assertEqual(vm_status["breaker"], breaker)
+        self.assertEqual(vm_status["last_error"], "Sensor source paused after repeated failures")
+
     def test_status_snapshot_marks_old_sensor_data_as_stale(self):
         runtime_state = {
             "node-a": {
@@ -146,6 +172,90 @@ class MonitoringWebTests(unittest.TestCase):
 
         self.assertEqual(snapshot["hosts"][0]["sensor_status"], "stale")
 
+    def _cached_status(self):
+        self.now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        self.version = StateVersion()
+        self.runtime_state = {
+            "node-a": {
+                "sensor_status": "ok",
+                "last_updated": self.now.isoformat(),
+                "vms": {
+                    "vm1": {
+                        "sensor_status": "ok",
+                        "last_updated": (self.now + timedelta(seconds=60)).isoformat(),
+                    }
+                },
+            }
+        }
+        return StatusCache(self.runtime_state, self.version, stale_after_seconds=180, clock=lambda: self.now)
+
+    def test_status_cache_reuses_encoded_snapshot_until_a_version_is_published(self):
+        cache = self._cached_status()
+        first = cache.get()
+        self.runtime_state["node-a"]["fan_speed"] = 40
+
+        self.assertIs(cache.get(), first)
+
+        self.version.publish()
+        second = cache.get()
+        self.assertNotEqual(second.etag, first.etag)
+        self.assertEqual(json.loads(second.body)["hosts"][0]["fan_speed"], 40)
+        self.assertEqual(gzip.decompress(second.gzip_body), second.body)
+
+    def test_status_cache_flips_staleness_at_each_deadline_without_rebuilding(self):
+        cache = self._cached_status()
+        first = cache.get()
+        self.runtime_state["node-a"]["fan_speed"] = 40
+
+        self.now += timedelta(seconds=181)
+        host = json.loads(cache.get().body)["hosts"][0]
+        self.assertEqual((host["sensor_status"], host["vms"][0]["sensor_status"]), ("stale", "ok"))
+        self.assertIsNone(host["fan_speed"])
+        self.assertNotEqual(cache.get().etag, first.etag)
+
+        self.now += timedelta(seconds=60)
+        host = json.loads(cache.get().body)["hosts"][0]
+        self.assertEqual(host["vms"][0]["sensor_status"], "stale")
+        self.assertEqual(json.loads(cache.get().body)["generated_at"], self.now.isoformat())
+
+    def test_state_initialization_publishes_a_new_version(self):
+        version = state_version.value
+
+        init_state_from_config([])
+
+        self.assertGreater(state_version.value, version)
+
+    def test_server_answers_matching_etags_with_not_modified(self):
+        version = StateVersion()
+        runtime_state = {}
+        server = MonitoringServer(runtime_state, WebSettings(host="127.0.0.1", port=0), version)
+        server.start()
+        self.addCleanup(server.stop)
+        host, port = server.address
+        url = f"http://{host}:{port}/api/status"
+
+        with urlopen(url, timeout=2) as response:
+            etag = response.headers["ETag"]
+            self.assertEqual(response.headers["Cache-Control"], "no-cache")
+            self.assertIsNone(response.headers["Content-Encoding"])
+        with self.assertRaises(HTTPError) as error:
+            urlopen(Request(url, headers={"If-None-Match": etag}), timeout=2)
+        self.assertEqual(error.exception.code, 304)
+        self.assertEqual(error.exception.headers["ETag"], etag)
+
+        request = Request(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        with self.assertRaises(HTTPError) as error:
+            urlopen(request, timeout=2)
+        self.assertEqual(error.exception.code, 304)
+        self.assertTrue(error.exception.headers["ETag"].endswith('-gzip"'))
+
+        runtime_state["node-a"] = {"sensor_status": "initializing", "vms": {}}
+        version.publish()
+        with urlopen(Request(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag}), timeout=2) as response:
+            self.assertEqual(response.headers["Content-Encoding"], "gzip")
+            self.assertNotEqual(response.headers["ETag"], etag)
+            self.assertEqual(json.loads(gzip.decompress(response.read()))["hosts"][0]["name"], "node-a")
+
     def test_server_is_read_only(self):
         server = MonitoringServer({}, WebSettings(host="127.0.0.1", port=0))
         server.start()
@@ -164,6 +274,79 @@ class MonitoringWebTests(unittest.TestCase):
                 urlopen(request, timeout=2)
             self.assertEqual(error.exception.code, 405)
 
+    def _history_state(self):
+        host_history = History(100, rollups=())
+        vm_history = History(100, VM_COLUMNS, ())
+        for index in range(100):
+            host_history.append(timestamp=1000.0 + index, control_temperature=50.0 + index % 10, fan_speed=30.0)
+            vm_history.append(timestamp=1000.0 + index, temp_max=60.0)
+        return {"h1": {"history": host_history, "vms": {"vm1": {"history": vm_history}}}}
+
+    def test_history_response_is_downsampled_to_the_requested_points(self):
+        query = {"host": ["h1"], "from": ["1000"], "to": ["1099"], "points": ["10"]}
+
+        response = build_history_response(self._history_state(), query)
+
+        self.assertEqual(response["source"], "control_temperature")
+        self.assertEqual(response["points"], 10)
+        self.assertEqual(response["timestamp"][0], 1000.0)
+        self.assertEqual(response["min"], [50.0] * 10)
+        self.assertEqual(response["max"], [59.0] * 10)
+
+    def test_history_response_defaults_to_the_last_hour_and_vm_maximum(self):
+        response = build_history_response(
+            self._history_state(), {"host": ["h1"], "vm": ["vm1"], "method": ["lttb"]}, now=1050.0
+        )
+
+        self.assertEqual((response["from"], response["to"]), (1050.0 - 3600, 1050.0))
+        self.assertEqual(response["source"], "temp_max")
+        self.assertEqual(response["points"], 51)
+        self.assertEqual(set(response["avg"]), {60.0})
+
+    def test_history_response_rejects_unknown_targets_and_bad_parameters(self):
+        runtime_state = self._history_state()
+        cases = [
+            ({"host": ["missing"]}, 404),
+            ({"host": ["h1"], "vm": ["missing"]}, 404),
+            ({"host": ["h1"], "source": ["monotonic"]}, 404),
+            ({"host": ["h1"], "points": ["1"]}, 400),
+            ({"host": ["h1"], "points": ["many"]}, 400),
+            ({"host": ["h1"], "from": ["nan"]}, 400),
+            ({"host": ["h1"], "from": ["10"], "to": ["5"]}, 400),
+            ({"host": ["h1"], "method": ["mean"]}, 400),
+        ]
+        for query, status in cases:
+            with self.subTest(query=query), self.assertRaises(HistoryRequestError) as error:
+                build_history_response(runtime_state, query)
+            self.assertEqual(error.exception.status, status)
+
+    def test_server_serves_history_and_reports_bad_requests(self):
+        server = MonitoringServer(self._history_state(), WebSettings(host="127.0.0.1", port=0))
+        server.start()
+        self.addCleanup(server.stop)
+        host, port = server.address
+
+        url = f"http://{host}:{port}/api/history?host=h1&from=1000&to=1099&points=5"
+        with urlopen(url, timeout=2) as response:
+            self.assertEqual(response.headers["Content-Type"], "application/json; charset=utf-8")
+            self.assertEqual(json.load(response)["points"], 5)
+
+        request = Request(url, headers={"Accept": "application/octet-stream"})
+        with urlopen(request, timeout=2) as response:
+            self.assertEqual(response.headers["Content-Type"], "application/octet-stream")
+            self.assertEqual(response.headers["Vary"], "Accept")
+            self.assertEqual(decode_binary(response.read())["points"], 5)
+
+        with self.assertRaises(HTTPError) as error:
+            urlopen(f"http://{host}:{port}/api/history?host=h1&points=0", timeout=2)
+        self.assertEqual(error.exception.code, 400)
+
+    def test_dashboard_draws_control_temperature_sparklines(self):
+        dashboard = build_dashboard_html(3)
+
+        self.assertIn("/api/history?host=${encodeURIComponent(name)}&source=control_temperature", dashboard)
+        self.assertIn("card.append(head,grid,sparkline(host.name))", dashboard)
+
     def test_dashboard_renders_vm_status_update_time_and_error(self):
         server = MonitoringServer({}, WebSettings(host="127.0.0.1", port=0))
         server.start()
@@ -178,6 +361,7 @@ class MonitoringWebTests(unittest.TestCase):
         self.assertIn("new Date(value)", dashboard)
         self.assertIn("date.toLocaleString", dashboard)
         self.assertIn("vm.last_error", dashboard)
+        self.assertIn("breakerText(vm.breaker)", dashboard)
         self.assertNotIn(".innerHTML", dashboard)
 
 
@@ -12,11 +12,32 @@ ROOT = Path(__file__).resolve().parents[1]
 class PackagingContractTests(unittest.TestCase):
     runtime_files = [
         "main.py",
+        "adaptive_polling.py",
+        "breaker.py",
         "config_loader.py",
         "control_policy.py",
+        "downsample.py",
         "fan_controller.py",
+        "fan_writer.py",
+        "history.py",
+        "history_codec.py",
+        "history_store.py",
+        "host_plan.py",
+        "hwmon.py",
+        "ipmi_commands.py",
+        "ipmi_lan.py",
+        "ipmi_shell.py",
         "lifecycle.py",
+        "limits.py",
         "monitoring_web.py",
+        "polling.py",
+        "push_receiver.py",
+        "scheduler.py",
+        "sensor_agent.py",
+        "sensor_bundle.py",
+        "sensor_cache.py",
+        "sensor_streams.py",
+        "ssh_pool.py",
         "state.py",
         "temp_monitor.py",
         "utils.py",
@@ -171,6 +192,7 @@ class PackagingContractTests(unittest.TestCase):
         for directive in [
             "NoNewPrivileges=true",
             "ProtectSystem=strict",
+            "StateDirectory=fan-controller",
             "ProtectKernelTunables=true",
             "ProtectKernelModules=true",
             "ProtectControlGroups=true",
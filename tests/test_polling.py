@@ -0,0 +1,78 @@
+import threading
+import time
+import unittest
+
+from polling import HostPoller
+
+
+def hosts(*names):
+    return [{"name": name} for name in names]
+
+
+class HostPollerTests(unittest.TestCase):
+    def test_concurrent_cycle_takes_the_slowest_host_not_the_sum(self):
+        poller = HostPoller(lambda host: time.sleep(0.2), workers=4)
+        self.addCleanup(poller.shutdown)
+
+        report = poller.run_cycle(hosts("a", "b", "c", "d"), deadline_seconds=5)
+
+        self.assertLess(report.wall_seconds, 0.6)
+        self.assertEqual(sorted(report.durations), ["a", "b", "c", "d"])
+        self.assertEqual(report.late, ())
+
+    def test_due_sources_are_passed_to_each_poll(self):
+        polled = []
+        poller = HostPoller(lambda host, sources=None: polled.append((host["name"], sources)))
+
+        poller.run_cycle(hosts("a", "b"), deadline_seconds=5, sources={"a": {"cpu"}, "b": {"vm_gpu"}})
+
+        self.assertEqual(polled, [("a", {"cpu"}), ("b", {"vm_gpu"})])
+
+    def test_failing_host_does_not_affect_other_hosts(self):
+        polled = []
+
+        def poll(host):
+            if host["name"] == "bad":
+                raise RuntimeError("sensor exploded")
+            polled.append(host["name"])
+
+        poller = HostPoller(poll, workers=2)
+        self.addCleanup(poller.shutdown)
+
+        report = poller.run_cycle(hosts("bad", "good"), deadline_seconds=5)
+
+        self.assertEqual(polled, ["good"])
+        self.assertEqual(report.failed, ("bad",))
+
+    def test_late_host_is_reported_and_not_restarted_while_running(self):
+        release = threading.Event()
+        calls = []
+
+        def poll(host):
+            calls.append(host["name"])
+            if host["name"] == "slow":
+                release.wait(5)
+
+        poller = HostPoller(poll, workers=2)
+        self.addCleanup(poller.shutdown)
+        self.addCleanup(release.set)
+
+        first = poller.run_cycle(hosts("slow", "fast"), deadline_seconds=0.1)
+        second = poller.run_cycle(hosts("slow", "fast"), deadline_seconds=0.1)
+
+        self.assertEqual(first.late, ("slow",))
+        self.assertEqual(second.skipped, ("slow",))
+        self.assertEqual(calls.count("slow"), 1)
+        self.assertEqual(calls.count("fast"), 2)
+
+    def test_single_worker_polls_in_configuration_order(self):
+        polled = []
+        poller = HostPoller(lambda host: polled.append(host["name"]), workers=1)
+
+        poller.run_cycle(hosts("b", "a"), deadline_seconds=5)
+
+        self.assertEqual(polled, ["b", "a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import socket
+import time
+import unittest
+from types import SimpleNamespace
+
+from push_receiver import PushReceiver, PushTable, push_keys
+from sensor_agent import DatagramError, decode_datagram, encode_datagram, read_sensors
+from state import init_state_from_config
+from temp_monitor import TempMonitor
+
+KEY = b"shared-secret"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def datagram(seq, boot="boot-a", readings=None, key=KEY, source="gpu-vm", ts=100.0):
+    return encode_datagram(key, source, boot, seq, readings or {"nvidia": [55.0, 57.0]}, timestamp=ts)
+
+
+class DatagramTests(unittest.TestCase):
+    def test_round_trip_and_signature_check(self):
+        message = decode_datagram(datagram(1), {"gpu-vm": KEY}.get)
+
+        self.assertEqual(message["r"], {"nvidia": [55.0, 57.0]})
+        with self.assertRaises(DatagramError):
+            decode_datagram(datagram(1, key=b"wrong"), {"gpu-vm": KEY}.get)
+        with self.assertRaises(DatagramError):
+            decode_datagram(datagram(1, source="other"), {"gpu-vm": KEY}.get)
+
+    def test_rejects_non_numeric_readings(self):
+        with self.assertRaises(DatagramError):
+            decode_datagram(datagram(1, readings={"cpu": ["hot"]}), {"gpu-vm": KEY}.get)
+
+    def test_agent_reads_local_commands(self):
+        readings, errors = read_sensors({"cpu": "echo '41;42'", "amd": "echo oops >&2"}, timeout=5)
+
+        self.assertEqual(readings, {"cpu": [41.0, 42.0]})
+        self.assertEqual(errors, {"amd": "oops"})
+
+
+class PushTableTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.table = PushTable(clock=self.clock)
+        self.table.configure({"gpu-vm": KEY})
+
+    def test_latest_sample_expires_after_max_age(self):
+        self.assertTrue(self.table.ingest(datagram(1)))
+        self.assertEqual(self.table.reading("gpu-vm", "nvidia", max_age=30), ([55.0, 57.0], None))
+
+        self.clock.now += 31
+        temps, error = self.table.reading("gpu-vm", "nvidia", max_age=30)
+
+        self.assertIsNone(temps)
+        self.assertIn("stale", error)
+
+    def test_missing_kind_and_missing_source_are_errors(self):
+        self.table.ingest(datagram(1))
+
+        self.assertIsNone(self.table.reading("gpu-vm", "amd", max_age=30)[0])
+        self.assertIn("No sensor push", self.table.reading("other", "cpu", max_age=30)[1])
+
+    def test_sequence_numbers_detect_loss_and_replay(self):
+        self.table.ingest(datagram(1))
+        self.table.ingest(datagram(4))
+        self.assertFalse(self.table.ingest(datagram(4)))
+        self.assertTrue(self.table.ingest(datagram(1, boot="boot-b", ts=101.0)))
+
+        snapshot = self.table.snapshot()
+        self.assertEqual((snapshot["received"], snapshot["lost"], snapshot["replayed"]), (3, 2, 1))
+
+    def test_old_datagram_with_another_boot_id_cannot_replace_a_fresh_reading(self):
+        self.table.ingest(datagram(7, readings={"nvidia": [90.0]}))
+
+        self.assertFalse(self.table.ingest(datagram(1, boot="captured", readings={"nvidia": [35.0]}, ts=1.0)))
+        self.assertFalse(self.table.ingest(datagram(1, boot="captured", readings={"nvidia": [35.0]}, ts=95.0)))
+
+        self.assertEqual(self.table.reading("gpu-vm", "nvidia", max_age=30), ([90.0], None))
+        snapshot = self.table.snapshot()
+        self.assertEqual((snapshot["skewed"], snapshot["replayed"]), (1, 1))
+
+    def test_datagrams_outside_the_clock_skew_are_rejected(self):
+        self.assertFalse(self.table.ingest(datagram(1, ts=100.0 + 31)))
+        self.assertFalse(self.table.ingest(datagram(1, ts=100.0 - 31)))
+        self.assertTrue(self.table.ingest(datagram(1, ts=100.0 - 29)))
+
+    def test_age_is_measured_from_the_agent_timestamp(self):
+        self.table.ingest(datagram(1, ts=80.0))
+
+        temps, error = self.table.reading("gpu-vm", "nvidia", max_age=15)
+
+        self.assertIsNone(temps)
+        self.assertIn("20s old", error)
+
+    def test_receiver_ingests_udp_datagrams(self):
+        receiver = PushReceiver(self.table, "127.0.0.1", 0).start()
+        self.addCleanup(receiver.stop)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.sendto(datagram(1), receiver.address)
+
+        for _ in range(100):
+            if self.table.snapshot()["received"]:
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(self.table.reading("gpu-vm", "nvidia", max_age=30)[0], [55.0, 57.0])
+
+
+class PushMonitorTests(unittest.TestCase):
+    def test_pushing_vm_is_read_from_the_table_without_commands(self):
+        vm = {"name": "gpu-vm", "gpu_type": ["nvidia"], "push": {"key": "shared-secret", "source": "gpu-vm"}}
+        host = {"name": "node-a", "vms": [vm]}
+        config = SimpleNamespace(
+            general={
+            "gpu_temperature_command_nvidia": "false",
+            "push_receiver": {"host": "127.0.0.1", "port": 9870, "max_age": 30},
+        },
+            hosts=[host],
+        )
+        init_state_from_config([host])
+        monitor = TempMonitor(config)
+        self.addCleanup(monitor.close)
+        monitor.pushes.configure(push_keys(config))
+
+        self.assertIsNone(monitor.get_gpu_temps(host, "gpu-vm")[0])
+        monitor.pushes.ingest(datagram(1, ts=time.time()))
+        self.assertEqual(monitor.get_gpu_temps(host, "gpu-vm"), ([55.0, 57.0], None))
+
+
+if __name__ == "__main__":
+    unittest.main()
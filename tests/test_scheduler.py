@@ -0,0 +1,140 @@
+import threading
+import time
+import unittest
+
+from scheduler import Scheduler, stagger_offsets
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class SchedulerTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = Scheduler(clock=self.clock)
+
+    def due_keys(self):
+        return sorted(run.key for run in self.scheduler.wait(timeout=0))
+
+    def test_keys_run_on_their_own_intervals(self):
+        self.scheduler.set(("node-a", "cpu"), 10)
+        self.scheduler.set(("node-a", "vm_gpu"), 30)
+
+        self.assertEqual(self.due_keys(), [("node-a", "cpu"), ("node-a", "vm_gpu")])
+        self.clock.now += 10
+        self.assertEqual(self.due_keys(), [("node-a", "cpu")])
+        self.clock.now += 10
+        self.assertEqual(self.due_keys(), [("node-a", "cpu")])
+        self.clock.now += 10
+        self.assertEqual(self.due_keys(), [("node-a", "cpu"), ("node-a", "vm_gpu")])
+
+    def test_period_is_anchored_to_the_due_time_not_the_finish_time(self):
+        self.scheduler.set("host", 10)
+        self.scheduler.wait(timeout=0)
+
+        self.clock.now += 13
+        runs = self.scheduler.wait(timeout=0)
+
+        self.assertEqual(runs[0].lateness, 3)
+        self.assertEqual(self.scheduler.snapshot()["host"]["due_in_seconds"], 7)
+
+    def test_missed_periods_are_skipped_and_counted_as_overruns(self):
+        self.scheduler.set("host", 10)
+        self.scheduler.wait(timeout=0)
+
+        self.clock.now += 35
+        runs = self.scheduler.wait(timeout=0)
+
+        self.assertEqual(runs[0].skipped, 2)
+        stats = self.scheduler.snapshot()["host"]
+        self.assertEqual(stats["overruns"], 2)
+        self.assertEqual(stats["due_in_seconds"], 5)
+        self.assertEqual(stats["max_lateness_seconds"], 25)
+
+    def test_retain_drops_removed_keys(self):
+        self.scheduler.set("kept", 10)
+        self.scheduler.set("removed", 10)
+        self.scheduler.retain(["kept"])
+
+        self.assertEqual(self.due_keys(), ["kept"])
+        self.assertEqual(list(self.scheduler.snapshot()), ["kept"])
+
+    def test_shorter_interval_brings_the_next_run_closer(self):
+        self.scheduler.set("host", 60)
+        self.scheduler.wait(timeout=0)
+        self.scheduler.set("host", 5)
+
+        self.clock.now += 5
+        self.assertEqual(self.due_keys(), ["host"])
+
+    def test_phases_spread_runs_after_an_immediate_first_run(self):
+        for index, name in enumerate(["a", "b", "c"]):
+            self.scheduler.set(name, 30, phase=index * 10)
+
+        self.assertEqual(self.due_keys(), ["a", "b", "c"])
+        due_in = {key: stats["due_in_seconds"] for key, stats in self.scheduler.snapshot().items()}
+        self.assertEqual(due_in, {"a": 30, "b": 10, "c": 20})
+
+        self.clock.now += 10
+        self.assertEqual(self.due_keys(), ["b"])
+        self.clock.now += 10
+        self.assertEqual(self.due_keys(), ["c"])
+        self.clock.now += 10
+        self.assertEqual(self.due_keys(), ["a"])
+        self.assertEqual(self.scheduler.snapshot()["b"]["overruns"], 0)
+
+    def test_changing_the_phase_of_a_running_key_keeps_its_next_run(self):
+        self.scheduler.set("host", 30)
+        self.scheduler.wait(timeout=0)
+        self.scheduler.set("host", 30, phase=5)
+
+        self.clock.now += 30
+        self.assertEqual(self.due_keys(), ["host"])
+        self.assertEqual(self.scheduler.snapshot()["host"]["due_in_seconds"], 5)
+
+
+class StaggerOffsetTests(unittest.TestCase):
+    def test_even_offsets_divide_the_interval(self):
+        offsets = stagger_offsets([("a", 60), ("b", 60), ("c", 60)], "even")
+
+        self.assertEqual(offsets, {"a": 0, "b": 20, "c": 40})
+
+    def test_hashed_offsets_are_stable_and_within_the_interval(self):
+        first = stagger_offsets([("a", 60), ("b", 60)], "hashed")
+        second = stagger_offsets([("b", 60), ("new", 60)], "hashed")
+
+        self.assertEqual(first["b"], second["b"])
+        self.assertTrue(all(0 <= offset < 60 for offset in first.values()))
+
+    def test_no_stagger_keeps_hosts_aligned(self):
+        self.assertEqual(stagger_offsets([("a", 60), ("b", 30)], "none"), {"a": 0.0, "b": 0.0})
+
+
+class SchedulerWakeTests(unittest.TestCase):
+    def test_wake_interrupts_a_long_wait(self):
+        scheduler = Scheduler()
+        scheduler.set("host", 3600, first_due=time.monotonic() + 3600)
+        threading.Timer(0.1, scheduler.wake).start()
+
+        started = time.monotonic()
+        runs = scheduler.wait()
+
+        self.assertEqual(runs, [])
+        self.assertLess(time.monotonic() - started, 2)
+
+    def test_wait_returns_when_the_next_key_is_due(self):
+        scheduler = Scheduler()
+        scheduler.set("host", 0.1, first_due=time.monotonic() + 0.1)
+
+        runs = scheduler.wait(timeout=5)
+
+        self.assertEqual([run.key for run in runs], ["host"])
+
+
+if __name__ == "__main__":
+    unittest.main()
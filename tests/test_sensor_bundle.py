@@ -0,0 +1,118 @@
+import subprocess
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from sensor_bundle import BundleError, build_bundle_command, parse_bundle_output
+from state import init_state_from_config
+from temp_monitor import TempMonitor
+
+
+def run_locally(command):
+    result = subprocess.run(command, shell=True, capture_output=True, text=True)
+    return result.stdout
+
+
+class SensorBundleTests(unittest.TestCase):
+    def test_sections_are_parsed_with_individual_errors(self):
+        command = build_bundle_command(
+            [
+                ("cpu", "printf '41\\n42\\n' | paste -sd ';' -"),
+                ("nvidia", "echo 'NVIDIA-SMI has failed' >&2; exit 9"),
+                ("amd", "false"),
+            ]
+        )
+
+        sections = parse_bundle_output(run_locally(command), ["cpu", "nvidia", "amd"])
+
+        self.assertEqual(sections["cpu"], ("41;42", ""))
+        self.assertEqual(sections["nvidia"], ("", "NVIDIA-SMI has failed"))
+        self.assertEqual(sections["amd"], ("", "Exit status 1"))
+
+    def test_output_without_trailing_newline_is_kept_apart_from_markers(self):
+        command = build_bundle_command(
+            [
+                ("cpu", "printf '40;41'"),
+                ("nvidia", "printf 'no devices' >&2; exit 9"),
+            ]
+        )
+
+        sections = parse_bundle_output(run_locally(command), ["cpu", "nvidia"])
+
+        self.assertEqual(sections["cpu"], ("40;41", ""))
+        self.assertEqual(sections["nvidia"], ("", "no devices"))
+
+    def test_marker_glued_to_a_data_line_is_split(self):
+        output = (
+            "@@fan-control@@ begin cpu\n40;41@@fan-control@@ status 0\n"
+            "@@fan-control@@ stderr warn@@fan-control@@ end cpu\n"
+        )
+
+        self.assertEqual(parse_bundle_output(output, ["cpu"])["cpu"], ("40;41", "warn"))
+
+    def test_truncated_section_is_reported_as_incomplete(self):
+        output = "@@fan-control@@ begin cpu\n41;42\n"
+
+        sections = parse_bundle_output(output, ["cpu"])
+
+        self.assertIsNone(sections["cpu"][0])
+        self.assertIn("did not complete", sections["cpu"][1])
+
+    def test_unframed_output_is_a_bundle_failure(self):
+        with self.assertRaises(BundleError):
+            parse_bundle_output("sh: 1: Syntax error", ["cpu"])
+
+
+class BundledTempMonitorTests(unittest.TestCase):
+    def setUp(self):
+        self.config = SimpleNamespace(
+            general={
+                "debug": False,
+                "sensor_bundle": True,
+                "cpu_temperature_command": "echo '40;45'",
+                "gpu_temperature_command_nvidia": "echo 60",
+                "gpu_temperature_command_amd": "echo 'rocm-smi missing' >&2",
+            }
+        )
+        self.host = {
+            "name": "host1",
+            "gpu_type": ["nvidia", "amd"],
+            "ssh_credentials": {"host": "host1.example", "username": "monitor", "password": "x"},
+        }
+        init_state_from_config([self.host])
+        self.monitor = TempMonitor(self.config)
+        self.addCleanup(self.monitor.close)
+
+    def test_remote_host_sensors_are_read_in_one_round_trip(self):
+        calls = []
+
+        def fake_run_command(device, command, **kwargs):
+            calls.append(command)
+            return run_locally(command), ""
+
+        with patch("temp_monitor.run_command", side_effect=fake_run_command):
+            readings = self.monitor.read_host(self.host, deadline_seconds=5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(readings.cpu_temps, [40.0, 45.0])
+        self.assertEqual(readings.host_gpu, ([60.0], None))
+
+    def test_failed_bundle_falls_back_to_separate_commands(self):
+        calls = []
+
+        def fake_run_command(device, command, **kwargs):
+            calls.append(command)
+            if command.startswith("sh -c"):
+                return None, "sh: not found"
+            return run_locally(command).strip(), ""
+
+        with patch("temp_monitor.run_command", side_effect=fake_run_command):
+            readings = self.monitor.read_host(self.host, deadline_seconds=5)
+
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(readings.cpu_temps, [40.0, 45.0])
+        self.assertEqual(readings.host_gpu, ([60.0], None))
+
+
+if __name__ == "__main__":
+    unittest.main()
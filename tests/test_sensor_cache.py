@@ -0,0 +1,46 @@
+import unittest
+
+from sensor_cache import LastGoodCache
+
+
+class LastGoodCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        self.cache = LastGoodCache(clock=lambda: self.now)
+
+    def test_failed_reading_uses_the_last_good_reading_within_max_age(self):
+        self.cache.resolve("vm1", ([50.0], None), max_age=10)
+        self.now += 5
+
+        reading, age = self.cache.resolve("vm1", (None, "timed out"), max_age=10)
+
+        self.assertEqual(reading, ([50.0], None))
+        self.assertEqual(age, 5)
+        self.assertEqual(self.cache.stats(["vm1"]), {"hits": 1, "misses": 0, "hit_ratio": 1.0})
+
+    def test_too_old_or_missing_reading_is_not_used(self):
+        reading, age = self.cache.resolve("vm1", (None, "timed out"), max_age=10)
+        self.assertEqual((reading, age), ((None, "timed out"), None))
+
+        self.cache.resolve("vm1", ([50.0], None), max_age=10)
+        self.now += 11
+        reading, age = self.cache.resolve("vm1", (None, "timed out"), max_age=10)
+
+        self.assertEqual((reading, age), ((None, "timed out"), None))
+        self.assertEqual(self.cache.stats(["vm1"])["misses"], 2)
+
+    def test_reused_readings_are_not_stored_or_counted(self):
+        self.cache.resolve("cpu", ([40.0], None), max_age=10)
+        self.now += 8
+        self.cache.resolve("cpu", ([40.0], None), max_age=10, fresh=False)
+        self.now += 4
+
+        reading, age = self.cache.resolve("cpu", (None, "down"), max_age=10, fresh=False)
+
+        self.assertEqual((reading, age), ((None, "down"), None))
+        self.assertEqual(self.cache.age("cpu"), 12)
+        self.assertEqual(self.cache.stats(["cpu"]), {"hits": 0, "misses": 0, "hit_ratio": None})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+from types import SimpleNamespace
+
+from sensor_streams import SensorStream, SensorStreams, loop_command, parse_sample
+from state import init_state_from_config
+from temp_monitor import TempMonitor
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SensorStreamTests(unittest.TestCase):
+    def test_loop_command_repeats_the_polling_command(self):
+        self.assertEqual(loop_command("echo 41", 2), "while :; do echo 41\nsleep 2; done")
+        self.assertEqual(parse_sample("41.5; 43\n"), [41.5, 43.0])
+
+    def test_stream_keeps_the_latest_sample(self):
+        streams = SensorStreams()
+        self.addCleanup(streams.close)
+
+        temps, error = streams.reading(
+            "node-a", {}, "echo 40; echo '41;42'; sleep 30", max_age=30, first_sample_timeout=5,
+        )
+
+        self.assertIsNone(error)
+        self.assertIn(temps, ([40.0], [41.0, 42.0]))
+        self.assertIn("node-a", streams.snapshot())
+
+    def test_stale_sample_is_reported_as_an_error(self):
+        clock = FakeClock()
+        stream = SensorStream("node-a", {}, "echo 40; sleep 30", clock=clock).start()
+        self.addCleanup(stream.stop)
+        self.assertTrue(stream.wait_for_sample(5))
+
+        clock.now = 31.0
+        temps, error = stream.reading(max_age=30)
+
+        self.assertIsNone(temps)
+        self.assertIn("stale", error)
+
+    def test_stream_is_restarted_after_the_command_exits(self):
+        stream = SensorStream("node-a", {}, "echo 40", max_backoff=0.05).start()
+        self.addCleanup(stream.stop)
+        self.assertTrue(stream.wait_for_sample(5))
+
+        for _ in range(100):
+            if stream.snapshot()["restarts"] >= 2:
+                break
+            stream._stop.wait(0.05)
+
+        self.assertGreaterEqual(stream.snapshot()["restarts"], 2)
+        self.assertEqual(stream.reading(max_age=30), ([40.0], None))
+
+    def test_silent_command_is_restarted_as_stalled(self):
+        stream = SensorStream(
+            "node-a", {}, "echo 40; sleep 30", max_backoff=0.05, stall_timeout=0.1,
+        ).start()
+        self.addCleanup(stream.stop)
+        self.assertTrue(stream.wait_for_sample(5))
+
+        for _ in range(100):
+            if stream.snapshot()["restarts"] >= 1:
+                break
+            stream._stop.wait(0.05)
+
+        # The command would not exit for 30 seconds, so only the stall timeout restarts it.
+        self.assertGreaterEqual(stream.snapshot()["restarts"], 1)
+
+    def test_remote_stderr_is_discarded(self):
+        class FakeChannel:
+            def close(self):
+                pass
+
+        class FakePool:
+            commands = []
+
+            def exec_command(self, host, username, command, **_kwargs):
+                self.commands.append(command)
+                lines = iter(["40\n", ""])
+                stdout = SimpleNamespace(channel=FakeChannel(), readline=lambda: next(lines))
+                return None, stdout, None
+
+        pool = FakePool()
+        device = {"ssh_credentials": {"host": "node-a", "username": "root"}}
+        stream = SensorStream("node-a", device, "nvidia-smi --loop=1", pool=pool).start()
+        self.addCleanup(stream.stop)
+        self.assertTrue(stream.wait_for_sample(5))
+
+        self.assertEqual(pool.commands[0], "{ nvidia-smi --loop=1\n} 2>/dev/null")
+
+
+class StreamingMonitorTests(unittest.TestCase):
+    def test_streaming_device_reads_from_its_stream(self):
+        config = SimpleNamespace(
+            general={
+                "cpu_temperature_command": "echo not-streamed",
+                "stream_interval": 0.1,
+                "stream_max_age": 30,
+                "sensor_deadline": 5,
+            },
+            hosts=[],
+        )
+        monitor = TempMonitor(config)
+        self.addCleanup(monitor.close)
+        host = {"name": "node-a", "streaming": {"cpu": "echo '50;51'; sleep 30"}}
+        init_state_from_config([host])
+
+        self.assertEqual(monitor.get_cpu_temps(host), [50.0, 51.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
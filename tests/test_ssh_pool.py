@@ -0,0 +1,165 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from ssh_pool import SSHConnectionPool, pool_key
+from utils import ssh_exec_command
+
+
+class FakeStream:
+    def __init__(self, data=b""):
+        self.data = data
+        self.channel = self
+        self.timeouts = []
+
+    def read(self, size=-1):
+        data, self.data = self.data, b""
+        return data
+
+    def settimeout(self, timeout):
+        self.timeouts.append(timeout)
+
+    def close(self):
+        pass
+
+
+class FakeTransport:
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+
+class FakeHostKeys:
+    loads = 0
+
+    def __init__(self):
+        self.entries = {}
+
+    def load(self, path):
+        FakeHostKeys.loads += 1
+        self.entries["node-a"] = {"ssh-ed25519": "known-key"}
+
+    def lookup(self, hostname):
+        return self.entries.get(hostname)
+
+    def __setitem__(self, hostname, keys):
+        self.entries[hostname] = keys
+
+
+class FakeParamiko:
+    HostKeys = FakeHostKeys
+
+    class SSHException(Exception):
+        pass
+
+    class AuthenticationException(SSHException):
+        pass
+
+    class RejectPolicy:
+        pass
+
+    class PKey:
+        loads = 0
+
+        @classmethod
+        def from_path(cls, path):
+            cls.loads += 1
+            return ("pkey", path)
+
+    class SSHClient:
+        instances = []
+
+        def __init__(self):
+            self.transport = None
+            self.host_keys = FakeHostKeys()
+            self.commands = []
+            self.connect_kwargs = None
+            FakeParamiko.SSHClient.instances.append(self)
+
+        def load_system_host_keys(self):
+            raise AssertionError("system host keys must come from the pool cache")
+
+        def set_missing_host_key_policy(self, policy):
+            self.policy = policy
+
+        def get_host_keys(self):
+            return self.host_keys
+
+        def connect(self, host, **kwargs):
+            self.connect_kwargs = kwargs
+            self.transport = FakeTransport()
+
+        def get_transport(self):
+            return self.transport
+
+        def exec_command(self, command):
+            self.commands.append(command)
+            return FakeStream(), FakeStream(b"42;43\n"), FakeStream()
+
+        def close(self):
+            if self.transport:
+                self.transport.active = False
+
+
+class SSHConnectionPoolTests(unittest.TestCase):
+    def setUp(self):
+        FakeParamiko.SSHClient.instances = []
+        FakeParamiko.PKey.loads = 0
+        FakeHostKeys.loads = 0
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.known_hosts = Path(directory.name) / "known_hosts"
+        self.known_hosts.write_text("node-a ssh-ed25519 AAAA\n", encoding="utf-8")
+        self.key_path = Path(directory.name) / "id_ed25519"
+        self.key_path.write_text("private", encoding="utf-8")
+        self.pool = SSHConnectionPool(FakeParamiko, known_hosts_path=str(self.known_hosts))
+
+    def test_reuses_authenticated_transport_and_cached_keys(self):
+        for _ in range(3):
+            output, error = ssh_exec_command(
+                "node-a", "monitor", "sensors", key_path=str(self.key_path),
+                logger=None, pool=self.pool,
+            )
+            self.assertEqual((output, error), ("42;43", ""))
+
+        self.assertEqual(len(FakeParamiko.SSHClient.instances), 1)
+        client = FakeParamiko.SSHClient.instances[0]
+        self.assertEqual(client.commands, ["sensors"] * 3)
+        self.assertEqual(client.connect_kwargs["pkey"], ("pkey", str(self.key_path)))
+        self.assertEqual(client.host_keys.lookup("node-a"), {"ssh-ed25519": "known-key"})
+        self.assertEqual(FakeParamiko.PKey.loads, 1)
+        self.assertEqual(FakeHostKeys.loads, 1)
+        stats = self.pool.stats()
+        self.assertEqual((stats["connects"], stats["hits"], stats["reconnects"]), (1, 2, 0))
+        self.assertEqual(stats["open_connections"], 1)
+
+    def test_dead_transport_is_replaced_transparently(self):
+        self.pool.exec_command("node-a", "monitor", "sensors", password="secret")
+        FakeParamiko.SSHClient.instances[0].transport.active = False
+
+        self.pool.exec_command("node-a", "monitor", "sensors", password="secret")
+
+        self.assertEqual(len(FakeParamiko.SSHClient.instances), 2)
+        self.assertEqual(FakeParamiko.SSHClient.instances[1].connect_kwargs["password"], "secret")
+        self.assertEqual(self.pool.stats()["reconnects"], 1)
+
+    def test_pool_key_separates_credentials_without_storing_passwords(self):
+        first = pool_key("node-a", "monitor", password="secret")
+        second = pool_key("node-a", "monitor", password="other")
+
+        self.assertNotEqual(first, second)
+        self.assertNotIn("secret", repr(first))
+
+    def test_close_all_closes_pooled_transports(self):
+        self.pool.exec_command("node-a", "monitor", "sensors", password="secret")
+
+        self.pool.close_all()
+
+        self.assertFalse(FakeParamiko.SSHClient.instances[0].transport.active)
+        self.assertEqual(self.pool.stats()["open_connections"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,21 @@
+import threading
+import time
 import unittest
 from types import SimpleNamespace
 from unittest.mock import patch
 
+from state import init_state_from_config, state
 from temp_monitor import TempMonitor
 
 
+def vm(name):
+    return {
+        "name": name,
+        "gpu_type": ["nvidia"],
+        "ssh_credentials": {"host": f"{name}.example", "username": "monitor", "password": "secret"},
+    }
+
+
 class TempMonitorTests(unittest.TestCase):
     def test_vm_gpu_reading_returns_ssh_authentication_error(self):
         config = SimpleNamespace(
@@ -38,6 +49,173 @@ class TempMonitorTests(unittest.TestCase):
         self.assertIsNone(temperatures)
         self.assertEqual(error, "Authentication failed.")
 
+    def test_host_sources_are_read_concurrently_under_a_deadline(self):
+        config = SimpleNamespace(
+            general={
+                "debug": False,
+                "cpu_temperature_command": "sensors",
+                "gpu_temperature_command_nvidia": "nvidia-smi",
+                "gpu_temperature_command_amd": "rocm-smi",
+            }
+        )
+        host = {"name": "host1", "gpu_type": ["nvidia"], "vms": [vm(f"vm{i}") for i in range(4)]}
+        host["vms"].append(vm("stuck"))
+        init_state_from_config([host])
+
+        def fake_run_command(device, command, **kwargs):
+            time.sleep(2 if device.get("name") == "stuck" else 0.2)
+            return "50;51", ""
+
+        monitor = TempMonitor(config)
+        self.addCleanup(monitor.close)
+        with patch("temp_monitor.run_command", side_effect=fake_run_command):
+            started = time.monotonic()
+            readings = monitor.read_host(host, deadline_seconds=0.8)
+            elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 1.5)
+        self.assertEqual(readings.cpu_temps, [50.0, 51.0])
+        self.assertEqual(readings.host_gpu, ([50.0, 51.0], None))
+        for index in range(4):
+            self.assertEqual(readings.vm_gpus[f"vm{index}"], ([50.0, 51.0], None))
+        temperatures, error = readings.vm_gpus["stuck"]
+        self.assertIsNone(temperatures)
+        self.assertIn("timed out", error)
+
+    def test_sources_that_are_not_due_reuse_the_previous_reading(self):
+        config = SimpleNamespace(
+            general={
+                "debug": False,
+                "cpu_temperature_command": "sensors",
+                "gpu_temperature_command_nvidia": "nvidia-smi",
+                "gpu_temperature_command_amd": "rocm-smi",
+            }
+        )
+        host = {"name": "host1", "gpu_type": ["nvidia"], "vms": [vm("vm1")]}
+        init_state_from_config([host])
+        monitor = TempMonitor(config)
+        self.addCleanup(monitor.close)
+        commands = []
+
+        def fake_run_command(device, command, **kwargs):
+            commands.append((device.get("name"), command.split()[0]))
+            return f"{40 + len(commands)}", ""
+
+        with patch("temp_monitor.run_command", side_effect=fake_run_command):
+            monitor.read_host(host, deadline_seconds=5)
+            commands.clear()
+            readings = monitor.read_host(host, deadline_seconds=5, sources={"cpu"})
+
+        self.assertEqual(commands, [("host1", "sensors")])
+        self.assertEqual(readings.cpu_temps, [41.0])
+        self.assertIsNotNone(readings.host_gpu[0])
+        self.assertIsNotNone(readings.vm_gpus["vm1"][0])
+
+    def test_open_circuit_skips_an_unreachable_vm_until_its_backoff_expires(self):
+        config = SimpleNamespace(
+            general={
+                "debug": False,
+                "cpu_temperature_command": "sensors",
+                "gpu_temperature_command_nvidia": "nvidia-smi",
+                "gpu_temperature_command_amd": "rocm-smi",
+                "circuit_breaker": {"failures": 2, "base_backoff": 60, "max_backoff": 600},
+            }
+        )
+        host = {"name": "host1", "vms": [vm("vm1"), vm("off")]}
+        init_state_from_config([host])
+        monitor = TempMonitor(config)
+        self.addCleanup(monitor.close)
+        dialed = []
+
+        def fake_run_command(device, command, **kwargs):
+            dialed.append(device.get("name"))
+            if device.get("name") == "off":
+                return None, "Connection timed out"
+            return "50", ""
+
+        with patch("temp_monitor.run_command", side_effect=fake_run_command):
+            for _ in range(2):
+                monitor.read_host(host, deadline_seconds=5)
+            dialed.clear()
+            readings = monitor.read_host(host, deadline_seconds=5)
+
+        self.assertNotIn("off", dialed)
+        self.assertIn("vm1", dialed)
+        temperatures, error = readings.vm_gpus["off"]
+        self.assertIsNone(temperatures)
+        self.assertTrue(error.startswith("Circuit open after 2 consecutive failures"))
+        self.assertIn("Connection timed out", error)
+        vm_states = state["host1"]["vms"]
+        self.assertEqual(vm_states["off"]["breaker"]["state"], "open")
+        self.assertEqual(vm_states["vm1"]["breaker"]["state"], "closed")
+
+    def test_failed_source_uses_its_last_good_reading_until_it_is_too_old(self):
+        config = SimpleNamespace(
+            general={
+                "debug": False,
+                "cpu_temperature_command": "sensors",
+                "gpu_temperature_command_nvidia": "nvidia-smi",
+                "gpu_temperature_command_amd": "rocm-smi",
+                "sensor_cache_max_age": 60,
+            }
+        )
+        host = {"name": "host1", "vms": [vm("vm1")]}
+        init_state_from_config([host])
+        monitor = TempMonitor(config)
+        self.addCleanup(monitor.close)
+        clock = [100.0]
+        monitor.last_good._clock = lambda: clock[0]
+        vm_output = ["55", ""]
+
+        def fake_run_command(device, command, **kwargs):
+            return (tuple(vm_output) if device.get("name") == "vm1" else ("40", ""))
+
+        with patch("temp_monitor.run_command", side_effect=fake_run_command):
+            monitor.read_host(host, deadline_seconds=5)
+            vm_output[:] = [None, "Connection reset"]
+            clock[0] += 30
+            cached = monitor.read_host(host, deadline_seconds=5)
+            clock[0] += 31
+            stale = monitor.read_host(host, deadline_seconds=5)
+
+        self.assertEqual(cached.vm_gpus["vm1"], ([55.0], None))
+        self.assertEqual(cached.cached, {("vm_gpu", "vm1"): 30.0})
+        self.assertEqual(stale.vm_gpus["vm1"], (None, "Connection reset"))
+        self.assertEqual(stale.cached, {})
+        cache_state = state["host1"]["sensor_cache"]
+        self.assertEqual((cache_state["hits"], cache_state["misses"]), (1, 1))
+        self.assertEqual(cache_state["hit_ratio"], 0.5)
+        self.assertEqual(cache_state["ages"]["vm_gpu"], {"vm1": 61.0})
+        self.assertEqual(cache_state["ages"]["cpu"], 0.0)
+
+
+    def test_sensor_pool_is_created_once_and_resized_only_on_reload(self):
+        config = SimpleNamespace(general={"sensor_workers": 2})
+        monitor = TempMonitor(config)
+        self.addCleanup(monitor.close)
+        executors = []
+        start = threading.Barrier(8)
+
+        def create():
+            start.wait()
+            executors.append(monitor._sensor_executor())
+
+        threads = [threading.Thread(target=create) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        first = executors[0]
+        self.assertTrue(all(executor is first for executor in executors))
+
+        config.general["sensor_workers"] = 4
+        self.assertIs(monitor._sensor_executor(), first)
+
+        monitor.update_config(SimpleNamespace(general={"sensor_workers": 4}))
+        resized = monitor._sensor_executor()
+        self.assertIsNot(resized, first)
+        self.assertEqual(resized._max_workers, 4)
+
 
 if __name__ == "__main__":
     unittest.main()
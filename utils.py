@@ -1,9 +1,18 @@
+import os
 import sys
+import dataclasses
 import datetime
 import shlex
+import signal
 import subprocess
+import threading
+import time
+from collections import deque
 from dataclasses import dataclass
-from typing import Optional, Sequence, Union
+from typing import Mapping, Optional, Sequence, Union
+
+from limits import LimitTimeout, RemoteLimiter, default_limiter
+from ssh_pool import SSHConnectionPool, default_pool
 
 
 @dataclass(frozen=True)
@@ -12,8 +21,96 @@ class CommandSpec:
     stdin_data: Optional[str] = None
 
 
+@dataclass(frozen=True)
+class CommandTimeouts:
+    """Deadlines in seconds; ``None`` leaves the corresponding phase unbounded."""
+
+    connect: Optional[float] = None
+    command: Optional[float] = None
+    total: Optional[float] = None
+
+
+class CommandTimeout(str):
+    """Error message returned by ``run_command`` when a deadline expires.
+
+    It behaves like the plain error strings returned for other failures, so
+    existing callers keep working, while ``isinstance(error, CommandTimeout)``
+    distinguishes a hung command from one that failed.
+    """
+
+
+class CommandLatency:
+    """Recent wall-clock durations and timeout counts per command class."""
+
+    def __init__(self, window=512):
+        self._window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._timeouts = {}
+
+    def record(self, command_class, seconds, timed_out=False):
+        with self._lock:
+            samples = self._samples.setdefault(command_class, deque(maxlen=self._window))
+            samples.append(seconds)
+            if timed_out:
+                self._timeouts[command_class] = self._timeouts.get(command_class, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            items = {name: sorted(samples) for name, samples in self._samples.items()}
+            timeouts = dict(self._timeouts)
+        result = {}
+        for name, ordered in items.items():
+            def percentile(fraction):
+                return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 4)
+
+            result[name] = {
+                'samples': len(ordered),
+                'p50': percentile(0.50),
+                'p95': percentile(0.95),
+                'p99': percentile(0.99),
+                'max': round(ordered[-1], 4),
+                'timeouts': timeouts.get(name, 0),
+            }
+        return result
+
+
 Command = Union[str, Sequence[str], CommandSpec]
-SENSITIVE_CONFIG_KEYS = {'password', 'key_path', 'private_key', 'token', 'api_key'}
+SENSITIVE_CONFIG_KEYS = {'password', 'key', 'key_path', 'private_key', 'token', 'api_key'}
+COMMAND_CLASSES = ('cpu_sensor', 'gpu_sensor', 'ipmi_write')
+# Sensor sources a host poll reads; each can be scheduled on its own interval.
+POLL_SOURCES = ('cpu', 'host_gpu', 'vm_gpu')
+command_latency = CommandLatency()
+
+
+def command_timeouts(general: Mapping, command_class: str) -> Optional[CommandTimeouts]:
+    configured = (general.get('command_timeouts') or {}).get(command_class)
+    if not configured:
+        return None
+    return CommandTimeouts(
+        connect=configured.get('connect'),
+        command=configured.get('command'),
+        total=configured.get('total'),
+    )
+
+
+def _deadline(started, timeouts, clock=time.monotonic):
+    """Return the absolute command deadline derived from ``timeouts``."""
+    limits = []
+    if timeouts and timeouts.command is not None:
+        limits.append(clock() + timeouts.command)
+    if timeouts and timeouts.total is not None:
+        limits.append(started + timeouts.total)
+    return min(limits) if limits else None
+
+
+def _remaining(deadline, clock=time.monotonic):
+    if deadline is None:
+        return None
+    remaining = deadline - clock()
+    if remaining <= 0:
+        raise TimeoutError
+    return remaining
 
 
 def format_command(command: Command) -> str:
@@ -35,8 +132,9 @@ def redact_mapping(value):
     return value
 
 
-def configure_ssh_client(client, paramiko_module):
-    client.load_system_host_keys()
+def configure_ssh_client(client, paramiko_module, load_system_host_keys=True):
+    if load_system_host_keys:
+        client.load_system_host_keys()
     client.set_missing_host_key_policy(paramiko_module.RejectPolicy())
     return client
 
@@ -54,17 +152,27 @@ def ssh_exec_command(
     key_path: str = None,
     logger=log,
     log_tag: str = None,
-    debug: bool = False
+    debug: bool = False,
+    pool: Optional[SSHConnectionPool] = None,
+    timeouts: Optional[CommandTimeouts] = None,
+    limiter: Optional[RemoteLimiter] = None,
 ):
-    import paramiko
-
-    ssh = paramiko.SSHClient()
-    configure_ssh_client(ssh, paramiko)
+    pool = pool or default_pool
+    limiter = limiter or default_limiter
+    paramiko = pool.paramiko
+    started = time.monotonic()
+    connect_options = {}
+    if timeouts and timeouts.connect is not None:
+        connect_options = {
+            'timeout': timeouts.connect,
+            'banner_timeout': timeouts.connect,
+            'auth_timeout': timeouts.connect,
+        }
+    stdout = None
+    release = None
     try:
-        if key_path:
-            ssh.connect(host, username=username, key_filename=key_path)
-        else:
-            ssh.connect(host, username=username, password=password)
+        total = timeouts.total if timeouts else None
+        release = limiter.acquire('ssh_exec', host, timeout=total)
         if isinstance(command, CommandSpec):
             remote_command = shlex.join(command.argv)
             stdin_data = command.stdin_data
@@ -74,19 +182,43 @@ def ssh_exec_command(
         else:
             remote_command = shlex.join(command)
             stdin_data = None
-        stdin, stdout, stderr = ssh.exec_command(remote_command)
+        stdin, stdout, stderr = pool.exec_command(
+            host,
+            username,
+            remote_command,
+            password=password,
+            key_path=key_path,
+            **connect_options,
+        )
+        deadline = _deadline(started, timeouts)
         if stdin_data is not None:
             stdin.write(stdin_data)
             stdin.flush()
             stdin.channel.shutdown_write()
-        output = stdout.read().decode().strip()
-        error = stderr.read().decode()
+        output = _read_channel_file(stdout, deadline).decode().strip()
+        error = _read_channel_file(stderr, deadline).decode()
+        stdout.channel.close()
         if logger:
             if debug:
                 logger("DEBUG", log_tag, f"SSH output: {output}")
             if error and error.strip():
                 logger("ERROR", log_tag, f"SSH error: {error.strip()}")
         return output, error
+    except LimitTimeout as e:
+        error = CommandTimeout(str(e))
+        if logger:
+            logger("ERROR", log_tag, error)
+        return None, error
+    except TimeoutError:
+        if stdout is not None:
+            # Closing the channel makes sshd hang up the remote command.
+            stdout.channel.close()
+        error = CommandTimeout(
+            f"SSH command timed out after {time.monotonic() - started:.2f} seconds"
+        )
+        if logger:
+            logger("ERROR", log_tag, error)
+        return None, error
     except paramiko.AuthenticationException as e:
         if logger:
             logger("ERROR", log_tag, f"SSH authentication failed: {e}")
@@ -100,15 +232,107 @@ def ssh_exec_command(
             logger("ERROR", log_tag, f"SSH connection failed: {e}")
         return None, str(e)
     finally:
+        if release is not None:
+            release()
+
+def _read_channel_file(channel_file, deadline):
+    chunks = []
+    while True:
+        channel_file.channel.settimeout(_remaining(deadline))
+        chunk = channel_file.read(32768)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+
+def run_local_command(command: Command, timeouts: Optional[CommandTimeouts] = None):
+    """Run ``command`` locally and return ``(returncode, stdout, stderr)``.
+
+    The command runs in its own process group so that an expired deadline
+    kills the whole shell pipeline, not only the shell.
+    """
+    if isinstance(command, CommandSpec):
+        args, stdin_data, shell = command.argv, command.stdin_data, False
+    elif isinstance(command, str):
+        # Sensor pipelines are an explicit administrator-authored part
+        # of the local configuration and require shell syntax.
+        args, stdin_data, shell = command, None, True
+    else:
+        args, stdin_data, shell = command, None, False
+    started = time.monotonic()
+    process = subprocess.Popen(
+        args,
+        shell=shell,
+        stdin=subprocess.PIPE if stdin_data is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        start_new_session=True,
+    )
+    deadline = _deadline(started, timeouts)
+    try:
+        stdout, stderr = process.communicate(stdin_data, timeout=_remaining(deadline))
+    except (TimeoutError, subprocess.TimeoutExpired):
         try:
-            ssh.close()
-        except Exception:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
             pass
+        process.communicate()
+        raise TimeoutError(f"Local command timed out after {time.monotonic() - started:.2f} seconds")
+    return process.returncode, stdout, stderr
 
-def run_command(host_dict, command, logger=log, log_tag=None, debug: bool = False):
+
+def run_command(
+    host_dict,
+    command,
+    logger=log,
+    log_tag=None,
+    debug: bool = False,
+    timeouts: Optional[CommandTimeouts] = None,
+    command_class: Optional[str] = None,
+):
     if debug:
         log("DEBUG", log_tag, f"Command for {log_tag}: {format_command(command)}")
 
+    started = time.monotonic()
+    release = None
+    if command_class == 'ipmi_write':
+        # Each ipmitool invocation opens its own IPMI session on the BMC.
+        try:
+            release = default_limiter.acquire(
+                'ipmi_session', ipmi_target(host_dict), timeout=timeouts.total if timeouts else None
+            )
+        except LimitTimeout as e:
+            if logger:
+                logger("ERROR", log_tag, str(e))
+            command_latency.record(command_class, time.monotonic() - started, timed_out=True)
+            return None, CommandTimeout(str(e))
+        if timeouts and timeouts.total is not None:
+            timeouts = dataclasses.replace(
+                timeouts, total=max(0.001, timeouts.total - (time.monotonic() - started))
+            )
+    try:
+        output, error = _run_command(host_dict, command, logger, log_tag, debug, timeouts)
+    finally:
+        if release is not None:
+            release()
+    if command_class:
+        command_latency.record(
+            command_class,
+            time.monotonic() - started,
+            timed_out=isinstance(error, CommandTimeout),
+        )
+    return output, error
+
+
+def ipmi_target(host_dict) -> str:
+    """Name the BMC an IPMI command for ``host_dict`` talks to."""
+    ipmi = host_dict.get('ipmi_credentials') or {}
+    ssh_creds = host_dict.get('ssh_credentials') or {}
+    return str(ipmi.get('host') or ssh_creds.get('host') or 'local').strip()
+
+
+def _run_command(host_dict, command, logger, log_tag, debug, timeouts):
     ssh_creds = host_dict.get('ssh_credentials')
     if ssh_creds:
         return ssh_exec_command(
@@ -119,36 +343,31 @@ def run_command(host_dict, command, logger=log, log_tag=None, debug: bool = Fals
             command=command,
             logger=logger,
             log_tag=log_tag,
-            debug=debug
+            debug=debug,
+            timeouts=timeouts,
         )
-    else:
-        try:
-            if isinstance(command, CommandSpec):
-                result = subprocess.run(
-                    command.argv,
-                    input=command.stdin_data,
-                    shell=False,
-                    capture_output=True,
-                    text=True,
-                )
-            elif isinstance(command, str):
-                # Sensor pipelines are an explicit administrator-authored part
-                # of the local configuration and require shell syntax.
-                result = subprocess.run(command, shell=True, capture_output=True, text=True)
-            else:
-                result = subprocess.run(command, shell=False, capture_output=True, text=True)
-            output = result.stdout.strip()
-            error = result.stderr.strip()
-            if logger:
-                if debug:
-                    logger("DEBUG", log_tag, f"Local output: {output}")
-                if error:
-                    logger("ERROR", log_tag, f"Local error: {error}")
-            return output, error
-        except Exception as e:
-            if logger:
-                logger("ERROR", log_tag, f"Local command failed: {e}")
-            return None, str(e)
+    return _local_command_result(command, logger, log_tag, debug, timeouts)
+
+
+def _local_command_result(command, logger, log_tag, debug, timeouts):
+    try:
+        _returncode, stdout, stderr = run_local_command(command, timeouts)
+        output = stdout.strip()
+        error = stderr.strip()
+        if logger:
+            if debug:
+                logger("DEBUG", log_tag, f"Local output: {output}")
+            if error:
+                logger("ERROR", log_tag, f"Local error: {error}")
+        return output, error
+    except TimeoutError as e:
+        if logger:
+            logger("ERROR", log_tag, str(e))
+        return None, CommandTimeout(str(e))
+    except Exception as e:
+        if logger:
+            logger("ERROR", log_tag, f"Local command failed: {e}")
+        return None, str(e)
 
 def auto_split_thresholds(temp_min, temp_max, speed_min, speed_max, hysteresis):
     thresholds = []